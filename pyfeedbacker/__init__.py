@@ -1,22 +1,75 @@
 # -*- coding: utf-8 -*-
 
-from pyfeedbacker.app.controller import scorer, deleter, marker
-from pyfeedbacker.app.model import fs as model
+from pyfeedbacker.app import config
+from pyfeedbacker.app.controller import batch, scorer, deleter, marker
+from pyfeedbacker.app.model import fs, sharded, sqlite
 from pyfeedbacker.app.view import urwid as view
 
+import sys
+
+def create_model():
+    """Create the model set by the `type` option in the `[model]` section of
+    the configuration (either 'file', 'sharded' or 'sqlite')."""
+    model_type = config.ini.get('model', 'type', fallback='file').strip()
+
+    if model_type == 'file':
+        return fs.FileSystemModel()
+    elif model_type == 'sharded':
+        return sharded.ShardedFileSystemModel()
+    elif model_type == 'sqlite':
+        return sqlite.SQLiteModel()
+
+    raise ValueError(f'Unknown model type: {model_type}')
+
+def disable_cache():
+    """Always run the commands of stages, rather than reusing their cached
+    results."""
+    if not config.ini.has_section('cache'):
+        config.ini.add_section('cache')
+    config.ini.set('cache', 'enabled', 'False')
+
 def start_scorer(submission):
     c = scorer.Controller(submission)
-    m = model.FileSystemModel()
+    m = create_model()
+    v = view.UrwidView(c, m)
+    c.set_model(m).set_view(v).start()
+
+def start_queue(submissions = None):
+    """Score several submissions one after another, without restarting the
+    application between them.
+
+    Keyword arguments:
+    submissions -- Identifiers of the submissions to score, in order, or
+        None (or 'all-unmarked') for every submission in the submissions
+        directory that doesn't have a score or feedback yet.
+    """
+    m = create_model()
+
+    if not submissions or submissions == ['all-unmarked']:
+        submissions = [submission
+                       for submission in scorer.Controller.get_submissions()
+                       if not scorer.Controller.is_marked(m, submission)]
+
+    if len(submissions) == 0:
+        sys.stderr.write('There are no submissions to score.\n')
+        return
+
+    c = scorer.Controller(submissions[0], submissions[1:])
     v = view.UrwidView(c, m)
     c.set_model(m).set_view(v).start()
 
 def start_deleter(submission):
     c = deleter.Controller(submission)
-    m = model.FileSystemModel()
+    m = create_model()
     c.set_model(m).start()
 
 def start_marker():
     c = marker.Controller()
-    m = model.FileSystemModel()
+    m = create_model()
     v = view.UrwidView(c, m)
-    c.set_model(m).set_view(v).start()
\ No newline at end of file
+    c.set_model(m).set_view(v).start()
+
+def start_batch(workers = None):
+    c = batch.Controller(workers)
+    m = create_model()
+    c.set_model(m).start()
@@ -10,6 +10,14 @@ parser.add_argument(
     type     = str,
     help     = 'Score and generate feedback for a submission')
 
+parser.add_argument(
+    '-q', '--queue',
+    nargs    = '*',
+    metavar  = 'SUBMISSION',
+    help     = 'Score several submissions one after another, or every ' +
+               'submission without a score or feedback if none are given ' +
+               '(or all-unmarked)')
+
 parser.add_argument(
     '-d', '--delete',
     type     = str,
@@ -20,13 +28,41 @@ parser.add_argument(
     action   = 'store_true',
     help     = 'Run weighting application for converting scores to marks')
 
+parser.add_argument(
+    '-b', '--batch',
+    action   = 'store_true',
+    help     = 'Score every submission using only the stages that do not ' +
+               'need any interaction')
+
+parser.add_argument(
+    '-w', '--workers',
+    type     = int,
+    help     = 'Number of submissions to score at once in batch mode ' +
+               '(default: number of processors)')
+
+parser.add_argument(
+    '--no-cache',
+    action   = 'store_true',
+    help     = 'Always run the commands of stages, rather than reusing ' +
+               'their cached results')
+
 args = vars(parser.parse_args())
 
-if args['score'] and not args['delete'] and not args['mark']:
+if args['no_cache']:
+    pyfeedbacker.disable_cache()
+
+modes = [mode for mode in ('score', 'queue', 'delete', 'mark', 'batch')
+         if args[mode] not in (None, False)]
+
+if modes == ['score']:
     pyfeedbacker.start_scorer(args['score'])
-elif not args['score'] and args['delete'] and not args['mark']:
+elif modes == ['queue']:
+    pyfeedbacker.start_queue(args['queue'])
+elif modes == ['delete']:
     pyfeedbacker.start_deleter(args['delete'])
-elif not args['score'] and not args['delete'] and args['mark']:
+elif modes == ['mark']:
     pyfeedbacker.start_marker()
+elif modes == ['batch']:
+    pyfeedbacker.start_batch(args['workers'])
 else:
     parser.print_help();
\ No newline at end of file
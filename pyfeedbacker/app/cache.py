@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+from pyfeedbacker.app import capture, config
+
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+
+class ResultCache:
+    def __init__(self):
+        """Cache of the results of commands run by stages, stored in the
+        directory set by the `directory` option in the `[cache]` section of
+        the configuration. Results are stored under a hash of everything
+        that could change them (e.g., the submission's files and the
+        command), so a result is only reused if none of that has changed.
+
+        Once the cache is larger than `max_bytes`, the results that were
+        used least recently are removed. The size of the cache is counted
+        once, and then kept up to date as results are stored, so that the
+        cache is only searched for results to remove once it is too large.
+        """
+        # hashes of directories, keyed by the size and modification time of
+        # every file in them, so unchanged files aren't read again
+        self._tree_hashes = {}
+        self._lock        = threading.Lock()
+
+        # size of each cache directory, by path, since it was last counted
+        # by `evict` (results stored by other processes aren't counted until
+        # the cache is next counted)
+        self._sizes       = {}
+
+    enabled = property(lambda self:config.ini.compiled.cache_enabled, doc="""
+            Determine if results are cached.
+            """)
+
+    def get_key(self, parts, trees = ()):
+        """Generate the key for a result.
+
+        Arguments:
+        parts -- Iterable of strings that the result depends on.
+
+        Keyword arguments:
+        trees -- Iterable of paths of directories whose files the result
+            depends on. Directories that don't exist are ignored.
+        """
+        h = hashlib.sha256()
+
+        for part in parts:
+            h.update(str(part).encode())
+            h.update(b'\0')
+
+        for tree in trees:
+            h.update(self.get_tree_hash(tree).encode())
+            h.update(b'\0')
+
+        return h.hexdigest()
+
+    def get_tree_hash(self, directory):
+        """Generate a hash of the names and contents of all the files in a
+        directory.
+
+        Arguments:
+        directory -- Path of the directory.
+        """
+        files = []
+        for root, dirs, filenames in os.walk(directory):
+            dirs.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                files.append((os.path.relpath(path, directory),
+                              stat.st_size,
+                              stat.st_mtime_ns))
+
+        signature = (os.path.abspath(directory), tuple(files))
+        with self._lock:
+            try:
+                return self._tree_hashes[signature]
+            except KeyError:
+                pass
+
+        h = hashlib.sha256()
+        for relpath, size, mtime in files:
+            h.update(relpath.encode())
+            h.update(b'\0')
+
+            with open(os.path.join(directory, relpath), 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    h.update(chunk)
+            h.update(b'\0')
+
+        with self._lock:
+            self._tree_hashes[signature] = h.hexdigest()
+
+        return h.hexdigest()
+
+    def get(self, key):
+        """Retrieve a cached result.
+
+        Arguments:
+        key -- Key generated by `get_key`.
+
+        Returns:
+        (returncode, stdout, stderr), or None if the result isn't cached.
+        """
+        if not self.enabled:
+            return None
+
+        path = self._get_path(key)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # record when the result was last used, for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return (data['returncode'],
+                _decode_output(data['stdout']),
+                _decode_output(data['stderr']))
+
+    def set(self, key, returncode, stdout, stderr):
+        """Store a result, and then remove the least recently used results
+        if the cache has become too large.
+
+        Arguments:
+        key -- Key generated by `get_key`.
+        returncode -- Exit status of the command.
+        stdout -- Standard output of the command.
+        stderr -- Error output of the command.
+        """
+        if not self.enabled:
+            return
+
+        path = self._get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        data = {'returncode' : returncode,
+                'stdout'     : _encode_output(stdout),
+                'stderr'     : _encode_output(stderr)}
+
+        # write to a temporary file first, so that results stored at the same
+        # time by another process are never read half written
+        fd, tmp_path = tempfile.mkstemp(dir = os.path.dirname(path))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+            file_size = f.tell()
+
+        try:
+            file_size -= os.stat(path).st_size
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+
+        max_bytes = config.ini.compiled.cache_max_bytes
+        cache_dir = config.ini.compiled.cache_dir
+        with self._lock:
+            size = self._sizes.get(cache_dir)
+            if size is not None:
+                size += file_size
+                self._sizes[cache_dir] = size
+
+        if size is None or (max_bytes is not None and size > max_bytes):
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used results until the cache is no
+        larger than `max_bytes` in the `[cache]` section of the
+        configuration, and count the size of the cache again."""
+        max_bytes = config.ini.compiled.cache_max_bytes
+        cache_dir = config.ini.compiled.cache_dir
+
+        entries = []
+        for root, dirs, filenames in os.walk(cache_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        if max_bytes is not None:
+            for mtime, file_size, path in sorted(entries):
+                if size <= max_bytes:
+                    break
+
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                size -= file_size
+
+        with self._lock:
+            self._sizes[cache_dir] = size
+
+    def _get_path(self, key):
+        return os.path.join(config.ini.compiled.cache_dir,
+                            key[:2],
+                            key + '.json')
+
+
+
+def _encode_output(output):
+    """Convert the output of a command to something that can be stored as
+    JSON.
+
+    Arguments:
+    output -- Bytes (or a `CapturedOutput`) of the output.
+    """
+    return {'data'    : base64.b64encode(output).decode('ascii'),
+            'total'   : getattr(output, 'total', len(output)),
+            'omitted' : getattr(output, 'omitted', 0)}
+
+
+
+def _decode_output(data):
+    """Convert output stored by `_encode_output` back to a `CapturedOutput`.
+
+    Arguments:
+    data -- The stored output.
+    """
+    return capture.CapturedOutput(base64.b64decode(data['data']),
+                                  data['total'],
+                                  data['omitted'])
+
+
+
+results = ResultCache()
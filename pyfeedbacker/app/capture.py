@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+
+
+class OutputCapture:
+    def __init__(self,
+                 max_bytes,
+                 spill        = False,
+                 spill_prefix = 'output-',
+                 spill_dir    = None):
+        """Capture a stream of output (e.g., from a command) in a fixed amount
+        of memory. The first half of `max_bytes` of the stream is kept, along
+        with the last half in a ring buffer, and anything in between is
+        dropped, so a command that writes output forever can't use up all the
+        memory.
+
+        Arguments:
+        max_bytes -- Maximum number of bytes of the stream to keep.
+
+        Keyword arguments:
+        spill -- If True, the whole stream is also written to a temporary
+            file, whose path is given by `path`. The file is not deleted, so
+            the caller must delete it once it is no longer needed.
+        spill_prefix -- Prefix of the name of the temporary file.
+        spill_dir -- Directory to create the temporary file in, or None for
+            the system's temporary directory.
+        """
+        self._head       = bytearray()
+        self._head_bytes = max_bytes // 2
+        self._tail       = RingBuffer(max_bytes - self._head_bytes)
+
+        # number of bytes written to the stream
+        self.total = 0
+
+        self.path  = None
+        self._file = None
+        if spill:
+            fd, self.path = tempfile.mkstemp(prefix = spill_prefix,
+                                             suffix = '.log',
+                                             dir    = spill_dir)
+            self._file = os.fdopen(fd, 'wb')
+
+    def write(self, data):
+        """Add the next part of the stream.
+
+        Arguments:
+        data -- Bytes written to the stream.
+        """
+        self.total += len(data)
+
+        if self._file is not None:
+            self._file.write(data)
+
+        space = self._head_bytes - len(self._head)
+        if space > 0:
+            self._head += data[:space]
+            data = data[space:]
+
+        if len(data) > 0:
+            self._tail.write(data)
+
+    def close(self):
+        """Finish writing the stream to the temporary file, if there is
+        one."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def getvalue(self):
+        """Retrieve the output that was kept, with a note of how many bytes
+        were dropped (if any) between the start and end of the stream."""
+        value   = bytes(self._head)
+        tail    = self._tail.getvalue()
+        omitted = self.total - len(value) - len(tail)
+
+        if omitted > 0:
+            value += f'\n[… {omitted} bytes omitted …]\n'.encode()
+
+        return CapturedOutput(value + tail,
+                              self.total,
+                              max(omitted, 0),
+                              self.path)
+
+
+
+class CapturedOutput(bytes):
+    def __new__(cls, value, total, omitted = 0, path = None):
+        """Output kept by an `OutputCapture`. This is the output itself, as
+        bytes, with some extra information about the whole stream.
+
+        Arguments:
+        value -- The output that was kept.
+        total -- Number of bytes written to the stream.
+
+        Keyword arguments:
+        omitted -- Number of bytes of the stream that were dropped.
+        path -- Path to a file containing the whole stream, or None.
+        """
+        output = super().__new__(cls, value)
+        output.total   = total
+        output.omitted = omitted
+        output.path    = path
+        return output
+
+    truncated = property(lambda self:self.omitted > 0, doc="""
+            Determine if any of the stream was dropped.
+            """)
+
+
+
+class RingBuffer:
+    def __init__(self, capacity):
+        """Keep the last `capacity` bytes written to it.
+
+        Arguments:
+        capacity -- Number of bytes to keep.
+        """
+        self._buffer   = bytearray(capacity)
+        self._capacity = capacity
+        self._pos      = 0
+        self._full     = False
+
+    def write(self, data):
+        """Add bytes to the end of the buffer, overwriting the oldest bytes
+        if it is full.
+
+        Arguments:
+        data -- Bytes to add.
+        """
+        capacity = self._capacity
+        if capacity == 0:
+            return
+
+        if len(data) >= capacity:
+            self._buffer[:] = data[-capacity:]
+            self._pos  = 0
+            self._full = True
+            return
+
+        end = self._pos + len(data)
+        if end <= capacity:
+            self._buffer[self._pos:end] = data
+        else:
+            split = capacity - self._pos
+            self._buffer[self._pos:] = data[:split]
+            self._buffer[:end - capacity] = data[split:]
+
+        if end >= capacity:
+            self._full = True
+
+        self._pos = end % capacity
+
+    def getvalue(self):
+        """Retrieve the bytes in the buffer, oldest first."""
+        if not self._full:
+            return bytes(self._buffer[:self._pos])
+
+        return bytes(self._buffer[self._pos:] + self._buffer[:self._pos])
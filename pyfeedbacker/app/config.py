@@ -3,11 +3,16 @@
 import enum
 import configparser
 import copy
+import itertools
+import json
 
 
 
 class ConfigWrapper:
     def __init__(self):
+        self._compiled         = None
+        self._compiled_version = None
+
         self.clear()
         self.reset()
 
@@ -17,12 +22,346 @@ class ConfigWrapper:
     def __getattr__(self, attr):
         return self.ini.__getattribute__(attr)
 
+    version = property(lambda self:self.ini.version, doc="""
+            Retrieve a number that changes whenever the configuration changes,
+            so that values calculated from it can be cached until it changes.
+            """)
+
+    def set(self, section, option, value = None):
+        self.ini.set(section, option, value)
+
     def clear(self):
-        self.ini = configparser.ConfigParser()
+        self.ini = VersionedConfigParser()
 
     def reset(self):
         self.ini.read('config.ini')
 
+    compiled = property(lambda self:self._get_compiled(), doc="""
+            Retrieve a `CompiledConfig` snapshot of the configuration, which is
+            only rebuilt after the configuration changes.
+            """)
+
+    def _get_compiled(self):
+        if self._compiled_version != self.version:
+            self._compiled         = CompiledConfig(self.ini)
+            self._compiled_version = self.version
+
+        return self._compiled
+
+
+
+class VersionedConfigParser(configparser.ConfigParser):
+    def __init__(self, *args, **kwargs):
+        """A `configparser.ConfigParser` that records a new version whenever
+        it is changed, however it is changed (e.g., by `read_dict`,
+        `add_section` or assigning to an option of a section).
+
+        Versions are unique across every parser, so a value cached against
+        the version of a parser that has since been replaced is never reused.
+        """
+        self.version = next(_versions)
+        super().__init__(*args, **kwargs)
+
+    def _changed(self):
+        self.version = next(_versions)
+
+    def set(self, section, option, value = None):
+        super().set(section, option, value)
+        self._changed()
+
+    def add_section(self, section):
+        super().add_section(section)
+        self._changed()
+
+    def remove_option(self, section, option):
+        removed = super().remove_option(section, option)
+        self._changed()
+        return removed
+
+    def remove_section(self, section):
+        removed = super().remove_section(section)
+        self._changed()
+        return removed
+
+    def _read(self, fp, fpname):
+        # read(), read_file() and read_string() parse files into the sections
+        # directly, without calling set()
+        try:
+            super()._read(fp, fpname)
+        finally:
+            self._changed()
+
+
+
+class CompiledConfig:
+    def __init__(self, ini):
+        """A snapshot of the configuration needed by the model, controllers
+        and views, parsed into plain attributes once so that it can be read
+        repeatedly (e.g., for every submission) without parsing strings.
+
+        Options that are missing or can't be parsed (e.g., bounds set to 
+        false to disable them) are None.
+
+        Arguments:
+        ini -- The `configparser.ConfigParser` to compile.
+        """
+        self._ini             = ini
+        self._unlisted_stages = {}
+
+        app = _get_section(ini, 'app')
+        self.name                = app.get('name', '')
+        self.debug               = _get_boolean(app, 'debug', False)
+        self.graph_columns       = _get_int(app, 'graph_columns', 10)
+        self.dir_temp            = app.get('dir_temp', '_temp')
+        self.stage_workers       = _get_int(app, 'stage_workers', 4)
+
+        assessment = _get_section(ini, 'assessment')
+        self.score_init          = _get_float(assessment, 'score_init')
+        self.score_min           = _get_float(assessment, 'score_min')
+        self.score_max           = _get_float(assessment, 'score_max')
+        self.mark_min            = _get_float(assessment, 'mark_min')
+        self.mark_max            = _get_float(assessment, 'mark_max')
+        self.feedback_pre        = assessment.get('feedback_pre', None)
+        self.scores_are_marks    = _get_boolean(
+            assessment, 'scores_are_marks', False)
+        self.progress_on_success = _get_boolean(
+            assessment, 'progress_on_success', True)
+        self.halt_on_error       = _get_boolean(
+            assessment, 'halt_on_error', False)
+
+        scorer = _get_section(ini, 'scorer')
+        self.prefetch            = _get_boolean(scorer, 'prefetch', True)
+
+        cache = _get_section(ini, 'cache')
+        self.cache_enabled       = _get_boolean(cache, 'enabled', True)
+        self.cache_dir           = cache.get('directory', '_output/cache')
+        self.cache_max_bytes     = _get_int(cache, 'max_bytes', 268435456)
+
+        model_file = _get_section(ini, 'model_file')
+        self.scores_are_ints     = _get_boolean(
+            model_file, 'scores_are_ints', False)
+        self.marks_are_ints      = _get_boolean(
+            model_file, 'marks_are_ints', False)
+        self.finalise_workers    = _get_int(
+            model_file, 'finalise_workers', None)
+        self.csv_layout          = model_file.get('csv_layout',
+                                              'stage').strip()
+
+        # stages, in the order they are configured
+        self.stage_ids = []
+        self.stages    = {}
+
+        stage_ids = assessment.get('stages', '')
+        for stage_id in stage_ids.split(','):
+            stage_id = stage_id.strip()
+            if stage_id == '':
+                continue
+
+            self.stage_ids.append(stage_id)
+            self.stages[stage_id] = CompiledConfig.Stage(
+                ini, stage_id, self.halt_on_error)
+
+        # stages without a list of dependencies depend on the stage before
+        # them, so that stages are executed in order by default
+        for pos, stage_id in enumerate(self.stage_ids):
+            stage = self.stages[stage_id]
+            if stage.depends is None:
+                stage.depends = tuple(self.stage_ids[pos-1:pos])
+
+    def get_stage(self, stage_id):
+        """Retrieve the configuration of a stage, compiling it on first use if
+        it isn't in the list of stages. If there is no configuration for the
+        stage, all its options are None.
+
+        Arguments:
+        stage_id -- The unique stage identifier.
+        """
+        try:
+            return self.stages[stage_id]
+        except KeyError:
+            pass
+
+        try:
+            return self._unlisted_stages[stage_id]
+        except KeyError:
+            stage = CompiledConfig.Stage(self._ini,
+                                         stage_id,
+                                         self.halt_on_error)
+            self._unlisted_stages[stage_id] = stage
+            return stage
+
+
+
+    class Stage:
+        def __init__(self, ini, stage_id, halt_on_error):
+            """The configuration of a single stage.
+
+            Arguments:
+            ini -- The `configparser.ConfigParser` to compile.
+            stage_id -- The unique stage identifier.
+            halt_on_error -- Default for whether to halt if the stage fails.
+            """
+            cfg = _get_section(ini, 'stage_' + stage_id)
+
+            self.stage_id      = stage_id
+            self.exists        = ini.has_section('stage_' + stage_id)
+            self.label         = cfg.get('label', None)
+            self.handler       = cfg.get('handler', None)
+            self.score_init    = _get_float(cfg, 'score_init')
+            self.score_min     = _get_float(cfg, 'score_min')
+            self.score_max     = _get_float(cfg, 'score_max')
+            self.mark_min      = _get_float(cfg, 'mark_min')
+            self.mark_max      = _get_float(cfg, 'mark_max')
+            self.feedback_pre  = cfg.get('feedback_pre', None)
+            self.feedback_post = cfg.get('feedback_post', None)
+            self.halt_on_error = _get_boolean(
+                cfg, 'halt_on_error', halt_on_error)
+            self.timeout       = _get_float(cfg, 'timeout')
+
+            # limits on the output of commands kept in memory
+            self.max_output_bytes = _get_int(cfg, 'max_output_bytes', 1048576)
+            self.spill_output     = _get_boolean(cfg, 'spill_output', False)
+
+            # whether files are hard linked into the workspace rather than
+            # copied, and the patterns of the files that are always copied
+            self.staging_link  = cfg.get('staging', 'copy').strip() == 'link'
+            self.writable      = tuple(p.strip()
+                                       for p in cfg.get('writable', '')
+                                                   .split(',')
+                                       if p.strip() != '')
+
+            # identifiers of the stages that must be complete before this
+            # stage can be executed (None if not configured)
+            self.depends       = cfg.get('depends', None)
+            if self.depends is not None:
+                self.depends = tuple(d.strip()
+                                     for d in self.depends.split(',')
+                                     if d.strip() != '')
+
+            # questions of a form, in the order they are configured
+            self.questions = []
+            for k, v in cfg.items():
+                if k.startswith('question'):
+                    self.questions.append(
+                        CompiledConfig.Question(cfg, k[8:], v))
+
+
+
+    class Question:
+        def __init__(self, cfg, num, text):
+            """The configuration of a question in a form. If the question's
+            configuration is invalid, `error` describes why.
+
+            Arguments:
+            cfg -- The configuration section of the stage.
+            num -- The configured number for the question.
+            text -- The instruction/question text.
+            """
+            self.num       = num
+            self.text      = text
+            self.type      = cfg.get('type' + num, None)
+            self.required  = _get_boolean(cfg, 'required' + num, False)
+            self.scale     = None
+            self.scores    = None
+            self.feedback  = None
+            self.score_min = None
+            self.score_max = None
+            self.error     = None
+
+            if self.type == 'scale':
+                self._compile_scale(cfg)
+            elif self.type == 'input_score':
+                self.score_min = _get_float(cfg, 'min' + num)
+                self.score_max = _get_float(cfg, 'max' + num)
+
+        def _compile_scale(self, cfg):
+            num = self.num
+
+            try:
+                answer = cfg['answer' + num]
+            except KeyError:
+                self.error = f'No answers for question {num}.'
+                return
+
+            try:
+                self.scale = json.loads(cfg.get(answer, answer))
+            except json.JSONDecodeError as e:
+                self.error = f'Invalid scale JSON for question {num}: {e}'
+                return
+
+            try:
+                self.scores = [float(s) for s in cfg['score' + num].split(',')]
+            except KeyError:
+                pass
+            except ValueError as e:
+                self.error = f'Invalid score for question {num}: {e}'
+                return
+
+            if self.scores is not None and len(self.scores) != len(self.scale):
+                self.error = (f'Mismatch with number of score values '
+                              f'({len(self.scores)}) vs. number of answers '
+                              f'({len(self.scale)}) for question {num}.')
+                return
+
+            try:
+                self.feedback = cfg['feedback' + num].strip().split('\n')
+            except KeyError:
+                return
+
+            if len(self.feedback) != len(self.scale):
+                self.error = (f'Mismatch with number of feedback responses '
+                              f'({len(self.feedback)}) vs. number of answers '
+                              f'({len(self.scale)}) in question {num}.')
+                return
+
+            self.feedback = ['' if f == '-' else f for f in self.feedback]
+
+
+
+def _get_section(ini, section):
+    """Retrieve a section of the configuration, or an empty section if it
+    doesn't exist."""
+    try:
+        return ini[section]
+    except KeyError:
+        return {}
+
+
+
+def _get_float(section, option):
+    """Retrieve an option as a float, or None if it is missing or invalid."""
+    try:
+        return float(section[option])
+    except (KeyError, ValueError, configparser.Error):
+        return None
+
+
+
+def _get_int(section, option, default):
+    """Retrieve an option as an int, or `default` if it is missing or
+    invalid."""
+    try:
+        return int(section[option])
+    except (KeyError, ValueError, configparser.Error):
+        return default
+
+
+
+def _get_boolean(section, option, default):
+    """Retrieve an option as a boolean, or `default` if it is missing or
+    invalid."""
+    try:
+        value = section[option]
+    except (KeyError, configparser.Error):
+        return default
+
+    return configparser.ConfigParser.BOOLEAN_STATES.get(value.lower().strip(),
+                                                         default)
+
+
+
+_versions = itertools.count()
+
 
 
-ini = ConfigWrapper()
\ No newline at end of file
+ini = ConfigWrapper()
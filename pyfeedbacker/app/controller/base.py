@@ -3,6 +3,7 @@
 from pyfeedbacker.app import config, stage
 
 import abc
+import os
 
 
 
@@ -14,17 +15,18 @@ class BaseController:
         self.stages          = {}
         self.stages_handlers = {}
 
+        # stages each stage depends on, and the stages that depend on it
+        self.stages_depends    = {}
+        self.stages_dependants = {}
+
         self._next_stage_id = None
         self.current_stage = None
 
         # configuration information
-        self.debug = config.ini['app'].getboolean('debug', False)
-
-        default_ini = config.ini['assessment']
-        self.progress_on_success = default_ini.getboolean(
-            'progress_on_success', True)
-        self.halt_on_error       = default_ini.getboolean(
-            'halt_on_error', False)
+        cfg = config.ini.compiled
+        self.debug               = cfg.debug
+        self.progress_on_success = cfg.progress_on_success
+        self.halt_on_error       = cfg.halt_on_error
 
     def set_model(self, model):
         """Set the model that'll store information about a submission
@@ -56,27 +58,159 @@ class BaseController:
 
     def _load_stages(self):
         """Load all stages from the configuration file."""
-        stages = config.ini['assessment']['stages'].split(',')
-        for stage_id in stages:
-            stage_id  = stage_id.strip()
-            s_ini = config.ini['stage_' + stage_id]
+        self._load_dependencies()
+        self._create_stages()
+
+        self.view.append_stages(self.stages)
+
+    def _create_stages(self):
+        """Create the information for every stage, with every stage not yet
+        executed."""
+        self.stages          = {}
+        self.stages_handlers = {}
+
+        cfg = config.ini.compiled
+        for stage_id in cfg.stage_ids:
+            s_cfg = cfg.stages[stage_id]
+            if not s_cfg.exists:
+                raise KeyError('stage_' + stage_id)
 
             stage_info = stage.StageInfo(
                 controller    = self,
                 stage_id      = stage_id,
-                label         = s_ini['label'],
-                handler       = s_ini['handler'],
-                score_min     = s_ini.get('score_min', None),
-                score_max     = s_ini.get('score_max', None),
-                feedback_pre  = s_ini.get('feedback_pre',None),
-                feedback_post = s_ini.get('feedback_post', None),
-                halt_on_error = s_ini.getboolean(
-                 'halt_on_error', self.halt_on_error))
-
-            self.stages_ids.append(stage_id)
+                label         = s_cfg.label,
+                handler       = s_cfg.handler,
+                score_min     = s_cfg.score_min,
+                score_max     = s_cfg.score_max,
+                feedback_pre  = s_cfg.feedback_pre,
+                feedback_post = s_cfg.feedback_post,
+                halt_on_error = s_cfg.halt_on_error)
+
             self.stages[stage_id] = stage_info
 
-        self.view.append_stages(self.stages)
+    def _load_dependencies(self):
+        """Load the stages each stage depends on from the configuration
+        file, and check that every stage can be executed.
+
+        Raises:
+        StageError -- if a stage depends on a stage that doesn't exist, or
+            the dependencies form a cycle.
+        """
+        cfg = config.ini.compiled
+
+        self.stages_ids        = list(cfg.stage_ids)
+        self.stages_depends    = {}
+        self.stages_dependants = {stage_id: [] for stage_id in cfg.stage_ids}
+
+        for stage_id in cfg.stage_ids:
+            depends = cfg.stages[stage_id].depends
+            for depend_id in depends:
+                if depend_id not in self.stages_dependants:
+                    raise stage.StageError(f'The stage {stage_id} depends on ' +
+                                           f'an unknown stage {depend_id}')
+                self.stages_dependants[depend_id].append(stage_id)
+
+            self.stages_depends[stage_id] = depends
+
+        # a stage can only be executed if all the stages it depends on can be
+        self.get_stage_order()
+
+    @staticmethod
+    def get_submissions():
+        """Retrieve the identifiers of the submissions in the submissions
+        directory (i.e., the name of each directory in it), in order."""
+        dir_submissions = config.ini['app']['dir_submissions']
+
+        try:
+            return sorted(entry.name for entry in os.scandir(dir_submissions)
+                          if entry.is_dir() and
+                             not entry.name.startswith('.'))
+        except FileNotFoundError:
+            return []
+
+    def get_stage_order(self):
+        """Retrieve the identifiers of all stages in an order they can be
+        executed in, such that every stage is after the stages it depends on.
+        Otherwise, stages are in the order they are configured.
+
+        Raises:
+        StageError -- if the dependencies form a cycle.
+        """
+        order     = []
+        remaining = list(self.stages_ids)
+
+        while len(remaining) > 0:
+            ready = [stage_id for stage_id in remaining
+                     if all(d in order for d in self.stages_depends[stage_id])]
+            if len(ready) == 0:
+                raise stage.StageError('The dependencies of the stages ' +
+                                       ', '.join(remaining) +
+                                       ' form a cycle')
+
+            order     += ready
+            remaining  = [s for s in remaining if s not in ready]
+
+        return order
+
+    def is_stage_ready(self, stage_id):
+        """Determine if a stage can be executed, i.e., it hasn't been 
+        executed yet and all the stages it depends on are complete.
+
+        Arguments:
+        stage_id -- A valid stage identifier
+        """
+        if self.stages[stage_id].state != stage.StageInfo.STATE_INACTIVE:
+            return False
+
+        for depend_id in self.stages_depends.get(stage_id, ()):
+            if self.stages[depend_id].state != stage.StageInfo.STATE_COMPLETE:
+                return False
+
+        return True
+
+    def get_ready_stage_ids(self, stage_ids = None):
+        """Retrieve the identifiers of the stages that can be executed.
+
+        Keyword arguments:
+        stage_ids -- Only consider these stages, or all stages if None.
+        """
+        if stage_ids is None:
+            stage_ids = self.stages_ids
+
+        return [stage_id for stage_id in stage_ids
+                if self.is_stage_ready(stage_id)]
+
+    def get_dependant_stage_ids(self, stage_id):
+        """Retrieve the identifiers of the stages that depend on a stage,
+        either directly or through other stages, in configured order.
+
+        Arguments:
+        stage_id -- A valid stage identifier
+        """
+        dependants = set()
+        pending    = list(self.stages_dependants.get(stage_id, []))
+
+        while len(pending) > 0:
+            dependant_id = pending.pop()
+            if dependant_id not in dependants:
+                dependants.add(dependant_id)
+                pending += self.stages_dependants[dependant_id]
+
+        return [s for s in self.stages_ids if s in dependants]
+
+    def fail_dependant_stages(self, stage_id):
+        """Mark every stage that depends on a stage as failed, so that they
+        are never executed.
+
+        Arguments:
+        stage_id -- A valid stage identifier
+        """
+        for dependant_id in self.get_dependant_stage_ids(stage_id):
+            self.stages[dependant_id].set_state(stage.StageInfo.STATE_FAILED)
+
+            if hasattr(self, 'view'):
+                self.view.set_stage_state(dependant_id,
+                                          stage.StageInfo.STATE_FAILED)
 
     def get_next_stage_id(self, stage_id):
         """Retrieve the stage identifier of the stage after the current one.
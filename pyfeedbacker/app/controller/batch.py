@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+from pyfeedbacker.app import config, stage, workspace
+from pyfeedbacker.app.controller import base
+
+import concurrent.futures
+import sys
+
+
+
+class Controller(base.BaseController):
+    # results of a stage that mean the stages that depend on it can't be
+    # executed for the submission
+    RESULTS_FAILED = (stage.StageResult.RESULT_CRITICAL,
+                      stage.StageResult.RESULT_ERROR,
+                      stage.StageResult.RESULT_FAIL)
+
+    def __init__(self, workers = None):
+        """Controller for scoring every submission without any interaction,
+        by executing the stages that don't require a user (i.e., Python,
+        process and empty stages) for each submission in a pool of
+        processes. Interactive stages are skipped, and can be completed
+        later with the scorer.
+
+        Keyword arguments:
+        workers -- Number of submissions to score at once, or None to use
+            one process for each processor.
+        """
+        super().__init__()
+
+        self.workers = workers
+
+    def start(self):
+        """Score every submission in the submissions directory, store the
+        outcomes and feedback in the model, and then save the model once."""
+        submissions = self.get_submissions()
+        if len(submissions) == 0:
+            sys.stderr.write('No submissions found in ' +
+                             config.ini['app']['dir_submissions'] + '.\n')
+            return
+
+        self._load_dependencies()
+        workspace.workspaces.sweep()
+
+        stage_ids = self.get_stage_order()
+        failed    = 0
+
+        # workers may not inherit changes made to the configuration after it
+        # was read (e.g., by arguments), so they are given a copy
+        sections = {section: dict(config.ini.items(section, raw = True))
+                    for section in config.ini.sections()}
+
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers = self.workers,
+                initializer = _init_worker,
+                initargs    = (sections,)) as pool:
+            futures = [pool.submit(_score_submission, submission, stage_ids)
+                       for submission in submissions]
+
+            # results are stored in the order of the submissions, so that the
+            # model is saved in the same order however long each one takes.
+            # The model is saved once they are all stored, rather than
+            # journalling (and compacting) every change as it is made
+            self.model.journaling = False
+            try:
+                for submission, future in zip(submissions, futures):
+                    try:
+                        reports = future.result()
+                    except Exception as e:
+                        reports = [(None,
+                                    stage.StageResult.RESULT_CRITICAL,
+                                    None,
+                                    {},
+                                    'Failed to score submission: ' + str(e))]
+
+                    if not self.report_submission(submission, reports):
+                        failed += 1
+
+                    workspace.workspaces.release(submission)
+            finally:
+                self.model.journaling = True
+                self.model.save()
+
+        print(f'{len(submissions)} submissions scored, {failed} with errors.')
+
+    def report_submission(self, submission, reports):
+        """Store the outcomes and feedback from the stages executed for a
+        submission in the model, replacing anything previously stored for
+        those stages, and print the submission's score.
+
+        Arguments:
+        submission -- Identifier of the submission.
+        reports -- List of (stage_id, result, outcome, feedback, error) for
+            each stage executed, as returned by `_score_submission`.
+
+        Returns:
+        False if any stage failed, True otherwise.
+        """
+        outcomes  = self.model.outcomes[submission]
+        feedbacks = self.model.feedbacks[submission]
+        succeeded = True
+
+        for stage_id, result, outcome, feedback, error in reports:
+            if stage_id is not None:
+                if stage_id in outcomes:
+                    outcomes[stage_id].clear()
+                if stage_id in feedbacks:
+                    feedbacks[stage_id].clear()
+
+                if outcome is not None:
+                    outcomes[stage_id][outcome['outcome_id']] = outcome
+
+                for feedback_id, text in feedback.items():
+                    feedbacks[stage_id][feedback_id] = text
+
+            if result in Controller.RESULTS_FAILED:
+                succeeded = False
+                label = submission if stage_id is None \
+                        else f'{submission} ({stage_id})'
+                sys.stderr.write(f'{label}: {error}\n')
+
+        print(f'{submission}: {outcomes.score}')
+
+        return succeeded
+
+    def execute_stage(self, stage_id = None):
+        raise stage.StageError('Stages cannot be selected in batch mode')
+
+    def refresh_stage(self, stage_id):
+        raise stage.StageIgnorableError('Stages cannot be refreshed in batch' +
+                                        ' mode')
+
+    def report(self, result, stage_id = None, stage_info = None):
+        raise stage.StageError('Stages report to their worker in batch mode')
+
+
+
+class _WorkerController(object):
+    def __init__(self, submission, workspace):
+        """Stand-in for a controller that is given to the stages executed in
+        a worker process. There is no view, and the model is in the parent
+        process, so stages only report their outcomes and feedback through
+        the `StageResult` they return.
+
+        Arguments:
+        submission -- Identifier of the submission being scored.
+        workspace -- Directory to score the submission in.
+        """
+        self.model      = None
+        self.view       = None
+        self.submission = submission
+        self.workspace  = workspace
+
+    def set_stage_output(self, stage_id, output):
+        """Outputs are never shown in batch mode."""
+        pass
+
+
+
+def _init_worker(sections):
+    """Replace the configuration of a worker process with a copy of the
+    configuration of the batch controller.
+
+    Arguments:
+    sections -- Dictionary of the options in each section.
+    """
+    config.ini.clear()
+    config.ini.read_dict(sections)
+
+
+
+def _score_submission(submission, stage_ids):
+    """Execute each non-interactive stage for a submission, in order. 
+    Stages that depend on a stage that failed are not executed, but 
+    interactive stages that are skipped don't prevent the stages that depend
+    on them from being executed. This is run in a worker process, so only the
+    elements of each result that can be stored in the model are returned.
+
+    Arguments:
+    submission -- Identifier of the submission.
+    stage_ids -- Identifiers of the stages, in an order such that every stage
+        is after the stages it depends on.
+
+    Returns:
+    A list of (stage_id, result, outcome, feedback, error) for each stage
+    executed, where `outcome` is a dictionary or None.
+    """
+    # workspaces are removed by the batch controller, once it has the results
+    controller = _WorkerController(submission,
+                                   workspace.workspaces.acquire(submission))
+    reports    = []
+    blocked    = set()
+
+    for stage_id in stage_ids:
+        stage_cfg = config.ini.compiled.get_stage(stage_id)
+        feedback  = {}
+
+        if any(depend_id in blocked for depend_id in stage_cfg.depends):
+            blocked.add(stage_id)
+            continue
+
+        try:
+            handler  = stage.StageInfo.import_handler(stage_id)
+            instance = handler(stage_id)
+            if instance.interactive:
+                continue
+
+            instance.set_framework(controller)
+
+            if stage_cfg.feedback_pre is not None:
+                feedback['__pre'] = stage_cfg.feedback_pre
+
+            if isinstance(instance, stage.HandlerNone):
+                result = stage.StageResult(stage.StageResult.RESULT_PASS)
+            else:
+                result = instance.run()
+                if result is None:
+                    result = stage.StageResult(
+                        stage.StageResult.RESULT_PASS_NONFINAL)
+        except Exception as e:
+            result = stage.StageResult(stage.StageResult.RESULT_CRITICAL)
+            result.set_error('Failed to execute stage: ' + str(e))
+
+        feedback.update(result.feedback)
+
+        feedback_post = stage_cfg.feedback_post
+        if feedback_post is not None and len(feedback_post.strip()) > 0:
+            feedback['__post'] = feedback_post
+
+        outcome = result.outcome.dict if result.outcome else None
+        reports.append((stage_id, result.result, outcome, feedback,
+                        result.error))
+
+        if result.result in Controller.RESULTS_FAILED:
+            blocked.add(stage_id)
+
+    return reports
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+from pyfeedbacker.app import stage
+
+import concurrent.futures
+import threading
+
+
+
+class StageExecutor(object):
+    def __init__(self, workers = None, deliver = None):
+        """Execute stages in a bounded pool of background threads. Each task
+        is identified by a key (e.g., the stage identifier), and only one task
+        per key can be pending at once, so repeatedly executing a stage
+        doesn't pile up executions of the stage.
+
+        Results are passed to a callback through `deliver`, so that the
+        callback can be called on the UI thread.
+
+        Keyword arguments:
+        workers -- Maximum number of stages to execute at once, or None for
+            the default number of threads of a `ThreadPoolExecutor`.
+        deliver -- Function that is passed a function with no arguments, and
+            should call it on the UI thread. If None, callbacks are called on
+            the thread that executed the stage.
+        """
+        self._pool    = concurrent.futures.ThreadPoolExecutor(
+            max_workers        = workers,
+            thread_name_prefix = 'stage')
+        self._deliver = deliver or (lambda callback: callback())
+        self._tasks   = {}
+        self._lock    = threading.Lock()
+
+    def submit(self, key, instance, function, callback, timeout = None):
+        """Execute a function of a stage in the background. Any task already
+        pending for `key` is cancelled first.
+
+        Arguments:
+        key -- Identifier of the task.
+        instance -- The `HandlerBase` instance the function belongs to, which
+            is asked to stop if the task is cancelled or times out.
+        function -- Function to execute, which should return a `StageResult`
+            or None, or a `concurrent.futures.Future` of one (e.g., of a
+            command running in an event loop), in which case the task waits
+            for the future without holding a thread of the pool.
+        callback -- Function that is passed the `StageResult`, unless the
+            result is None or the task is cancelled.
+
+        Keyword arguments:
+        timeout -- Number of seconds after which the task is cancelled and
+            an error result is passed to `callback`, or None to never time out.
+
+        Returns:
+        The `concurrent.futures.Future` of the task.
+        """
+        self.cancel(key)
+
+        task = _Task(key, instance, callback)
+        instance.cancelled = False
+
+        with self._lock:
+            self._tasks[key] = task
+            task.future = self._pool.submit(function)
+
+            if timeout is not None:
+                task.timer = threading.Timer(timeout,
+                                             self._on_timeout,
+                                             [task, timeout])
+                task.timer.daemon = True
+                task.timer.start()
+
+        task.future.add_done_callback(lambda f: self._on_done(task))
+
+        return task.future
+
+    def is_pending(self, key):
+        """Determine if a task is queued or executing.
+
+        Arguments:
+        key -- Identifier of the task.
+        """
+        with self._lock:
+            return key in self._tasks
+
+    def cancel(self, key):
+        """Cancel a task. If the task is queued, it is never executed, and if
+        it is executing, the stage is asked to stop. The task's callback will
+        not be called.
+
+        Arguments:
+        key -- Identifier of the task.
+
+        Returns:
+        True if a task was pending, False otherwise.
+        """
+        with self._lock:
+            task = self._tasks.pop(key, None)
+            if task is None:
+                return False
+
+            task.finish()
+
+        if not task.future.cancel():
+            task.instance.cancel()
+
+        return True
+
+    def cancel_all(self):
+        """Cancel every pending task, e.g., when the stages they belong to
+        are no longer needed."""
+        with self._lock:
+            keys = list(self._tasks)
+
+        for key in keys:
+            self.cancel(key)
+
+    def shutdown(self):
+        """Cancel all pending tasks and stop accepting new tasks."""
+        self.cancel_all()
+
+        self._pool.shutdown(wait = False, cancel_futures = True)
+
+    def _on_done(self, task):
+        """Called on the executing thread when a task's function returns, or
+        when the future it returned is done.
+
+        Arguments:
+        task -- The task that has finished.
+        """
+        future = task.future
+        result = None
+
+        if not future.cancelled():
+            try:
+                result = future.result()
+            except Exception as e:
+                result = stage.StageResult(stage.StageResult.RESULT_CRITICAL)
+                result.set_error('Stage failed to execute: ' + str(e))
+
+            # wait for the future instead, so that cancelling the task
+            # cancels the future
+            if isinstance(result, concurrent.futures.Future):
+                with self._lock:
+                    finished = task.finished
+                    if not finished:
+                        task.future = result
+
+                if finished:
+                    result.cancel()
+                else:
+                    result.add_done_callback(lambda f: self._on_done(task))
+                return
+
+        with self._lock:
+            if task.finished:
+                return
+
+            task.finish()
+            if self._tasks.get(task.key) is task:
+                del self._tasks[task.key]
+
+        if result is not None:
+            self._deliver(lambda: task.callback(result))
+
+    def _on_timeout(self, task, timeout):
+        """Called on a timer thread when a task has taken too long. The stage
+        is asked to stop and an error result is delivered straight away,
+        without waiting for the stage to stop.
+
+        Arguments:
+        task -- The task that has taken too long.
+        timeout -- Number of seconds the task was allowed to take.
+        """
+        with self._lock:
+            if task.finished:
+                return
+
+            task.finish()
+            if self._tasks.get(task.key) is task:
+                del self._tasks[task.key]
+
+        if not task.future.cancel():
+            task.instance.cancel()
+
+        result = stage.StageResult(stage.StageResult.RESULT_ERROR)
+        result.set_output(task.instance.output)
+        result.set_error(f'The stage did not finish within {timeout:g} ' +
+                         'seconds.')
+
+        self._deliver(lambda: task.callback(result))
+
+
+
+class _Task(object):
+    def __init__(self, key, instance, callback):
+        """A function of a stage submitted to a `StageExecutor`.
+
+        Arguments:
+        key -- Identifier of the task.
+        instance -- The `HandlerBase` instance the function belongs to.
+        callback -- Function that is passed the `StageResult`.
+        """
+        self.key      = key
+        self.instance = instance
+        self.callback = callback
+        self.future   = None
+        self.timer    = None
+        self.finished = False
+
+    def finish(self):
+        """Mark the task as finished (i.e., completed, cancelled or timed
+        out), so that its result is only handled once."""
+        self.finished = True
+
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+
+def chain(future, function):
+    """Retrieve a future of the result of a function that is passed the
+    result of another future once it is done. Cancelling the returned future
+    cancels the other future.
+
+    Arguments:
+    future -- A `concurrent.futures.Future`.
+    function -- Function that is passed the result of `future`.
+    """
+    chained = concurrent.futures.Future()
+
+    def done(future):
+        if future.cancelled():
+            chained.cancel()
+            return
+
+        if not chained.set_running_or_notify_cancel():
+            return
+
+        try:
+            chained.set_result(function(future.result()))
+        except Exception as e:
+            chained.set_exception(e)
+
+    chained.add_done_callback(lambda f: f.cancelled() and future.cancel())
+    future.add_done_callback(done)
+
+    return chained
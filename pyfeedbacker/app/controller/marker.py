@@ -2,6 +2,7 @@
 
 from pyfeedbacker.app import stage
 from pyfeedbacker.app.controller import base
+from pyfeedbacker.app.model import engine
 
 
 
@@ -17,8 +18,9 @@ class Controller(base.BaseController):
         """
         super().set_model(model)
 
-        self.marks     = model.marks
-        self.outcomes  = model.outcomes
+        self.marks        = model.marks
+        self.outcomes     = model.outcomes
+        self.marks_engine = engine.MarksEngine(model)
 
         return self
 
@@ -188,7 +190,36 @@ class Controller(base.BaseController):
     def save_and_close(self):
         """Save the model to permanent storage and close the application.
         
-        Ensures marks are saved.
+        Ensures marks are saved, showing progress as the final feedback for
+        each submission is generated, and then how many feedback files were
+        generated, along with any placeholders in the feedback that don't
+        have a value.
         """
-        self.model.save(True)
-        self.view.quit()
+        self.model.progress = lambda done, total: self.view.show_progress(
+            'Saving final feedback', done, total)
+        try:
+            self.model.save(True)
+        finally:
+            self.model.progress = None
+
+        report  = getattr(self.model, 'finalise_report', None)
+        unknown = getattr(self.model, 'unknown_placeholders', {})
+        if report is None and len(unknown) == 0:
+            self.view.quit()
+            return
+
+        text = ''
+        if report is not None:
+            text += f'{report["rendered"]} feedback files were generated, ' +\
+                    f'{report["skipped"]} were unchanged and ' +\
+                    f'{report["deleted"]} were deleted.'
+
+        if len(unknown) > 0:
+            text += '\n\nThese placeholders have no value and were left as ' +\
+                    'they are:\n'
+            for name, submissions in sorted(unknown.items()):
+                text += f'\n##{name}## ({len(submissions)} submissions)'
+
+        self.view.show_alert('Marks saved',
+                             text.strip(),
+                             self.view.ALERT_HALT)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+from pyfeedbacker.app import config, stage, workspace
+
+import threading
+
+
+
+class SubmissionPrefetch(object):
+    # results of a stage that allow the stages that depend on it to execute
+    RESULTS_COMPLETE = (stage.StageResult.RESULT_PASS,
+                        stage.StageResult.RESULT_PASS_NONFINAL,
+                        stage.StageResult.RESULT_PARTIAL)
+
+    def __init__(self, submission, stage_ids):
+        """Execute the stages of a submission that don't need a user (e.g.,
+        staging the workspace, or running tests) in a background thread,
+        before the submission is scored, so that the results are ready as
+        soon as the submission is.
+
+        Results are kept here, rather than stored in the model, until the
+        scorer reaches the submission and takes them. A stage is only
+        executed if every stage it depends on was executed and completed, so
+        no stage is executed any earlier than the scorer would execute it
+        relative to the stages it depends on.
+
+        Arguments:
+        submission -- Identifier of the submission.
+        stage_ids -- Identifiers of the stages, in an order such that every
+            stage is after the stages it depends on.
+        """
+        self.submission = submission
+        self.stage_ids  = stage_ids
+        self.workspace  = None
+        self.cancelled  = False
+
+        self._results   = {}
+        self._instance  = None
+        self._lock      = threading.Lock()
+
+        # the thread doesn't stop the application from quitting, as anything
+        # it hasn't executed is executed when the submission is scored
+        self._thread    = threading.Thread(target = self._run,
+                                           name   = 'prefetch',
+                                           daemon = True)
+
+    def start(self):
+        """Start executing the stages in the background."""
+        self._thread.start()
+
+    def cancel(self):
+        """Stop executing stages. The stage executing now is asked to stop,
+        and its result is discarded. Stages that don't check whether they
+        have been cancelled carry on until they return, so use `join` before
+        using the workspace."""
+        with self._lock:
+            self.cancelled = True
+            instance       = self._instance
+
+        if instance is not None:
+            instance.cancel()
+
+    def join(self):
+        """Wait until no more stages are executing (e.g., after cancelling
+        the prefetch), so that nothing is still writing to the workspace."""
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def pop(self, stage_id):
+        """Take the result of a stage, so that it is only used once.
+
+        Arguments:
+        stage_id -- Identifier of the stage.
+
+        Returns:
+        (instance, result), where `instance` is the handler that executed the
+        stage and `result` is its `StageResult`, or None if the stage hasn't
+        been executed (yet) or didn't return a result.
+        """
+        with self._lock:
+            return self._results.pop(stage_id, None)
+
+    def _run(self):
+        """Execute each stage in order, until every stage has been executed
+        or the prefetch is cancelled."""
+        self.workspace = workspace.workspaces.acquire(self.submission)
+        controller     = _PrefetchController(self.submission, self.workspace)
+        completed      = set()
+
+        for stage_id in self.stage_ids:
+            stage_cfg = config.ini.compiled.get_stage(stage_id)
+            if any(depend_id not in completed
+                   for depend_id in stage_cfg.depends):
+                continue
+
+            instance = None
+            try:
+                handler  = stage.StageInfo.import_handler(stage_id)
+                instance = handler(stage_id)
+
+                # stages that execute nothing are always complete, and
+                # interactive stages need the user
+                if isinstance(instance, stage.HandlerNone):
+                    completed.add(stage_id)
+                    continue
+                elif instance.interactive:
+                    continue
+
+                with self._lock:
+                    if self.cancelled:
+                        return
+                    self._instance = instance
+
+                instance.set_framework(controller)
+                instance.cancelled = False
+
+                result = instance.run()
+            except Exception as e:
+                result = stage.StageResult(stage.StageResult.RESULT_CRITICAL)
+                result.set_error('Failed to execute stage: ' + str(e))
+
+            with self._lock:
+                self._instance = None
+                if self.cancelled:
+                    return
+
+                # stages that don't return a result report it to the
+                # controller, so they are executed again once the submission
+                # is scored
+                if result is None:
+                    continue
+
+                self._results[stage_id] = (instance, result)
+
+            if result.result in SubmissionPrefetch.RESULTS_COMPLETE:
+                completed.add(stage_id)
+
+
+
+class _PrefetchController(object):
+    def __init__(self, submission, workspace):
+        """Stand-in for a controller that is given to the stages executed
+        by a prefetch. The stages aren't shown, and must not change the
+        model before the submission is scored, so stages only report their
+        outcomes, feedback and output through the `StageResult` they return.
+
+        Arguments:
+        submission -- Identifier of the submission being prefetched.
+        workspace -- Directory to score the submission in.
+        """
+        self.model      = None
+        self.view       = None
+        self.submission = submission
+        self.workspace  = workspace
+
+    def set_stage_output(self, stage_id, output):
+        """Outputs are shown once the submission is scored."""
+        pass
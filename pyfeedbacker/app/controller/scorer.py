@@ -1,20 +1,46 @@
 # -*- coding: utf-8 -*-
 
-from pyfeedbacker.app import stage
+from pyfeedbacker.app import config, stage, workspace
 from pyfeedbacker.app.view import urwid as view
-from pyfeedbacker.app.controller import base
+from pyfeedbacker.app.controller import base, executor, prefetch
 
-import threading
+import collections
 
 
 
 class Controller(base.BaseController):
-    def __init__(self, submission):
+    def __init__(self, submission, queue = None):
         """Controller for scoring a submission by a student and generating scores and feedback, separated by 'stages'.
+
+        Arguments:
+        submission -- Identifier of the submission to score.
+
+        Keyword arguments:
+        queue -- Identifiers of submissions to score after `submission`, in
+            the same session, or None to close once it has been scored.
         """
         super().__init__()
 
         self.submission      = submission
+        self.queue           = collections.deque(queue or [])
+
+        # whether the first stages have been executed
+        self._started        = False
+
+        # incremented whenever the scorer moves on to another submission, so
+        # that results still waiting to be delivered for the previous
+        # submission can be discarded
+        self._generation     = 0
+
+        # stages that aren't interactive are executed in the background
+        self.executor        = executor.StageExecutor(
+            workers = config.ini.compiled.stage_workers,
+            deliver = self._deliver)
+
+        # the next submission in the queue is prepared in the background, and
+        # the results are used once the scorer reaches it
+        self.prefetch        = None
+        self._prefetched     = None
 
     def set_model(self, model):
         """Set the model that'll store information about a submission
@@ -31,6 +57,121 @@ class Controller(base.BaseController):
 
         return self
 
+    def start(self):
+        """Start the application in the submission's workspace, and once the
+        view is closed, cancel any stages that are still executing."""
+        workspace.workspaces.sweep()
+        self.workspace = workspace.workspaces.acquire(self.submission)
+
+        try:
+            super().start()
+        finally:
+            self.executor.shutdown()
+            workspace.workspaces.release(self.submission)
+
+            if self.prefetch is not None:
+                self.prefetch.cancel()
+                self.prefetch.join()
+                workspace.workspaces.release(self.prefetch.submission)
+
+    @staticmethod
+    def is_marked(model, submission):
+        """Determine if a submission has been scored, i.e., it has a score or
+        any feedback in the model.
+
+        Arguments:
+        model -- Root model.
+        submission -- Identifier of the submission.
+        """
+        # models that load submissions lazily know without loading them
+        is_marked = getattr(model, 'is_marked', None)
+        if is_marked is not None:
+            return is_marked(submission)
+
+        outcomes  = model.outcomes.get(submission)
+        feedbacks = model.feedbacks.get(submission)
+
+        return (outcomes is not None and outcomes.score != 0.0) or \
+               (feedbacks is not None and len(feedbacks.str) > 0)
+
+    def save_and_close(self):
+        """Save the model to permanent storage and, if there are submissions
+        left in the queue, move on to the next one. Otherwise, close the
+        application."""
+        if len(self.queue) == 0:
+            return super().save_and_close()
+
+        self.model.save()
+        self.next_submission()
+
+    def next_submission(self):
+        """Start scoring the next submission in the queue, keeping the model,
+        view and configuration that have already been loaded. Anything still
+        executing for the current submission is cancelled, and every stage
+        is reset so that it is executed again."""
+        self.executor.cancel_all()
+        self._generation += 1
+
+        if self.current_stage is not None:
+            curr_stage_id = self.current_stage[0]
+            try:
+                instance = self.stages_handlers[curr_stage_id]
+                instance.on_close()
+            except BaseException as e:
+                stage_info = self.stages[curr_stage_id]
+                self.view.show_alert(stage_info.label,
+                                     "Error on stage close: " + str(e),
+                                     stage_info.halt_on_error)
+
+        workspace.workspaces.release(self.submission)
+
+        # stop preparing the next submission, but keep what is ready. The
+        # stage being prefetched may not stop straight away, and must not
+        # write to the workspace while the submission is being scored in it
+        self._prefetched, self.prefetch = self.prefetch, None
+        if self._prefetched is not None:
+            self._prefetched.cancel()
+            self._prefetched.join()
+            if self._prefetched.submission != self.queue[0]:
+                workspace.workspaces.release(self._prefetched.submission)
+                self._prefetched = None
+
+        self.submission = self.queue.popleft()
+        self.workspace  = workspace.workspaces.acquire(self.submission)
+        self.feedbacks  = self.model.feedbacks[self.submission]
+        self.outcomes   = self.model.outcomes[self.submission]
+
+        self._started      = False
+        self.current_stage = None
+        self._create_stages()
+
+        self.view.reset_stages(self.stages)
+        self.execute_first_stage()
+
+    def _deliver(self, callback):
+        """Call a function from the executor on the UI thread.
+
+        Arguments:
+        callback -- Function with no arguments.
+        """
+        self.view.call_soon(callback)
+
+    def _for_submission(self, callback):
+        """Wrap a function so that it does nothing if it is called after the
+        scorer has moved on to another submission (e.g., a stage's result
+        that was waiting to be delivered when the submission changed).
+
+        Arguments:
+        callback -- Function to wrap.
+        """
+        generation = self._generation
+
+        def call(*args):
+            if generation == self._generation:
+                callback(*args)
+
+        return call
+
     def execute_first_stage(self):
         """Execute the first stage in the list. This is the callback function
         from the UI, which the UI should trigger when it has loaded.
@@ -42,7 +183,7 @@ class Controller(base.BaseController):
         """
         self.view.set_score(self.outcomes.score)
 
-        if self._next_stage_id is not None:
+        if self._started:
             return
 
         if self.outcomes.score != 0.0 or len(self.feedbacks.str) > 0:
@@ -71,9 +212,46 @@ class Controller(base.BaseController):
         self._execute_first_stage()
 
     def _execute_first_stage(self):
-        """Execute the first stage in the application."""
-        self._next_stage_id = self.stages_ids[0]
-        self.execute_stage(self._next_stage_id)
+        """Execute every stage that doesn't depend on another stage."""
+        self._started = True
+        self.execute_ready_stages()
+        self._start_prefetch()
+
+    def _start_prefetch(self):
+        """Start executing the stages of the next submission in the queue
+        that don't need the user, in the background, unless disabled by the
+        `prefetch` option in the `[scorer]` section of the configuration."""
+        if self.prefetch is not None or len(self.queue) == 0 or \
+                not config.ini.compiled.prefetch:
+            return
+
+        self.prefetch = prefetch.SubmissionPrefetch(self.queue[0],
+                                                    self.get_stage_order())
+        self.prefetch.start()
+
+    def execute_ready_stages(self, stage_ids = None):
+        """Execute every stage whose dependencies are complete. Stages that
+        run in the background are executed at the same time, but only the 
+        first of the stages is shown.
+
+        Keyword arguments:
+        stage_ids -- Only consider these stages, or all stages if None.
+        """
+        show = True
+        for stage_id in self.get_ready_stage_ids(stage_ids):
+            self.execute_stage(stage_id, show)
+            show = False
+
+    def set_stage_output(self, stage_id, output):
+        """Set the output for a particular stage. Stages may update their
+        output from any thread, so the view is updated on the UI thread.
+        
+        Arguments:
+        stage_id -- Unique textual identifier for the stage.
+        output -- An output instance that extends `OutputBase`
+        """
+        self._deliver(self._for_submission(
+            lambda: self.view.set_stage_output(stage_id, output)))
 
     def set_feedback(self, stage_id, feedback_id, value):
         """Set a feedback value in the model.
@@ -109,6 +287,9 @@ class Controller(base.BaseController):
 
         curr_stage_id = self.current_stage[0]
         if self.current_stage[0] != stage_id:
+            # a refresh of the stage isn't needed once it is no longer shown
+            self.executor.cancel((curr_stage_id, 'refresh'))
+
             try:                
                 instance = self.stages_handlers[curr_stage_id]
                 instance.on_close()
@@ -120,7 +301,7 @@ class Controller(base.BaseController):
 
         stage_info = self.stages[stage_id]
 
-        if self._next_stage_id == stage_id:
+        if self.is_stage_ready(stage_id):
             self.view.show_stage(stage_id, stage_info.label)
             self.execute_stage(stage_id)
         else:
@@ -130,24 +311,18 @@ class Controller(base.BaseController):
                 pass
             self.view.show_stage(stage_id, stage_info.label)
 
-    def execute_stage(self, stage_id = None):
+    def execute_stage(self, stage_id = None, show = True):
         """Execute a stage if it hasn't been executed yet.
         
         Keyword arguments:
         stage_id -- Stage to execute, or the next valid stage if None is 
             provided
+        show -- Show the stage while it is executed (default: True)
         """
         if stage_id not in self.stages:
             raise stage.StageError(f'The id {stage_id} does not correspond to' +
                                    ' an expected stage')
 
-        if self._next_stage_id is not stage_id:
-            raise stage.StageError(f'The stage {stage_id} is not ready for ' +
-                                   'execution')
-
-        self._next_stage_id = None
-
-        list_stages_info = list(self.stages.items())
         stage_info       = self.stages[stage_id]
 
         # don't do anything if the stage has failed
@@ -158,15 +333,20 @@ class Controller(base.BaseController):
         if stage_info.state is not stage.StageInfo.STATE_INACTIVE:
             return
 
+        if not self.is_stage_ready(stage_id):
+            raise stage.StageError(f'The stage {stage_id} is not ready for ' +
+                                   'execution')
+
         # add feedback
         if stage_info.feedback_pre is not None:
             self.set_feedback(stage_id, '__pre', stage_info.feedback_pre)
 
         # retrieve the handler
-        self.current_stage = (stage_id, stage_info)
-        state = stage.StageInfo.STATE_ACTIVE
+        if show:
+            self.current_stage = (stage_id, stage_info)
+            self.view.show_stage(stage_id, stage_info.label)
 
-        self.view.show_stage(stage_id, stage_info.label)
+        state = stage.StageInfo.STATE_ACTIVE
 
         instance = None
         try:
@@ -177,7 +357,7 @@ class Controller(base.BaseController):
         except Exception as e:
             result = stage.StageResult(stage.StageResult.RESULT_CRITICAL)
             result.set_error('Failed to start stage handler: ' + str(e))
-            self.report(result)
+            self.report(result, stage_id, stage_info)
             if self.debug:
                 raise e
             return
@@ -185,49 +365,62 @@ class Controller(base.BaseController):
         # execute the stage
         if isinstance(instance, stage.HandlerNone):
             state = stage.StageInfo.STATE_COMPLETE
-            self.view.set_stage_state(self.current_stage[0], state)
-
-            next_stage_id = self.get_next_stage_id(stage_id)
-            next_stage    = self.stages[next_stage_id]
-
-            if next_stage.state == stage.StageInfo.STATE_INACTIVE:
-                self._next_stage_id = next_stage_id
-
-            if self.progress_on_success:
-                self.execute_stage(next_stage_id)
+            stage_info.set_state(state)
+            self.view.set_stage_state(stage_id, state)
 
             # add post feedback for None as report() is never called
             feedback_post = stage_info.feedback_post
             if feedback_post is not None and len(feedback_post.strip()) > 0:
                 self.set_feedback(stage_id, '__post', feedback_post)
+
+            if self.progress_on_success:
+                self.execute_ready_stages(self.stages_dependants[stage_id])
         elif isinstance(instance, stage.HandlerForm):
             state = stage.StageInfo.STATE_ACTIVE
-            self.view.set_stage_state(self.current_stage[0], state)
-            self.set_stage_output(self.current_stage[0], instance.output)
+            stage_info.set_state(state)
+            self.view.set_stage_state(stage_id, state)
+            self.set_stage_output(stage_id, instance.output)
         else:
             state  = stage.StageInfo.STATE_ACTIVE
-            self.view.set_stage_state(self.current_stage[0], state)
-
-            thread = threading.Thread(target = self._execute_stage,
-                                      args   = [instance])
-            thread.daemon = True
-            self._a_stage_is_active = True
-            thread.start()
+            stage_info.set_state(state)
+            self.view.set_stage_state(stage_id, state)
 
-    def _execute_stage(self, instance):
-        """Function to execute a stage that should be called from a background
-        thread.
+            # the stage may already have been executed in the background
+            # while the previous submission was being scored, in which case
+            # the handler that executed it replaces the new handler
+            if self._prefetched is not None:
+                prefetched = self._prefetched.pop(stage_id)
+                if prefetched is not None:
+                    prefetched_instance, result = prefetched
+                    if prefetched_instance is not None:
+                        prefetched_instance.set_controller(self)
+                        self.stages_handlers[stage_id] = prefetched_instance
+
+                    self._on_stage_result(stage_id, result)
+                    return
+
+            # stages that run a command in the background return a future of
+            # the result, so that no thread waits for the command
+            self.executor.submit(
+                key      = (stage_id, 'run'),
+                instance = instance,
+                function = getattr(instance, 'run_async', instance.run),
+                callback = self._for_submission(
+                    lambda result: self._on_stage_result(stage_id, result)),
+                timeout  = config.ini.compiled.get_stage(stage_id).timeout)
+
+    def _on_stage_result(self, stage_id, result):
+        """Called on the UI thread when a stage executing in the background
+        has finished.
         
         Arguments:
-        instance -- Subclass of HandlerBase that contains the main code for the
-            stage.
+        stage_id -- Stage that has finished.
+        result -- A StageResult instance.
         """
-        result = instance.run()
-        if result:
-            try:
-                self.report(result)
-            except stage.StageError as se:
-                self.view.show_alert('Error', str(se))
+        try:
+            self.report(result, stage_id, self.stages[stage_id])
+        except stage.StageError as se:
+            self.view.show_alert('Error', str(se))
 
     def refresh_stage(self, stage_id):
         """Refresh a stage's output.
@@ -239,9 +432,50 @@ class Controller(base.BaseController):
         if stage_id not in self.stages_handlers:
             raise stage.StageIgnorableError('Stage has not yet executed.')
 
+        if self.executor.is_pending((stage_id, 'run')):
+            raise stage.StageIgnorableError('Stage is still executing.')
+
         instance = self.stages_handlers[stage_id]
-        instance.refresh()
-        self.set_stage_output(stage_id, instance.output)
+
+        if instance.interactive:
+            instance.refresh()
+            self.set_stage_output(stage_id, instance.output)
+            return
+
+        # stages that aren't interactive may take a while to refresh (e.g.,
+        # by running a command), so refresh them in the background
+        def get_result(refreshed):
+            result = stage.StageResult(stage.StageResult.RESULT_PASS_NONFINAL)
+            result.set_output(instance.output)
+            return result
+
+        def refresh():
+            if hasattr(instance, 'refresh_async'):
+                return executor.chain(instance.refresh_async(), get_result)
+
+            return get_result(instance.refresh())
+
+        self.executor.submit(
+            key      = (stage_id, 'refresh'),
+            instance = instance,
+            function = refresh,
+            callback = self._for_submission(
+                lambda result: self._on_stage_refreshed(stage_id, result)),
+            timeout  = config.ini.compiled.get_stage(stage_id).timeout)
+
+    def _on_stage_refreshed(self, stage_id, result):
+        """Called on the UI thread when a stage has been refreshed in the
+        background.
+        
+        Arguments:
+        stage_id -- Stage that has been refreshed.
+        result -- A StageResult instance.
+        """
+        if result.output is not None:
+            self.set_stage_output(stage_id, result.output)
+
+        if result.result != stage.StageResult.RESULT_PASS_NONFINAL:
+            self.view.show_alert(self.stages[stage_id].label, result.error)
 
     def report(self, result, stage_id=None, stage_info=None):
         """Handle the report generated when a stage completes execution and 
@@ -276,37 +510,28 @@ class Controller(base.BaseController):
         if result.result == stage.StageResult.RESULT_PASS or \
                 result.result == stage.StageResult.RESULT_PASS_NONFINAL:
             state = stage.StageInfo.STATE_COMPLETE
+            stage_info.set_state(state)
             self.view.set_stage_state(stage_id, state)
 
             if result.output is not None:
                 self.set_stage_output(stage_id, result.output)
-            try:
-                next_stage_id = self.get_next_stage_id(stage_id)
-                next_stage    = self.stages[next_stage_id]
-
-                if next_stage.state == stage.StageInfo.STATE_INACTIVE:
-                    self._next_stage_id = next_stage_id
-
-                if result.result == stage.StageResult.RESULT_PASS and \
-                        self.progress_on_success:
-                    self.execute_stage(next_stage_id)
-            except KeyError:
-                pass
 
         elif result.result == stage.StageResult.RESULT_PARTIAL:
             state = stage.StageInfo.STATE_COMPLETE
+            stage_info.set_state(state)
             self.view.set_stage_state(stage_id, state)
             self.set_stage_output(stage_id, result.output)
 
         else:
             state  = stage.StageInfo.STATE_FAILED
+            stage_info.set_state(state)
 
+            # stages that depend on a failed stage can never be executed
             if stage_info.halt_on_error:
-                for _, stage_ in self.stages.items():
-                    stage_.set_state(stage.StageInfo.STATE_FAILED)
+                self.fail_dependant_stages(stage_id)
 
-            self.view.set_stage_state(self.current_stage[0], state)
-            self.set_stage_output(self.current_stage[0], result.output)
+            self.view.set_stage_state(stage_id, state)
+            self.set_stage_output(stage_id, result.output)
 
             self.view.show_alert(stage_info.label,
                                  result.error,
@@ -316,3 +541,8 @@ class Controller(base.BaseController):
         if feedback_post is not None and len(feedback_post.strip()) > 0:
             self.set_feedback(stage_id, '__post', feedback_post)
 
+        # execute the stages that were waiting on this stage
+        if result.result == stage.StageResult.RESULT_PASS and \
+                self.progress_on_success:
+            self.execute_ready_stages(self.stages_dependants[stage_id])
+
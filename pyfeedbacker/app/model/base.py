@@ -25,11 +25,19 @@ class AbstractModelContainer(OrderedDict):
         self._root_model      = root_model
         self._child_data_type = child_data_type
         self._parent_data_id  = parent_data_id
+        self._parent          = None
+
+        # identifier each mutable value is stored under, keyed by `id(value)`
+        self._index           = {}
+
+        # values calculated from the data, cleared whenever the data changes
+        self._cache           = {}
 
     def __getitem__(self, data_id):
         """Retrieve an item using the square bracket syntax. If a particular 
         `data_id` doesn't exist, then one will be created with an initialised
-        value passed into `__init__`.
+        value passed into `__init__`. Creating an empty value isn't a change,
+        so it isn't reported until something is stored in it.
 
         Arguments:
         data_id -- Identifier for a piece of data, will be converted to a 
@@ -47,7 +55,7 @@ class AbstractModelContainer(OrderedDict):
             else:
                 new_obj = self._child_data_type(self._root_model)
     
-            self.__setitem__(data_id, new_obj)
+            AbstractModelContainer._load_item(self, data_id, new_obj)
             return new_obj
 
     def __setitem__(self, data_id, value):
@@ -61,12 +69,7 @@ class AbstractModelContainer(OrderedDict):
         data_id = str(data_id)
 
         # If value is inserted somewhere else, delete the existing one
-        try:
-            existing_index = list(self.values()).index(value)
-            existing_key = list(self.keys())[existing_index]
-            del self[existing_key]
-        except:
-            pass
+        self._remove_existing(value)
 
         # If the data_id is not correct inside value, change it
         try:
@@ -76,7 +79,138 @@ class AbstractModelContainer(OrderedDict):
         except:
             pass
 
-        return super().__setitem__(data_id, value)
+        # Changes to the value are propagated up through this container
+        try:
+            value._parent = self
+        except AttributeError:
+            pass
+
+        self._index_value(data_id, value)
+        super().__setitem__(data_id, value)
+        self._on_change((data_id,), value)
+
+    def _load_item(self, data_id, value):
+        """Set an item loaded from permanent storage. Loaded data can't
+        already be stored in this container, so this skips the checks made by
+        `__setitem__`, and as it isn't a change, it isn't reported.
+
+        Arguments:
+        data_id -- Identifier for a piece of data, will be converted to a 
+            string if it isn't already a string.
+        value -- The value to store in the model.
+        """
+        data_id = str(data_id)
+
+        try:
+            value._parent_data_id = data_id
+        except AttributeError:
+            pass
+
+        try:
+            value._parent = self
+        except AttributeError:
+            pass
+
+        self._index_value(data_id, value)
+        super().__setitem__(data_id, value)
+        self._cache.clear()
+
+    def _index_value(self, data_id, value):
+        """Record the identifier a value is stored under, replacing whatever
+        value was stored under it before. Only values that track the container
+        they are stored in (i.e., containers, outcomes and marks) are indexed,
+        as immutable values that are equal may be the same object.
+
+        Arguments:
+        data_id -- Identifier the value is to be stored under.
+        value -- The value to be stored.
+        """
+        existing_value = super().get(data_id)
+        if existing_value is not None and existing_value is not value:
+            self._index.pop(id(existing_value), None)
+
+        if hasattr(value, '_parent'):
+            self._index[id(value)] = data_id
+
+    def _remove_existing(self, value):
+        """If a value is already stored in this container, delete it so that
+        it can be moved to a different identifier.
+
+        Arguments:
+        value -- The value about to be stored.
+        """
+        existing_key = self._index.get(id(value))
+        if existing_key is not None and super().get(existing_key) is value:
+            del self[existing_key]
+
+    def __delitem__(self, data_id):
+        """Delete an item using the square bracket syntax.
+
+        Arguments:
+        data_id -- Identifier for a piece of data, will be converted to a 
+            string if it isn't already a string.
+        """
+        data_id = str(data_id)
+        value = super().__getitem__(data_id)
+        super().__delitem__(data_id)
+        self._index.pop(id(value), None)
+
+        if getattr(value, '_parent', None) is self:
+            value._parent = None
+
+        self._on_change((data_id,), deleted = True)
+
+    def clear(self):
+        """Delete all items in the container."""
+        for value in self.values():
+            if getattr(value, '_parent', None) is self:
+                value._parent = None
+
+        super().clear()
+        self._index.clear()
+        self._on_change((), {})
+
+    def _on_change(self, path, value = None, deleted = False):
+        """Propagate a change to the data inside this container up to the 
+        parent container, and eventually the root model.
+
+        Arguments:
+        path -- Tuple of identifiers, relative to this container, of the data
+            that has changed.
+
+        Keyword arguments:
+        value -- The new value of the data.
+        deleted -- True if the data has been deleted.
+        """
+        self._cache.clear()
+
+        if self._parent is not None:
+            self._parent._on_change((self._parent_data_id,) + path,
+                                    value,
+                                    deleted)
+
+    def _get_cached(self, name, version, calculate):
+        """Retrieve a value calculated from the data in this container,
+        calculating it only if the data has changed or `version` is different
+        to when it was last calculated.
+
+        Arguments:
+        name -- Name of the value.
+        version -- Value that changes whenever anything else the calculation
+            depends on changes.
+        calculate -- Function that calculates the value.
+        """
+        try:
+            cached_version, value = self._cache[name]
+            if cached_version == version:
+                return value
+        except KeyError:
+            pass
+
+        value = calculate()
+        self._cache[name] = (version, value)
+
+        return value
 
     def __contains__(self, data_id):
         """Determine if a particular  `data_id` exists.
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+from pyfeedbacker.app import config
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+
+class MarksEngine(object):
+    def __init__(self, root_model):
+        """Calculate the mark of every submission at once, as needed whenever
+        a mark is changed in the marker.
+
+        If NumPy is installed, the outcomes of each stage are encoded as 
+        matrices once (until the outcomes change): a one-hot matrix of the
+        key chosen for each outcome with a scale of values, and a matrix of 
+        the values entered by the user. Every submission's mark is then a few
+        matrix-vector products with the current marks, and clipping to the
+        configured bounds. Otherwise, each submission's `mark` is used.
+
+        Both calculate marks in the same way as `Outcomes._calculate_mark`
+        and `OutcomesByStage._calculate_mark`.
+
+        Arguments:
+        root_model -- The root model object.
+        """
+        self._root_model       = root_model
+        self._encoded_version  = None
+        self._submissions      = []
+        self._stages           = {}
+
+    def calculate(self):
+        """Retrieve the mark of every submission, as a dictionary of 
+        submission identifier to mark."""
+        if numpy is None:
+            return {submission: outcomes.mark
+                    for submission, outcomes
+                    in self._root_model.outcomes.items()}
+
+        version = self._root_model._outcomes_version
+        if self._encoded_version != version:
+            self._encode()
+            self._encoded_version = version
+
+        cfg   = config.ini.compiled
+        marks = numpy.zeros(len(self._submissions))
+        for stage_id, stage in self._stages.items():
+            stage_cfg = cfg.get_stage(stage_id)
+            stage_marks = stage.calculate(
+                self._root_model.marks.get(stage_id))
+            stage_marks = _clip(stage_marks,
+                                stage_cfg.mark_min,
+                                stage_cfg.mark_max)
+
+            marks += numpy.where(stage.present, stage_marks, 0.0)
+
+        marks = _clip(marks, cfg.mark_min, cfg.mark_max)
+
+        return dict(zip(self._submissions, marks.tolist()))
+
+    def _encode(self):
+        """Encode the outcomes of every submission as matrices, by stage."""
+        self._submissions = list(self._root_model.outcomes.keys())
+
+        stages = {}
+        for row, (submission, submission_outcomes) in enumerate(
+                self._root_model.outcomes.items()):
+            for stage_id, stage_outcomes in submission_outcomes.items():
+                try:
+                    stage = stages[stage_id]
+                except KeyError:
+                    stage = _EncodedStage(len(self._submissions))
+                    stages[stage_id] = stage
+
+                stage.add(row, stage_outcomes)
+
+        for stage in stages.values():
+            stage.finalise()
+
+        self._stages = stages
+
+
+
+class _EncodedStage(object):
+    def __init__(self, num_submissions):
+        """The outcomes of a single stage for every submission, encoded as 
+        matrices with one row per submission.
+
+        Arguments:
+        num_submissions -- Number of submissions (i.e., rows).
+        """
+        self.num_submissions = num_submissions
+
+        # (outcome_id, key) of each column of the one-hot matrix, and
+        # outcome_id of each column of the user input matrix
+        self.scale_columns   = {}
+        self.input_columns   = {}
+
+        # (row, column, value) of each outcome, until they are encoded
+        self._scale_cells    = []
+        self._input_cells    = []
+
+        # True for each submission with the stage
+        self.present         = numpy.zeros(num_submissions, dtype=bool)
+
+    def add(self, row, stage_outcomes):
+        """Add the outcomes of the stage for a submission.
+
+        Arguments:
+        row -- The row of the submission.
+        stage_outcomes -- The `Outcomes` of the stage for the submission.
+        """
+        self.present[row] = True
+
+        for outcome_id, outcome in stage_outcomes.items():
+            value = outcome['value']
+            if not _is_number(value):
+                value = 0.0
+
+            if outcome['user_input']:
+                column = self.input_columns.setdefault(
+                    outcome_id, len(self.input_columns))
+                self._input_cells.append((row, column, value))
+            else:
+                column = self.scale_columns.setdefault(
+                    (outcome_id, str(outcome['key'])), 
+                    len(self.scale_columns))
+                self._scale_cells.append((row, column, value))
+
+    def finalise(self):
+        """Encode the outcomes added as matrices."""
+        shape = (self.num_submissions, len(self.scale_columns))
+
+        # one-hot matrix of the key of each outcome, and the value of the
+        # outcome at the same position for when there is no mark for the key
+        self.keys   = numpy.zeros(shape)
+        self.values = numpy.zeros(shape)
+        for row, column, value in self._scale_cells:
+            self.keys[row, column]   = 1.0
+            self.values[row, column] = value
+
+        # values entered by the user, which are scaled by their mark
+        self.inputs = numpy.zeros((self.num_submissions,
+                                   len(self.input_columns)))
+        for row, column, value in self._input_cells:
+            self.inputs[row, column] = value
+
+        self._scale_cells = None
+        self._input_cells = None
+
+    def calculate(self, marks):
+        """Calculate the unclipped mark of the stage for every submission.
+
+        Arguments:
+        marks -- The `Marks` of the stage, or None if there are none.
+        """
+        if marks is None:
+            marks = {}
+
+        # mark for each key, or NaN if there isn't one (and so the value of
+        # the outcome is used instead)
+        weights = numpy.full(len(self.scale_columns), numpy.nan)
+        for (outcome_id, key), column in self.scale_columns.items():
+            scale_marks = marks.get(outcome_id)
+            if isinstance(scale_marks, dict):
+                mark = scale_marks.get(key)
+                if _is_number(mark):
+                    weights[column] = mark
+
+        known  = ~numpy.isnan(weights)
+        result = self.keys @ numpy.where(known, weights, 0.0) + \
+                 self.values @ (~known).astype(float)
+
+        # scale factor for each user input, or 1 if there isn't one
+        factors = numpy.ones(len(self.input_columns))
+        for outcome_id, column in self.input_columns.items():
+            factor = marks.get(outcome_id)
+            if _is_number(factor):
+                factors[column] = factor
+
+        return result + self.inputs @ factors
+
+
+
+def _is_number(value):
+    """Determine if a value can be added to a mark."""
+    return isinstance(value, (int, float))
+
+
+
+def _clip(values, value_min, value_max):
+    """Restrict an array of values to configured bounds.
+
+    Arguments:
+    values -- The array of values to restrict.
+    value_min -- The minimum value, or None if there is no minimum.
+    value_max -- The maximum value, or None if there is no maximum.
+    """
+    if value_max is not None:
+        values = numpy.minimum(values, value_max)
+
+    if value_min is not None:
+        values = numpy.maximum(values, value_min)
+
+    return values
@@ -22,12 +22,9 @@ class FeedbackByStage(base.DataByStage):
                          child_data_type = Feedbacks,
                          parent_data_id  = parent_data_id)
 
-        try:
-            feedback_pre = config.ini['assessment'].get('feedback_pre', False)
-            if feedback_pre:
-                self['__init']['0'] = feedback_pre
-        except:
-            pass
+        feedback_pre = config.ini.compiled.feedback_pre
+        if feedback_pre:
+            self['__init']['0'] = feedback_pre
 
     str = property(lambda self:self.__str__(), doc="""
             Retrieve a copy of the feedback as a new string.
@@ -35,13 +32,15 @@ class FeedbackByStage(base.DataByStage):
 
     def __str__(self):
         """Retrieve all the feedback combined into a single string."""
-        feedback = ''
+        return ''.join(self.pieces())
 
+    def pieces(self):
+        """Iterate over the strings that, joined together, make up all the
+        feedback (i.e., each piece of feedback and the whitespace between
+        them)."""
         for stage_feedback in self.values():
-            feedback += str(stage_feedback)
-            feedback += '\n\n'
-
-        return feedback
+            yield from stage_feedback.pieces()
+            yield '\n\n'
 
 
 
@@ -72,6 +71,16 @@ class Feedbacks(base.Data):
         value = value.replace('\\n', '\n')
         return super().__setitem__(feedback_id, value)
 
+    def _load_item(self, feedback_id, value):
+        """Set a piece of feedback loaded from permanent storage.
+        
+        Arguments:
+        feedback_id -- A unique identifier for this piece of feedback.
+        value -- A string giving feedback on the submission.
+        """
+        value = value.replace('\\n', '\n')
+        return super()._load_item(feedback_id, value)
+
     str = property(lambda self:self.__str__(), doc="""
             Retrieve a copy of the feedback as a new string.
             """)
@@ -79,17 +88,18 @@ class Feedbacks(base.Data):
     def __str__(self):
         """Retrieve all the feedback for this stage combined into a single
         string."""
-        feedback = ''
+        return ''.join(self.pieces())
 
+    def pieces(self):
+        """Iterate over the strings that, joined together, make up all the
+        feedback for this stage."""
         for indiv_feedback in self.values():
             indiv_feedback = indiv_feedback.strip(' ').replace('\\n', '\n')
-            feedback += indiv_feedback
+            yield indiv_feedback
 
             try:
                 if indiv_feedback[-1] != '\n' and \
                        indiv_feedback[-1] != '\t':
-                    feedback += ' '
+                    yield ' '
             except IndexError:
-                pass
-
-        return feedback
\ No newline at end of file
+                pass
\ No newline at end of file
@@ -1,73 +1,418 @@
 # -*- coding: utf-8 -*-
 
-from pyfeedbacker.app import config
-from pyfeedbacker.app.model import model, outcomes
+from pyfeedbacker.app import config, template
+from pyfeedbacker.app.model import base, model, outcomes
 
 from collections import OrderedDict
 
+import concurrent.futures
+import csv
+import functools
+import gzip
+import hashlib
 import json
+import os
+import shutil
+import threading
 
 
 
 class FileSystemModel(model.Model):
+    # version of the format of the outcomes JSON file, which stores the 
+    # outcome schema separately to the outcomes of each submission
+    OUTCOMES_VERSION = 2
+
+    # version of the format of the manifest of files generated when finalising
+    MANIFEST_VERSION = 1
+
+    # number of final feedback text files generated by each task of a pool of
+    # processes, and between progress reports
+    FINAL_FEEDBACKS_CHUNK = 64
+
     def __init__(self):
-        """Store all marking information in CSV, JSON and text files."""
+        """Store all marking information in CSV, JSON and text files.
+
+        Every change to the model is also appended to a journal file. The
+        journal is replayed over the JSON files when the model is loaded (so
+        nothing is lost if the application crashes), and it is folded into the
+        JSON files when the model is saved, or in the background once the
+        journal becomes too long. Changes made while `journaling` is False
+        are only written when the model is saved.
+        """
         super().__init__()
 
+        self._journal         = None
+        self._journal_lock    = threading.Lock()
+        self._journal_records = 0
+        self._compaction      = None
+
+        # elements of each outcome that are the same for every submission, by
+        # stage then outcome identifier (see `Outcome.SCHEMA_FIELDS`)
+        self._outcomes_schema         = {}
+        self._outcomes_schema_changed = False
+
+        # placeholders without a value in the final feedback, and the
+        # submissions they were found in, when it was last generated
+        self.unknown_placeholders = {}
+
+        # hashes of the inputs of the files generated when finalising, and
+        # the number of files that were generated the last time
+        self._final_manifest = None
+        self.finalise_report = None
+
+        # version of the configuration each CSV file was last written with
+        self._csv_versions = {}
+
         self._load_raw_data()
+        self._clear_dirty()
+
+        # changes in the journal are not yet saved, so they remain dirty
+        self._replay_journal()
+        self._open_journal()
 
     def _load_raw_data(self):
         """Load the data from the JSON files."""
-        # load feedbacks
+        file_feedbacks = config.ini['model_file']['file_feedbacks']
+        for submission, stages in self._load_json(file_feedbacks).items():
+            self._load_submission_feedbacks(submission, stages)
+
+        file_outcomes = config.ini['model_file']['file_outcomes']
+        data = self._load_json(file_outcomes)
+
+        # outcomes files without a version embed the schema in every outcome
+        if isinstance(data.get('version'), int):
+            self._outcomes_schema = data.get('schema', {})
+            data = data.get('outcomes', {})
+
+        for submission, stages in data.items():
+            self._load_submission_outcomes(submission, stages)
+
+        file_outcomes_marks = config.ini['model_file']['file_outcomes_marks']
+        for stage_id, marks in self._load_json(file_outcomes_marks).items():
+            self._load_stage_marks(stage_id, marks)
+
+    def _load_json(self, file_name):
+        """Load a JSON file, or return an empty dictionary if the file does 
+        not exist or is invalid.
+
+        Arguments:
+        file_name -- Path to the JSON file.
+        """
         try:
-            file_feedbacks = config.ini['model_file']['file_feedbacks']
-            with open(file_feedbacks, 'r') as json_file:
-                for submission, stages in json.load(json_file).items():
-                    for stage_id, data in stages.items():
-                        for score_id, feedback in data.items():
-                            self.feedbacks[submission][stage_id][score_id] =\
-                                feedback
+            with open(file_name, 'r') as json_file:
+                return json.load(json_file)
         except json.decoder.JSONDecodeError:
-            pass
+            return {}
         except FileNotFoundError:
-            pass
+            return {}
 
-        # load outcomes
-        try:
-            file_outcomes = config.ini['model_file']['file_outcomes']
-            with open(file_outcomes, 'r') as json_file:
-                for submission, stages in json.load(json_file).items():
-                    for stage_id, data in stages.items():
-                        if data is None:
+    def _load_submission_feedbacks(self, submission, stages):
+        """Load the feedbacks for a single submission into the model.
+
+        Arguments:
+        submission -- The submission identifier.
+        stages -- Dictionary of stage identifier to dictionary of feedback.
+        """
+        for stage_id, data in stages.items():
+            for feedback_id, feedback in data.items():
+                self.feedbacks[submission][stage_id]._load_item(feedback_id,
+                                                                feedback)
+
+    def _load_submission_outcomes(self, submission, stages):
+        """Load the outcomes for a single submission into the model. Any 
+        elements missing from an outcome are taken from the outcome schema,
+        so all submissions share the same copy of them.
+
+        Arguments:
+        submission -- The submission identifier.
+        stages -- Dictionary of stage identifier to dictionary of outcomes.
+        """
+        for stage_id, data in stages.items():
+            if data is None:
+                continue
+
+            schema         = self._outcomes_schema.get(stage_id, {})
+            stage_outcomes = self.outcomes[submission][stage_id]
+            for outcome_id, outcome in data.items():
+                if outcome is None:
+                    continue
+
+                try:
+                    outcome = dict(schema[outcome_id], **outcome)
+                except KeyError:
+                    pass
+
+                stage_outcomes._load_item(outcome_id, outcome)
+
+    def _compact_submission_outcomes(self, submission_outcomes):
+        """Retrieve the outcomes for a single submission as a dictionary, 
+        leaving out elements that are the same as in the outcome schema. 
+        Outcomes not yet in the schema are added to it.
+
+        Arguments:
+        submission_outcomes -- The outcomes of the submission, by stage.
+        """
+        stages = {}
+
+        for stage_id, stage_outcomes in submission_outcomes.items():
+            schema = self._outcomes_schema.setdefault(stage_id, {})
+
+            data = {}
+            for outcome_id, outcome in stage_outcomes.items():
+                record = {'key':        outcome['key'],
+                          'value':      outcome['value'],
+                          'user_input': outcome['user_input']}
+
+                try:
+                    fields = schema[outcome_id]
+                except KeyError:
+                    fields = {field: _as_json(outcome[field])
+                              for field in outcomes.Outcome.SCHEMA_FIELDS}
+                    schema[outcome_id] = fields
+                    self._outcomes_schema_changed = True
+
+                for field in outcomes.Outcome.SCHEMA_FIELDS:
+                    value = _as_json(outcome[field])
+                    if value != fields.get(field):
+                        record[field] = value
+
+                data[outcome_id] = record
+
+            stages[stage_id] = data
+
+        return stages
+
+    def _load_stage_marks(self, stage_id, marks):
+        """Load the outcomes marks for a single stage into the model.
+
+        Arguments:
+        stage_id -- The stage identifier.
+        marks -- Dictionary of outcome identifier to mark.
+        """
+        for outcome_id, mark in marks.items():
+            if mark is None:
+                continue
+
+            self.marks[stage_id]._load_item(outcome_id, mark)
+
+    def _get_journal_path(self):
+        """Retrieve the filename of the journal, or None if the journal is
+        disabled."""
+        return config.ini['model_file'].get('file_journal', None)
+
+    def _replay_journal(self):
+        """Replay the changes in the journal, including those left over from
+        an incomplete compaction, over the data loaded from the JSON files."""
+        path = self._get_journal_path()
+        if path is None:
+            return
+
+        for file_name in (path + '.compacting', path):
+            try:
+                with open(file_name, 'r') as journal_file:
+                    for line in journal_file:
+                        try:
+                            record = json.loads(line)
+                        except json.decoder.JSONDecodeError:
+                            # partially written record (e.g., after a crash)
                             continue
 
-                        for outcome_id, outcome in data.items():
-                            if outcome is None:
-                                continue
+                        self._replay_record(record)
+                        self._journal_records += 1
+            except FileNotFoundError:
+                pass
 
-                            self.outcomes[submission][stage_id][outcome_id]=\
-                                outcome
-        except json.decoder.JSONDecodeError:
-            pass
+    def _replay_record(self, record):
+        """Apply a single change from the journal to the model.
+
+        Arguments:
+        record -- Dictionary with the `path` to the data that changed, and
+            either the new `value` or `deleted` set to True.
+        """
+        path = record['path']
+        if path[0] not in model.Model.MODELS:
+            return
+
+        container = getattr(self, path[0])
+        if len(path) == 1:
+            self._replay_container(container, record.get('value', {}))
+            return
+
+        for data_id in path[1:-1]:
+            container = container[data_id]
+
+        if record.get('deleted', False):
+            try:
+                del container[path[-1]]
+            except KeyError:
+                pass
+        elif isinstance(container, base.Data):
+            container[path[-1]] = record['value']
+        else:
+            self._replay_container(container[path[-1]], record['value'])
+
+    def _replay_container(self, container, value):
+        """Replace the contents of a model container with data from the
+        journal.
+
+        Arguments:
+        container -- The model container.
+        value -- Dictionary of the new contents of the container.
+        """
+        container.clear()
+
+        for data_id, data in value.items():
+            if isinstance(container, base.Data):
+                container[data_id] = data
+            else:
+                self._replay_container(container[data_id], data)
+
+    def _open_journal(self):
+        """Open the journal so that changes to the model are appended to it."""
+        path = self._get_journal_path()
+        if path is None:
+            return
+
+        self._journal = open(path, 'a')
+
+    def _rotate_journal(self):
+        """Move the current journal aside so that it can be folded into the 
+        JSON files, and start a new empty journal. Must be called with the
+        journal lock held."""
+        path = self._get_journal_path()
+        if path is None or self._journal is None:
+            return
+
+        self._journal.close()
+
+        compacting = path + '.compacting'
+        try:
+            if os.path.exists(compacting):
+                # an earlier compaction didn't finish, so keep its changes
+                with open(path, 'r') as src, open(compacting, 'a') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(path)
+            else:
+                os.replace(path, compacting)
         except FileNotFoundError:
             pass
 
-        # load outcomes marks
-        try:
-            file_outcomes_marks = \
-                    config.ini['model_file']['file_outcomes_marks']
-            with open(file_outcomes_marks, 'r') as json_file:
-                for stage_id, stages in json.load(json_file).items():
-                    for outcome_id, mark in stages.items():
-                        if mark is None:
-                            continue
+        self._journal = open(path, 'a')
+        self._journal_records = 0
 
-                        self.marks[stage_id][outcome_id] = mark
-        except json.decoder.JSONDecodeError:
-            pass
+    def _remove_compacted_journal(self):
+        """Remove the journal that has been folded into the JSON files."""
+        path = self._get_journal_path()
+        if path is None:
+            return
+
+        try:
+            os.remove(path + '.compacting')
         except FileNotFoundError:
             pass
 
+    def _on_change(self, path, value = None, deleted = False):
+        """Append a change to the model to the journal, and start a 
+        background compaction if the journal has become too long.
+
+        Arguments:
+        path -- Tuple of identifiers to the data that has changed, starting
+            with the name of the model.
+
+        Keyword arguments:
+        value -- The new value of the data.
+        deleted -- True if the data has been deleted.
+        """
+        super()._on_change(path, value, deleted)
+
+        if self._journal is None or not self.journaling:
+            return
+
+        record = {'path': list(path)}
+        if deleted:
+            record['deleted'] = True
+        else:
+            record['value'] = getattr(value, 'dict', value)
+        line = json.dumps(record) + '\n'
+
+        compact_records = config.ini['model_file'].getint(
+            'journal_compact_records', 1000)
+
+        with self._journal_lock:
+            self._journal.write(line)
+            self._journal.flush()
+            self._journal_records += 1
+
+            compact = self._journal_records >= compact_records
+
+        if compact:
+            self._compact_in_background()
+
+    def _compact_in_background(self):
+        """Fold the journal into the JSON files in a background thread. Only
+        a snapshot of the data is taken in this thread, so that the model can
+        continue to change while the snapshot is serialised to JSON and the
+        files are written."""
+        with self._journal_lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                # try again once as many changes have been journalled again
+                self._journal_records = 0
+                return
+
+            files = self._snapshot_dirty_files()
+            self._rotate_journal()
+
+        def compact():
+            for file_name, data in files:
+                self._write_json(file_name, data)
+            self._remove_compacted_journal()
+
+        # not a daemon, so the process will wait for the files to be written
+        self._compaction = threading.Thread(target = compact)
+        self._compaction.start()
+
+    def _snapshot_dirty_files(self):
+        """Retrieve the files (and a copy of their data, which can be
+        serialised to JSON in another thread) that store the parts of the
+        model that have changed since they were last saved, as a list of
+        (file_name, data). The model remains dirty until it is saved, as the
+        CSV files are not part of the snapshot."""
+        files = []
+
+        if self._is_dirty('feedbacks'):
+            files.append((config.ini['model_file']['file_feedbacks'],
+                          self._get_feedbacks_data()))
+        if self._is_dirty('outcomes'):
+            files.append((config.ini['model_file']['file_outcomes'],
+                          self._get_outcomes_data()))
+        if self._is_dirty('marks'):
+            files.append((config.ini['model_file']['file_outcomes_marks'],
+                          self._get_outcomes_marks_data()))
+
+        return files
+
+    def _write_file(self, file_name, data):
+        """Atomically replace the contents of a file, so that it is never
+        left partially written.
+
+        Arguments:
+        file_name -- Path to the file.
+        data -- String to write to the file.
+        """
+        temp_file_name = file_name + '.tmp'
+        with open(temp_file_name, 'w') as f:
+            f.write(data)
+        os.replace(temp_file_name, file_name)
+
+    def _write_json(self, file_name, data):
+        """Atomically replace the contents of a file with data as JSON.
+
+        Arguments:
+        file_name -- Path to the file.
+        data -- Data to write to the file as JSON.
+        """
+        self._write_file(file_name, json.dumps(data))
+
     def _get_csv_title(self, marks):
         """Generate the first row of the CSV file.
         
@@ -78,62 +423,171 @@ class FileSystemModel(model.Model):
         return config.ini['app']['name'] + \
                (' marks' if marks else ' scores')
 
-    def _get_csv_header(self, marks):
-        """Generate the full header of the CSV for scores/marks. Generates
-        three rows:
+    def _get_csv_header(self, marks, layout = 'stage'):
+        """Generate the header of the CSV for scores/marks, and the columns
+        of the CSV. With the 'stage' layout, there is a column per stage and
+        two rows:
         1) a title row
         2) a row listing stages
+        
+        With the 'outcome' layout, there is a column per outcome of each
+        stage, and three rows:
+        1) a title row
+        2) a row listing stages (above the first outcome of each stage)
         3) a listing each outcome ID
+
+        Columns are in the order they are first found in the outcomes.
         
         Arguments:
         marks -- True if this is the marks output, otherwise this is for the 
             scores CSV.
+
+        Keyword arguments:
+        layout -- Either 'stage' or 'outcome'.
+
+        Returns:
+        (rows, columns), where `columns` lists the stage identifier of each
+        column (or (stage_id, outcome_id) with the 'outcome' layout).
         """
+        if layout not in ('stage', 'outcome'):
+            raise ValueError(f'Unknown CSV layout: {layout}')
+
         # calculate mapping
         mapping = OrderedDict()
         for submission, stages in self.outcomes.items():
-            for stage_id, stage_scores in stages.items():
+            for stage_id in sorted(stages.keys()):
                 stage_id = str(stage_id)
 
-                for score_id, score in stage_scores.items():
-                    score_id = str(score_id)
+                if layout == 'stage':
+                    mapping[stage_id] = None
+                    continue
 
-                    mapping[(stage_id, score_id)] = None
-        mapping = mapping.keys()
+                for score_id in stages[stage_id].keys():
+                    mapping[(stage_id, str(score_id))] = None
+        mapping = list(mapping.keys())
 
         # generate headers
-        title_header_str = self._get_csv_title(marks)
+        rows = [[self._get_csv_title(marks)]]
+
+        if layout == 'stage':
+            rows.append(['submission'] + mapping + ['sum'])
+            return (rows, mapping)
 
         stage_header = ['submission']
-        for (stage_id, score_id) in mapping:
-            if stage_id not in stage_header:
+        for pos, (stage_id, score_id) in enumerate(mapping):
+            if pos == 0 or mapping[pos-1][0] != stage_id:
                 stage_header.append(stage_id)
             else:
                 stage_header.append('')
-
-        stage_header_str = ','.join(stage_header) + ',sum'
+        rows.append(stage_header + ['sum'])
 
         score_header = ['submission']
         for (stage_id, score_id) in mapping:
             score_header.append(score_id)
-        score_header_str = ','.join(score_header) + ',sum'
+        rows.append(score_header + ['sum'])
+
+        return (rows, mapping)
+
+    def _get_csv_rows(self, marks, layout = 'stage'):
+        """Generate the rows of the CSV for scores/marks, one submission at a
+        time, so the rows are never all in memory at once.
+
+        Arguments:
+        marks -- True if this is the marks output, otherwise this is for the 
+            scores CSV.
+
+        Keyword arguments:
+        layout -- Either 'stage' or 'outcome' (see `_get_csv_header`).
+        """
+        rows, columns = self._get_csv_header(marks, layout)
+        yield from rows
+
+        for submission, outcomes in self.outcomes.items():
+            row = [submission]
+
+            for column in columns:
+                if layout == 'stage':
+                    if column in outcomes:
+                        stage_outcomes = outcomes[column]
+                        row.append(stage_outcomes.mark if marks
+                                   else stage_outcomes.score)
+                    else:
+                        row.append('')
+                    continue
+
+                stage_id, outcome_id = column
+                if stage_id not in outcomes or \
+                        outcome_id not in outcomes[stage_id]:
+                    row.append('')
+                elif marks:
+                    mark = outcomes[stage_id].get_mark(outcome_id)
+                    row.append('' if mark is None else mark)
+                else:
+                    value = outcomes[stage_id][outcome_id]['value']
+                    row.append('' if value is None else value)
+
+            row.append(outcomes.mark if marks else outcomes.score)
+
+            yield row
+
+    def _write_csv(self, file_name, rows):
+        """Write rows to a CSV file as they are generated. If the file name
+        ends with '.gz', the file is compressed with gzip. The file is only
+        replaced if its contents have changed, by comparing a hash of them to
+        the hash in the manifest (see `_get_final_manifest`).
+
+        Arguments:
+        file_name -- Path to the file.
+        rows -- Iterable of the rows, each a list of values.
+        """
+        files     = self._get_final_manifest()['files']
+        temp_name = file_name + '.tmp'
 
-        return [title_header_str, stage_header_str, score_header_str, mapping]
+        if file_name.endswith('.gz'):
+            f = gzip.open(temp_name, 'wt', newline = '')
+        else:
+            f = open(temp_name, 'w', newline = '')
+
+        with f:
+            out    = _HashingWriter(f)
+            writer = csv.writer(out, lineterminator = '\n')
+            for row in rows:
+                writer.writerow([str(value) for value in row])
+
+        digest = out.hexdigest()
+        if files.get(file_name) == digest and os.path.exists(file_name):
+            os.remove(temp_name)
+            return
+
+        os.replace(temp_name, file_name)
+
+        files[file_name] = digest
+        self._save_final_manifest()
 
     def save(self, force_finalise=False):
         """Save all the feedbacks, outcomes, and outcomes marks to JSON files 
         and the scores and marks per submission to CSV. Feedbacks can also be
-        saved to text files, one per submission.
+        saved to text files, one per submission. Files are only written if the
+        data they store has changed (or they don't exist yet), unless 
+        finalising.
         
         Keyword arguments:
         force_finalise -- Forces the saving of marks per submission to CSV files
             and feedbacks to individual text files if True.
         """
+        if self._compaction is not None:
+            self._compaction.join()
+
+        with self._journal_lock:
+            self._rotate_journal()
+
         self._save_scores(force_finalise=force_finalise)
         self._save_feedbacks(force_finalise=force_finalise)
         self._save_outcomes()
         self._save_outcomes_marks()
 
+        self._remove_compacted_journal()
+
     def _save_scores(self, force_finalise=False, save_marks=False):
         """Save scores, and optionally marks, to CSV files.
         
@@ -146,47 +600,20 @@ class FileSystemModel(model.Model):
         if save_marks:
             file_name = config.ini['model_file']['file_marks']
 
-        title_header_str = config.ini['app']['name'] + \
-                           (' marks\n' if save_marks else ' scores\n')
-
-        column_header = OrderedDict()
-        for submission, outcomes in self.outcomes.items():
-            for stage_id in sorted(outcomes.keys()):
-                column_header[stage_id] = None
-        column_header['sum'] = None
-
-        with open(file_name, 'w') as f:
-            f.write(title_header_str)
-
-            f.write('submission')
-            for stage_id in column_header.keys():
-                f.write(',' + str(stage_id))
-
-            for submission, outcomes in self.outcomes.items():
-                f.write('\n' + str(submission))
-                i = 1
-                for stage_id in column_header.keys():
-                    if stage_id in outcomes:
-                        if save_marks:
-                            f.write(',' + str(outcomes[stage_id].mark))
-                        else:
-                            f.write(',' + str(outcomes[stage_id].score))
-                    else:
-                        f.write(',')
-
-                    i += 1
-
-                if save_marks:
-                    f.write(str(outcomes.mark))
-                else:
-                    f.write(str(outcomes.score))
-
-        if not save_marks:
-            if config.ini['assessment'].getboolean('scores_are_marks', False) \
-                    or force_finalise:
-                self._save_scores(False, True)
-        elif force_finalise:
-            self._save_scores(False, True)
+        # scores and marks are calculated from the configuration too, so the
+        # file is also stale if the configuration has changed since
+        changed = self._is_dirty('outcomes') or \
+                  (save_marks and self._is_dirty('marks')) or \
+                  self._csv_versions.get(file_name) != config.ini.version
+        if changed or force_finalise or not os.path.exists(file_name):
+            self._write_csv(file_name,
+                            self._get_csv_rows(save_marks,
+                                               config.ini.compiled.csv_layout))
+            self._csv_versions[file_name] = config.ini.version
+
+        if not save_marks and \
+                (config.ini.compiled.scores_are_marks or force_finalise):
+            self._save_scores(force_finalise, True)
 
     def _save_feedbacks(self, force_finalise=False):
         """Save the feedbacks model to a JSON file, and optionally generate
@@ -197,128 +624,343 @@ class FileSystemModel(model.Model):
             files if True.
         """
         file_name = config.ini['model_file']['file_feedbacks']
-        with open(file_name, 'w') as json_file:
-            json_file.write(json.dumps(self.feedbacks))
-
-        scores_are_ints = config.ini['model_file']['scores_are_ints']
-        marks_are_ints  = config.ini['model_file']['marks_are_ints']
-
-        if config.ini['assessment'].getboolean('scores_are_marks', False) \
-                or force_finalise:
-            for submission, stages in self.feedbacks.items():
-                path = config.ini['model_file']['file_final_feedback'].replace(
-                    '##submission##', submission)
-
-                with open(path, 'w') as f:
-                    data = {}
-                    data['score'] = self.outcomes[submission].score
-                    data['mark'] = self.outcomes[submission].mark
-
-                    data['score_min'] = config.ini['assessment'].getfloat(
-                        'score_min', None)
-                    data['score_max'] = config.ini['assessment'].getfloat(
-                        'score_max', None)
-
-                    data['mark_min'] = config.ini['assessment'].getfloat(
-                        'mark_min', None)
-                    data['mark_max'] = config.ini['assessment'].getfloat(
-                        'mark_max', None)
-
-                    if scores_are_ints:
-                        try:
-                            data['score']     = int(data['score'])
-                        except TypeError:
-                            pass
-                        try:
-                            data['score_min'] = int(data['score_min'])
-                        except TypeError:
-                            pass
-                        try:
-                            data['score_max'] = int(data['score_max'])
-                        except TypeError:
-                            pass
+        if self._is_dirty('feedbacks') or not os.path.exists(file_name):
+            self._write_json(file_name, self._get_feedbacks_data())
+            self._clear_dirty('feedbacks')
+
+        if config.ini.compiled.scores_are_marks or force_finalise:
+            self._save_final_feedbacks()
+
+    def _save_final_feedbacks(self):
+        """Generate the individual final feedback text files, one per
+        submission. The data each file needs is taken from the model first,
+        and the files are then generated in a pool of processes (unless there
+        are only a few, or `finalise_workers` in the `[model_file]` section of
+        the configuration is 1), with `progress` called as each chunk of
+        files, in order, is written.
+
+        Placeholders in the feedback that don't have a value are left as they
+        are, and listed in `unknown_placeholders`, with the submissions they
+        are in.
+
+        A hash of everything each file is generated from is kept in the
+        manifest (see `_get_final_manifest`), and files whose hash hasn't
+        changed aren't generated again. Files of submissions no longer in the
+        model are deleted. The number of files rendered, skipped and deleted
+        is stored in `finalise_report`."""
+        cfg       = config.ini.compiled
+        snapshots = [self._get_final_feedback_snapshot(submission)
+                     for submission in self.feedbacks.keys()]
+
+        # placeholders that are the same for every submission
+        common = {
+            'scores'          : {'score_min' : cfg.score_min,
+                                 'score_max' : cfg.score_max},
+            'marks'           : {'mark_min'  : cfg.mark_min,
+                                 'mark_max'  : cfg.mark_max},
+            'stages'          : {},
+            'scores_are_ints' : cfg.scores_are_ints,
+            'marks_are_ints'  : cfg.marks_are_ints}
+
+        for submission, path, feedback, score, mark, stages in snapshots:
+            for stage_id, stage_score, stage_mark in stages:
+                if stage_id not in common['stages']:
+                    stage_cfg = cfg.get_stage(stage_id)
+                    common['stages'][stage_id] = (stage_cfg.score_min,
+                                                  stage_cfg.score_max,
+                                                  stage_cfg.mark_min,
+                                                  stage_cfg.mark_max)
+
+        # only render the files whose inputs have changed
+        manifest  = self._get_final_manifest()
+        previous  = manifest['feedbacks']
+        current   = {}
+        digests   = {}
+        skipped   = 0
+        deleted   = 0
+        rendering = []
+
+        self.unknown_placeholders = {}
+
+        for snapshot in snapshots:
+            submission, path = snapshot[0], snapshot[1]
+            digest = _hash_final_feedback(common, snapshot)
+            entry  = previous.get(submission)
+
+            if entry is not None and entry['hash'] == digest and \
+                    entry['path'] == path and os.path.exists(path):
+                current[submission] = entry
+                skipped += 1
+
+                for name in entry['unknown']:
+                    self.unknown_placeholders.setdefault(name, []).append(
+                        submission)
+            else:
+                # the hash is only set once the file has been rendered
+                current[submission] = {'hash'    : None,
+                                       'path'    : path,
+                                       'unknown' : []}
+                digests[submission] = digest
+                rendering.append(snapshot)
+
+        for submission, entry in previous.items():
+            if submission not in current:
+                try:
+                    os.remove(entry['path'])
+                except OSError:
+                    pass
+                deleted += 1
+
+        snapshots = rendering
+        total     = len(snapshots)
+        chunk     = FileSystemModel.FINAL_FEEDBACKS_CHUNK
+        workers   = cfg.finalise_workers
+        render    = functools.partial(_render_final_feedback, common)
+
+        pool = None
+        if total <= chunk or workers == 1:
+            results = map(render, snapshots)
+        else:
+            pool    = concurrent.futures.ProcessPoolExecutor(
+                max_workers = workers)
+            results = pool.map(render, snapshots, chunksize = chunk)
 
-                    if marks_are_ints:
-                        try:
-                            data['mark']      = int(data['mark'])
-                        except TypeError:
-                            pass
-                        try:
-                            data['mark_min']  = int(data['mark_min'])
-                        except TypeError:
-                            pass
-                        try:
-                            data['mark_max']  = int(data['mark_max'])
-                        except TypeError:
-                            pass
-
-                    scores = self.outcomes[submission]
-                    for stage_id, stage_scores in scores.items():
-                        data[f'stage_{stage_id}_score'] = stage_scores.score
-                        data[f'stage_{stage_id}_mark'] = stage_scores.mark
-
-                        data[f'stage_{stage_id}_score_min'] = \
-                            config.ini[f'stage_{stage_id}'].getfloat(
-                                'score_min', None)
-                        data[f'stage_{stage_id}_mark_min'] = \
-                            config.ini[f'stage_{stage_id}'].getfloat(
-                                'mark_min', None)
-
-                        data[f'stage_{stage_id}_score_max'] = \
-                            config.ini[f'stage_{stage_id}'].getfloat(
-                                'score_max', None)
-                        data[f'stage_{stage_id}_mark_max'] = \
-                            config.ini[f'stage_{stage_id}'].getfloat(
-                                'mark_max', None)
-
-                        if scores_are_ints:
-                            try:
-                                data[f'stage_{stage_id}_score'] = \
-                                    int(data[f'stage_{stage_id}_score'])
-                            except TypeError:
-                                pass
-                            try:
-                                data[f'stage_{stage_id}_score_min'] = \
-                                    int(data[f'stage_{stage_id}_score_min'])
-                            except TypeError:
-                                pass
-                            try:
-                                data[f'stage_{stage_id}_score_max'] = \
-                                    int(data[f'stage_{stage_id}_score_max'])
-                            except TypeError:
-                                pass
-
-                        if marks_are_ints:
-                            try:
-                                data[f'stage_{stage_id}_mark'] = \
-                                    int(data[f'stage_{stage_id}_mark'])
-                            except TypeError:
-                                pass
-                            try:
-                                data[f'stage_{stage_id}_mark_min'] = \
-                                    int(data[f'stage_{stage_id}_mark_min'])
-                            except TypeError:
-                                pass
-                            try:
-                                data[f'stage_{stage_id}_mark_max'] = \
-                                    int(data[f'stage_{stage_id}_mark_max'])
-                            except TypeError:
-                                pass
-
-                    feedback = str(self.feedbacks[submission])
-                    for key, value in data.items():
-                        feedback = feedback.replace(f'##{key}##', str(value))
-
-                    f.write(feedback)
+        try:
+            # results are yielded in order, so progress is too
+            for done, (snapshot, unknown) in enumerate(zip(snapshots,
+                                                           results), 1):
+                current[snapshot[0]]['hash']    = digests[snapshot[0]]
+                current[snapshot[0]]['unknown'] = sorted(unknown)
+                for name in unknown:
+                    self.unknown_placeholders.setdefault(name, []).append(
+                        snapshot[0])
+
+                if done % chunk == 0 or done == total:
+                    self._report_progress(done, total)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+            # files that weren't rendered are left out, so they are rendered
+            # next time
+            manifest['feedbacks'] = {
+                submission: entry for submission, entry in current.items()
+                if entry['hash'] is not None}
+            self._save_final_manifest()
+
+        self.finalise_report = {'rendered' : total,
+                                'skipped'  : skipped,
+                                'deleted'  : deleted}
+
+    def _get_final_manifest(self):
+        """Retrieve the manifest of the files generated when finalising, which
+        is loaded from the `file_final_manifest` file in the `[model_file]`
+        section of the configuration the first time it is needed. If there
+        is no such option, the manifest is always empty, so every file is
+        generated.
+
+        Returns:
+        Dictionary with a hash of the inputs of the final feedback of each
+        submission (in `feedbacks`) and of the contents of each CSV file (in
+        `files`).
+        """
+        if self._final_manifest is None:
+            self._final_manifest = {'feedbacks' : {}, 'files' : {}}
+
+            file_name = config.ini['model_file'].get('file_final_manifest')
+            try:
+                with open(file_name, 'r') as f:
+                    data = json.load(f)
+                if data.get('version') == FileSystemModel.MANIFEST_VERSION:
+                    self._final_manifest['feedbacks'] = data['feedbacks']
+                    self._final_manifest['files']     = data['files']
+            except (TypeError, OSError, ValueError, KeyError):
+                pass
+
+        return self._final_manifest
+
+    def _save_final_manifest(self):
+        """Save the manifest of the files generated when finalising, if there
+        is a file to save it to."""
+        file_name = config.ini['model_file'].get('file_final_manifest')
+        if file_name is None or self._final_manifest is None:
+            return
+
+        data = dict(self._final_manifest,
+                    version = FileSystemModel.MANIFEST_VERSION)
+        self._write_file(file_name, json.dumps(data))
+
+    def _get_final_feedback_snapshot(self, submission):
+        """Retrieve everything from the model needed to generate the final
+        feedback text file of a submission.
+
+        Arguments:
+        submission -- Identifier of the submission.
+
+        Returns:
+        (submission, path, feedback, score, mark, stages), where `feedback`
+        is a `Template` and `stages` is a list of (stage_id, score, mark) for
+        each stage with outcomes.
+        """
+        path = config.ini['model_file']['file_final_feedback'].replace(
+            '##submission##', submission)
+
+        scores = self.outcomes[submission]
+        stages = [(stage_id, stage_scores.score, stage_scores.mark)
+                  for stage_id, stage_scores in scores.items()]
+
+        return (submission,
+                path,
+                template.compile_pieces(self.feedbacks[submission].pieces()),
+                scores.score,
+                scores.mark,
+                stages)
 
     def _save_outcomes(self):
         """Save the outcomes model to a JSON file."""
         file_name = config.ini['model_file']['file_outcomes']
-        with open(file_name, 'w') as json_file:
-            json_file.write(json.dumps(self.outcomes.dict))
+        if self._is_dirty('outcomes') or not os.path.exists(file_name):
+            self._write_json(file_name, self._get_outcomes_data())
+            self._clear_dirty('outcomes')
 
     def _save_outcomes_marks(self):
         """Save the outcomes marks model to a JSON file."""
         file_name = config.ini['model_file']['file_outcomes_marks']
-        with open(file_name, 'w') as json_file:
-            json_file.write(json.dumps(self.marks.dict))
\ No newline at end of file
+        if self._is_dirty('marks') or not os.path.exists(file_name):
+            self._write_json(file_name, self._get_outcomes_marks_data())
+            self._clear_dirty('marks')
+
+    def _get_feedbacks_data(self):
+        """Retrieve a copy of the feedbacks model as a dictionary."""
+        return self.feedbacks.dict
+
+    def _get_outcomes_data(self):
+        """Retrieve a copy of the outcomes model, and the outcome schema of
+        the outcomes in it, as a dictionary."""
+        self._outcomes_schema = {}
+
+        data = {}
+        for submission, submission_outcomes in self.outcomes.items():
+            data[submission] = \
+                self._compact_submission_outcomes(submission_outcomes)
+
+        self._outcomes_schema_changed = False
+
+        return {'version':  FileSystemModel.OUTCOMES_VERSION,
+                'schema':   self._outcomes_schema,
+                'outcomes': data}
+
+    def _get_outcomes_marks_data(self):
+        """Retrieve a copy of the outcomes marks model as a dictionary."""
+        return self.marks.dict
+
+
+class _HashingWriter(object):
+    def __init__(self, f):
+        """Write text to a file, while generating a hash of the text, so
+        that the hash of a file can be compared without reading it back.
+
+        Arguments:
+        f -- File opened for writing text.
+        """
+        self._f    = f
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self._hash.update(data.encode())
+        return self._f.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+
+def _hash_final_feedback(common, snapshot):
+    """Generate a hash of everything the final feedback text file of a
+    submission is generated from.
+
+    Arguments:
+    common -- Dictionary of the placeholders that are the same for every
+        submission, as created by `FileSystemModel._save_final_feedbacks`.
+    snapshot -- Data of the submission, as returned by
+        `FileSystemModel._get_final_feedback_snapshot`.
+    """
+    submission, path, feedback, score, mark, stages = snapshot
+
+    inputs = [path,
+              feedback.tokens,
+              score,
+              mark,
+              stages,
+              [common['stages'][stage[0]] for stage in stages],
+              common['scores'],
+              common['marks'],
+              common['scores_are_ints'],
+              common['marks_are_ints']]
+
+    return hashlib.sha256(json.dumps(inputs, default = str).encode()
+                         ).hexdigest()
+
+
+
+def _render_final_feedback(common, snapshot):
+    """Generate the final feedback text file of a submission, by replacing
+    the placeholders in its feedback. This only uses its arguments, so it
+    can be called in another process.
+
+    Arguments:
+    common -- Dictionary of the placeholders that are the same for every
+        submission, as created by `FileSystemModel._save_final_feedbacks`.
+    snapshot -- Data of the submission, as returned by
+        `FileSystemModel._get_final_feedback_snapshot`.
+
+    Returns:
+    The set of the names of placeholders in the feedback without a value.
+    """
+    submission, path, feedback, score, mark, stages = snapshot
+
+    scores = dict(common['scores'], score = score)
+    marks  = dict(common['marks'], mark = mark)
+
+    for stage_id, stage_score, stage_mark in stages:
+        score_min, score_max, mark_min, mark_max = common['stages'][stage_id]
+
+        scores[f'stage_{stage_id}_score']     = stage_score
+        scores[f'stage_{stage_id}_score_min'] = score_min
+        scores[f'stage_{stage_id}_score_max'] = score_max
+
+        marks[f'stage_{stage_id}_mark']       = stage_mark
+        marks[f'stage_{stage_id}_mark_min']   = mark_min
+        marks[f'stage_{stage_id}_mark_max']   = mark_max
+
+    data = {}
+    for values, as_ints in ((scores, common['scores_are_ints']),
+                            (marks, common['marks_are_ints'])):
+        for key, value in values.items():
+            if as_ints:
+                try:
+                    value = int(value)
+                except TypeError:
+                    pass
+            data[key] = value
+
+    text, unknown = feedback.render(data)
+
+    with open(path, 'w') as f:
+        f.write(text)
+
+    return unknown
+
+
+
+def _as_json(value):
+    """Retrieve a value as it would be after saving it to and loading it from
+    JSON (i.e., with tuples as lists), so it can be compared to loaded data.
+
+    Arguments:
+    value -- The value to convert.
+    """
+    if isinstance(value, (list, tuple)):
+        return [_as_json(v) for v in value]
+
+    return value
@@ -32,4 +32,54 @@ class Marks(base.Data):
 
     stage_id = property(lambda self:self._parent_data_id, doc="""
             Retrieve the stage identifier.
-            """)
\ No newline at end of file
+            """)
+
+    def __setitem__(self, outcome_id, mark):
+        """Set the mark for an outcome. Marks for a scale of values are stored
+        as a `ScaleMarks` dictionary so that changes to them are tracked.
+
+        Arguments:
+        outcome_id -- The unique outcome identifier.
+        mark -- A float, or a dictionary of marks (str->float).
+        """
+        if isinstance(mark, dict) and not isinstance(mark, ScaleMarks):
+            mark = ScaleMarks(mark)
+
+        return super().__setitem__(outcome_id, mark)
+
+    def _load_item(self, outcome_id, mark):
+        """Set the mark for an outcome loaded from permanent storage.
+
+        Arguments:
+        outcome_id -- The unique outcome identifier.
+        mark -- A float, or a dictionary of marks (str->float).
+        """
+        if isinstance(mark, dict) and not isinstance(mark, ScaleMarks):
+            mark = ScaleMarks(mark)
+
+        return super()._load_item(outcome_id, mark)
+
+
+
+class ScaleMarks(dict):
+    def __init__(self, *args, **kwargs):
+        """Marks for each of the values on an outcome's scale, organised by
+        the index of the value (as a string)."""
+        super().__init__(*args, **kwargs)
+
+        # container this is stored in, and the outcome identifier it is
+        # stored under (both set by the container)
+        self._parent         = None
+        self._parent_data_id = None
+
+    def __setitem__(self, mark_id, mark):
+        """Set the mark for a value on the scale.
+
+        Arguments:
+        mark_id -- Index of the value on the scale.
+        mark -- The mark to award.
+        """
+        super().__setitem__(mark_id, mark)
+
+        if self._parent is not None:
+            self._parent._on_change((self._parent_data_id,), self)
@@ -9,6 +9,8 @@ import abc
 
 
 class Model(object):
+    MODELS = ('outcomes', 'feedbacks', 'marks')
+
     def __init__(self):
         """All data corresponding to submissions is stored within this class
         instance.
@@ -25,6 +27,112 @@ class Model(object):
         self.feedbacks = AllSubmissions(self, feedbacks.FeedbackByStage)
         self.marks     = marks.StagesMarks(self)
 
+        # changes in each model are propagated up to `_on_change`, with the
+        # name of the model as the first identifier in the path
+        for name in Model.MODELS:
+            getattr(self, name)._parent         = self
+            getattr(self, name)._parent_data_id = name
+
+        # identifiers of the submissions (or stages for marks) that have 
+        # changed in each model since it was last saved, where None means
+        # the entire model has changed
+        self._dirty = {name: set() for name in Model.MODELS}
+
+        # number of changes to the marks of each stage, used to invalidate
+        # marks calculated from them, where None counts changes to all stages
+        self._marks_versions = {None: 0}
+
+        # number of changes to the outcomes model
+        self._outcomes_version = 0
+
+        # function called with the number of items done and the total number
+        # of items while saving takes a while (e.g., when finalising)
+        self.progress = None
+
+        # whether changes are written to permanent storage as they are made
+        # (where the model does so, e.g., in a journal), rather than only
+        # when the model is saved
+        self.journaling = True
+
+    def _on_change(self, path, value = None, deleted = False):
+        """Called whenever data in any of the models is changed. Records which 
+        submission (or stage, for marks) has changed so that only changed data
+        needs to be saved.
+
+        Arguments:
+        path -- Tuple of identifiers to the data that has changed, starting
+            with the name of the model (e.g., `('outcomes', submission,
+            stage_id, outcome_id)`).
+
+        Keyword arguments:
+        value -- The new value of the data.
+        deleted -- True if the data has been deleted.
+        """
+        data_id = path[1] if len(path) > 1 else None
+        self._dirty[path[0]].add(data_id)
+
+        if path[0] == 'marks':
+            self._marks_versions[data_id] = \
+                self._marks_versions.get(data_id, 0) + 1
+        elif path[0] == 'outcomes':
+            self._outcomes_version += 1
+
+    def _get_marks_version(self, stage_id = None):
+        """Retrieve a value that changes whenever the marks for a stage change.
+
+        Keyword arguments:
+        stage_id -- Identifier of the stage, or None for any stage.
+        """
+        if stage_id is None:
+            return sum(self._marks_versions.values())
+
+        return (self._marks_versions[None],
+                self._marks_versions.get(stage_id, 0))
+
+    def _is_dirty(self, name):
+        """Determine if a model has changed since it was last saved.
+
+        Arguments:
+        name -- Name of the model (i.e., 'outcomes', 'feedbacks' or 'marks').
+        """
+        return len(self._dirty[name]) > 0
+
+    def _get_dirty(self, name):
+        """Retrieve the identifiers of the submissions (or stages for marks)
+        that have changed in a model since it was last saved. If the set 
+        contains None, the entire model has changed.
+
+        Arguments:
+        name -- Name of the model (i.e., 'outcomes', 'feedbacks' or 'marks').
+        """
+        return set(self._dirty[name])
+
+    def _clear_dirty(self, *names):
+        """Mark models as saved.
+
+        Arguments:
+        names -- Names of the models, or all models if none are given.
+        """
+        for name in (names or Model.MODELS):
+            self._dirty[name].clear()
+
+    def get_scores(self):
+        """Retrieve the score of every submission, as a dictionary of
+        submission identifier to score."""
+        return {submission: submission_outcomes.score
+                for submission, submission_outcomes in self.outcomes.items()}
+
+    def _report_progress(self, done, total):
+        """Report how much of a long save has been done, if anything is
+        listening to `progress`.
+
+        Arguments:
+        done -- Number of items that have been saved.
+        total -- Number of items to save.
+        """
+        if self.progress is not None:
+            self.progress(done, total)
+
     @abc.abstractmethod
     def save(self):
         """Save the model data to permanent storage."""
@@ -42,13 +150,44 @@ class AllSubmissions(OrderedDict):
         model_type -- A data type that will be stored in this object, one for
             each submission.
         """
-        self._root_model = root_model
-        self._model_type = model_type
+        self._root_model     = root_model
+        self._model_type     = model_type
+        self._parent         = None
+        self._parent_data_id = None
+        self._loader         = None
+
+    def set_loader(self, submissions, loader):
+        """Register submissions whose data is stored elsewhere and is only
+        loaded when the submission is first accessed. Until then, the
+        submission is counted and iterated over but takes no memory.
+
+        Arguments:
+        submissions -- Iterable of the submission identifiers.
+        loader -- Function that is passed a submission identifier and should
+            load the submission's data into this container.
+        """
+        self._loader = loader
+
+        for submission in submissions:
+            submission = str(submission)
+            if not super().__contains__(submission):
+                super().__setitem__(submission, None)
+
+    def is_loaded(self, submission):
+        """Determine if the data for a submission has been loaded (and thus
+        may have been changed).
+
+        Arguments:
+        submission -- Identifier of the submission.
+        """
+        submission = str(submission)
+        return super().get(submission) is not None
 
     def __getitem__(self, submission):
         """Retrieve an item using the square bracket syntax. If a particular 
         `submission` doesn't exist, then one will be created with an initialised
-        value of the type passed into `__init__`.
+        value of the type passed into `__init__`. If the submission hasn't been
+        loaded yet, it is loaded now.
 
         Arguments:
         stage_id -- Identifier of the stage, will be converted to a string if it
@@ -56,11 +195,89 @@ class AllSubmissions(OrderedDict):
         """
         submission = str(submission)
         try:
-            return super().__getitem__(submission)
+            value = super().__getitem__(submission)
+            if value is not None:
+                return value
+            unloaded = True
         except KeyError:
-            super().__setitem__(submission, self._model_type(self._root_model,
-                                                             submission))
-            return super().__getitem__(submission)
+            unloaded = False
+
+        new_obj = self._model_type(self._root_model, submission)
+        super().__setitem__(submission, new_obj)
+
+        # loading the data isn't a change, so attach to the parent after
+        if unloaded:
+            self._loader(submission)
+
+        new_obj._parent = self
+        return new_obj
+
+    def get(self, submission, default = None):
+        """Retrieve the data for a submission, or `default` if the submission
+        doesn't exist (it will not be created).
+
+        Arguments:
+        submission -- Identifier of the submission.
+
+        Keyword arguments:
+        default -- Value to return if the submission doesn't exist.
+        """
+        if submission in self:
+            return self[submission]
+
+        return default
+
+    def values(self):
+        """Iterate over the data for every submission, loading it if needed."""
+        for submission in list(self.keys()):
+            yield self[submission]
+
+    def items(self):
+        """Iterate over the identifier and data for every submission, loading
+        the data if needed."""
+        for submission in list(self.keys()):
+            yield submission, self[submission]
+
+    def __delitem__(self, submission):
+        """Delete all data for a submission.
+
+        Arguments:
+        submission -- Identifier of the submission, will be converted to a
+            string if it isn't already a string.
+        """
+        submission = str(submission)
+        value = super().__getitem__(submission)
+        super().__delitem__(submission)
+
+        if value is not None:
+            value._parent = None
+
+        self._on_change((submission,), deleted = True)
+
+    def clear(self):
+        """Delete the data for all submissions."""
+        for value in super().values():
+            if value is not None:
+                value._parent = None
+
+        super().clear()
+        self._on_change((), {})
+
+    def _on_change(self, path, value = None, deleted = False):
+        """Propagate a change to a submission's data up to the root model.
+
+        Arguments:
+        path -- Tuple of identifiers, relative to this container, of the data
+            that has changed.
+
+        Keyword arguments:
+        value -- The new value of the data.
+        deleted -- True if the data has been deleted.
+        """
+        if self._parent is not None:
+            self._parent._on_change((self._parent_data_id,) + path,
+                                    value,
+                                    deleted)
 
     def __contains__(self, submission):
         submission = str(submission)
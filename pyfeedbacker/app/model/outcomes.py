@@ -21,19 +21,23 @@ class OutcomesByStage(base.DataByStage):
                          child_data_type = Outcomes,
                          parent_data_id  = parent_data_id)
 
-        try:
-            score_init = config.ini['assessment'].getfloat('score_init', False)
-            if score_init:
-                self['__init']['0'] = Outcome(outcome_id = '0',
-                                            value      = score_init)
-        except KeyError:
-            pass
-
-    score = property(lambda self:self._calculate_score(), doc="""
+        score_init = config.ini.compiled.score_init
+        if score_init:
+            self['__init']['0'] = Outcome(outcome_id = '0',
+                                          value      = score_init)
+
+    score = property(lambda self:self._get_cached(
+                                'score',
+                                config.ini.version,
+                                self._calculate_score), doc="""
             The total score for the submission as a float.
             """)
 
-    mark = property(lambda self:self._calculate_mark(), doc="""
+    mark = property(lambda self:self._get_cached(
+                                'mark',
+                                (config.ini.version,
+                                 _get_marks_version(self._root_model)),
+                                self._calculate_mark), doc="""
             The total mark for the submission as a float.
             """)
 
@@ -46,21 +50,9 @@ class OutcomesByStage(base.DataByStage):
         for value in self.values():
             score += value.score
 
-        try:
-            s_max = config.ini[f'assessment'].getfloat('score_max', None)
-            if s_max is not None and score > s_max:
-                score = s_max
-        except KeyError:
-            pass
-
-        try:
-            s_min = config.ini[f'assessment'].getfloat('score_min', None)
-            if s_min is not None and score < s_min:
-                score = s_min
-        except KeyError:
-            pass
-
-        return score
+        return _apply_bounds(score,
+                             config.ini.compiled.score_min,
+                             config.ini.compiled.score_max)
 
     def _calculate_mark(self):
         """Calculate the total mark for this submission, and apply any 
@@ -71,25 +63,13 @@ class OutcomesByStage(base.DataByStage):
         for value in self.values():
             sum += value.mark
 
-        try:
-            m_max = config.ini[f'assessment'].getfloat('mark_max', None)
-            if m_max is not None and sum > m_max:
-                sum = m_max
-        except KeyError:
-            pass
-
-        try:
-            m_min = config.ini[f'assessment'].getfloat('mark_min', None)
-            if m_min is not None and sum < m_min:
-                sum = m_min
-        except KeyError:
-            pass
-
-        return sum
+        return _apply_bounds(sum,
+                             config.ini.compiled.mark_min,
+                             config.ini.compiled.mark_max)
 
     def __float__(self):
         """The total score for the submission as a float."""
-        return self._calculate_score()
+        return self.score
 
 
 
@@ -111,19 +91,22 @@ class Outcomes(base.Data):
 
     def __setitem__(self, outcome_id, new_outcome):
         outcome_id = str(outcome_id)
+
+        # outcomes loaded from permanent storage are plain dictionaries
+        if not isinstance(new_outcome, Outcome):
+            new_outcome = Outcome(**new_outcome)
         
-        try:
-            existing_index = list(self.values()).index(new_outcome)
-            existing_key = list(self.keys())[existing_index]
-            del self[existing_key]
-        except:
-            pass
+        self._remove_existing(new_outcome)
 
         if outcome_id != new_outcome['outcome_id']:
             new_outcome['outcome_id'] = outcome_id
 
         if outcome_id in self:
             outcome = self[outcome_id]
+
+            # update the existing outcome, but only report the change once
+            outcome._parent = None
+
             if new_outcome['outcome_id'] != outcome['outcome_id']:
                 outcome['outcome_id'] = new_outcome['outcome_id']
 
@@ -138,15 +121,55 @@ class Outcomes(base.Data):
 
             if new_outcome['all_values'] != outcome['all_values']:
                 outcome['all_values'] = new_outcome['all_values']
+
+            if new_outcome['user_input'] != outcome['user_input']:
+                outcome['user_input'] = new_outcome['user_input']
+
+            outcome._parent = self
+            self._on_change((outcome_id,), outcome)
         else:
             new_outcome['outcome_id'] = outcome_id
             return super().__setitem__(outcome_id, new_outcome)
 
-    score = property(lambda self:self._calculate_score(), doc="""
+    def _load_item(self, outcome_id, outcome):
+        """Set an outcome loaded from permanent storage, replacing any outcome
+        already stored under `outcome_id`.
+
+        Arguments:
+        outcome_id -- The unique outcome identifier.
+        outcome -- An `Outcome` or a dictionary of its elements.
+        """
+        outcome_id = str(outcome_id)
+
+        if not isinstance(outcome, Outcome):
+            outcome = Outcome(**outcome)
+        outcome.outcome_id = outcome_id
+
+        return super()._load_item(outcome_id, outcome)
+
+    def __dict__(self):
+        """Retrieve a copy of the outcomes as a new dictionary."""
+        items = {}
+
+        for key, value in self.items():
+            items[key] = value.dict
+
+        return items
+
+    score = property(lambda self:self._get_cached(
+                                'score',
+                                (config.ini.version, self.stage_id),
+                                self._calculate_score), doc="""
             Read the total score for the submission as a float.
             """)
 
-    mark = property(lambda self:self._calculate_mark(), doc="""
+    mark = property(lambda self:self._get_cached(
+                                'mark',
+                                (config.ini.version,
+                                 self.stage_id,
+                                 _get_marks_version(self._root_model,
+                                                    self.stage_id)),
+                                self._calculate_mark), doc="""
             Read the total mark for the submission as a float.
             """)
 
@@ -160,86 +183,95 @@ class Outcomes(base.Data):
             except:
                 pass
 
-        try:
-            s_max = config.ini[f'stage_{self.stage_id}'].getfloat(
-                'score_max', None)
-            if s_max is not None and score > s_max:
-                score = s_max
-        except KeyError:
-            pass
-
-        try:
-            s_min = config.ini[f'stage_{self.stage_id}'].getfloat(
-                'score_min', None)
-            if s_min is not None and score < s_min:
-                score = s_min
-        except KeyError:
-            pass
-
-        return score
+        stage_cfg = config.ini.compiled.get_stage(self.stage_id)
+        return _apply_bounds(score, stage_cfg.score_min, stage_cfg.score_max)
 
     def _calculate_mark(self):
         """Calculate the total mark for a particular stage."""
-        try:
-            marks = self._root_model.marks[self.stage_id]
-        except:
-            marks = None
+        marks = self._get_marks()
         sum = 0.0
 
-        for outcome_id, outcome in self.items():
-            if outcome['user_input']:
-                try:
-                    # if this is user_input, any value in the marks model is 
-                    # a scale factor
-                    sum += (outcome['value'] * marks[outcome_id])
-                except:
-                    # if the value in the outcomes model is a float, add it
-                    # otherwise do nothing
-                    try:
-                        sum += outcome['value']
-                    except TypeError:
-                        pass
-            else:
-                # if there is a value in the marks model for the outcome, use
-                # that, otherwise use the score
-                try:
-                    key = str(outcome['key'])
-                    value = marks[outcome_id][key]
-                    sum += value
-                except:
-                    # if the value in the outcomes model is a float, add it
-                    # otherwise do nothing
-                    try:
-                        sum += outcome['value']
-                    except TypeError:
-                        pass
+        for outcome_id in self.keys():
+            value = self.get_mark(outcome_id, marks)
+            if value is not None:
+                sum += value
 
-        try:
-            m_max = config.ini[f'stage_{self.stage_id}'].getfloat(
-                'mark_max', None)
-            if m_max is not None and sum > m_max:
-                sum = m_max
-        except KeyError:
-            pass
+        stage_cfg = config.ini.compiled.get_stage(self.stage_id)
+        return _apply_bounds(sum, stage_cfg.mark_min, stage_cfg.mark_max)
 
+    def _get_marks(self):
+        """Retrieve the marks of the stage from the marks model, or None."""
+        # use get() so that reading marks doesn't add them to the model
         try:
-            m_min = config.ini[f'stage_{self.stage_id}'].getfloat(
-                'mark_min', None)
-            if m_min is not None and sum < m_min:
-                sum = m_min
-        except KeyError:
-            pass
+            return self._root_model.marks.get(self.stage_id)
+        except:
+            return None
+
+    def get_mark(self, outcome_id, marks = None):
+        """Calculate the mark for a single outcome of the stage (before the
+        bounds of the stage are applied).
+
+        Arguments:
+        outcome_id -- Identifier of the outcome.
+
+        Keyword arguments:
+        marks -- The marks of the stage, if they have already been retrieved
+            from the marks model.
 
-        return sum
+        Returns:
+        The mark, or None if the outcome has neither a mark nor a value.
+        """
+        if marks is None:
+            marks = self._get_marks()
+
+        outcome = self[outcome_id]
+        if outcome['user_input']:
+            try:
+                # if this is user_input, any value in the marks model is 
+                # a scale factor
+                return 0.0 + outcome['value'] * marks.get(outcome_id)
+            except:
+                pass
+        else:
+            # if there is a value in the marks model for the outcome, use
+            # that, otherwise use the score
+            try:
+                key = str(outcome['key'])
+                return 0.0 + marks.get(outcome_id)[key]
+            except:
+                pass
+
+        # if the value in the outcomes model is a float, use it otherwise
+        # there is no mark
+        try:
+            return 0.0 + outcome['value']
+        except TypeError:
+            return None
 
     def __float__(self):
         """Calculate the total score for a particular stage."""
-        return self._calculate_score()
+        return self.score
+
 
 
 
+class Outcome(object):
+    # elements of an outcome, in the order they are passed to `__init__`
+    FIELDS = ('outcome_id', 'key', 'explanation', 'value', 'all_values',
+              'user_input')
+
+    # elements that are the same for every submission with the outcome, and so
+    # are saved once per stage in the outcome schema
+    SCHEMA_FIELDS = ('explanation', 'all_values')
+
+    # each outcome only stores its elements, rather than a dictionary of them,
+    # as there are many outcomes for every submission
+    __slots__ = FIELDS + ('_parent',)
+
+    _FIELDS_SET = frozenset(FIELDS)
+
+    __hash__ = None
 
-class Outcome(dict):
     def __init__(self,
                  outcome_id  = None,
                  key         = None,
@@ -247,14 +279,41 @@ class Outcome(dict):
                  value       = None,
                  all_values  = None,
                  user_input  = False):
-        super().__init__()
+        """The outcome of a stage for a submission. Elements are read and set
+        using the square bracket syntax (i.e., like a dictionary), using the
+        names of the arguments below.
+
+        Keyword arguments:
+        outcome_id -- The unique outcome identifier.
+        key -- Index of the value in `all_values` that was chosen, if any.
+        explanation -- Explanation of the outcome.
+        value -- The score for the outcome, which is cast to a float.
+        all_values -- List of (label, score) of possible values, if any.
+        user_input -- True if the value was entered by the user.
+        """
+        # container this outcome is stored in (set by the container)
+        self._parent     = None
+
+        self.outcome_id  = outcome_id
+        self.key         = key
+        self.explanation = explanation
+        self.value       = _as_float(value)
+        self.all_values  = all_values
+        self.user_input  = user_input
 
-        self['outcome_id']  = outcome_id
-        self['key']         = key
-        self['explanation'] = explanation
-        self['value']       = value
-        self['all_values']  = all_values
-        self['user_input']  = user_input
+    def __getitem__(self, key):
+        """Retrieve an element of the outcome.
+
+        Arguments:
+        key -- Name of the element (see `__init__` parameters).
+
+        Raises:
+        KeyError -- if there is no such element.
+        """
+        if key not in Outcome._FIELDS_SET:
+            raise KeyError(key)
+
+        return getattr(self, key)
 
     def __setitem__(self, key, value):
         """Set an element in the outcome.
@@ -263,15 +322,71 @@ class Outcome(dict):
         key -- A key for the element (see `__init__` parameters)
         value -- A value for the element. If the `key` is 'value', then this
             value is cast to a float.
+
+        Raises:
+        KeyError -- if there is no such element.
         """
         key = str(key)
+        if key not in Outcome._FIELDS_SET:
+            raise KeyError(key)
+
         if key == 'value':
-            try:
-                return super().__setitem__(key, float(value))
-            except:
-                pass
+            value = _as_float(value)
+
+        setattr(self, key, value)
+
+        if self._parent is not None:
+            self._parent._on_change((self.outcome_id,), self)
+
+    def get(self, key, default = None):
+        """Retrieve an element of the outcome, or `default` if there is no 
+        such element.
+
+        Arguments:
+        key -- Name of the element (see `__init__` parameters).
+
+        Keyword arguments:
+        default -- Value to return if there is no such element.
+        """
+        if key not in Outcome._FIELDS_SET:
+            return default
 
-        super().__setitem__(key, value)
+        return getattr(self, key)
+
+    def keys(self):
+        """Retrieve the names of the elements of the outcome."""
+        return Outcome.FIELDS
+
+    def values(self):
+        """Retrieve the elements of the outcome."""
+        return (self.outcome_id, self.key, self.explanation, self.value,
+                self.all_values, self.user_input)
+
+    def items(self):
+        """Retrieve the names and elements of the outcome."""
+        return zip(Outcome.FIELDS, self.values())
+
+    def __iter__(self):
+        return iter(Outcome.FIELDS)
+
+    def __len__(self):
+        return len(Outcome.FIELDS)
+
+    def __contains__(self, key):
+        return key in Outcome._FIELDS_SET
+
+    def __eq__(self, other):
+        if isinstance(other, Outcome):
+            return self.values() == other.values()
+        elif isinstance(other, dict):
+            return self.dict == other
+
+        return NotImplemented
+
+    dict = property(lambda self:dict(zip(Outcome.FIELDS, self.values())),
+                    doc="""
+            Retrieve a copy of the outcome as a new dictionary.
+            """)
 
     def __float__(self):
         """Retrieve the value of the outcome as a float, or raise a 
@@ -281,10 +396,58 @@ class Outcome(dict):
         ValueError -- if no value is set for the outcom
         """
         try:
-            return float(self['value'])
+            return float(self.value)
         except TypeError:
-            outcome_id = self['outcome_id']
+            outcome_id = self.outcome_id
             raise ValueError(f'Value is not set for outcome {outcome_id}')
 
     def __repr__(self):
-        return str(f'Outcome({self.outcome_id}, {self.value})')
\ No newline at end of file
+        return str(f'Outcome({self.outcome_id}, {self.value})')
+
+
+
+def _as_float(value):
+    """Cast a value to a float, if it can be.
+
+    Arguments:
+    value -- The value to cast.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+
+def _apply_bounds(value, value_min, value_max):
+    """Restrict a value to configured bounds.
+
+    Arguments:
+    value -- The value to restrict.
+    value_min -- The minimum value, or None if there is no minimum.
+    value_max -- The maximum value, or None if there is no maximum.
+    """
+    if value_max is not None and value > value_max:
+        value = value_max
+
+    if value_min is not None and value < value_min:
+        value = value_min
+
+    return value
+
+
+
+def _get_marks_version(root_model, stage_id = None):
+    """Retrieve a value that changes whenever the marks for a stage change, or
+    None if there is no root model (and thus no marks).
+
+    Arguments:
+    root_model -- The root model object.
+
+    Keyword arguments:
+    stage_id -- Identifier of the stage, or None for any stage.
+    """
+    try:
+        return root_model._get_marks_version(stage_id)
+    except AttributeError:
+        return None
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+
+from pyfeedbacker.app import config
+from pyfeedbacker.app.model import fs
+
+import hashlib
+import json
+import os
+import shutil
+
+
+
+class ShardedFileSystemModel(fs.FileSystemModel):
+    def __init__(self):
+        """Store the outcomes and feedbacks of each submission in a directory
+        of its own, with a manifest listing all the submissions and their
+        scores. The data for a submission is only loaded when it is first
+        accessed, and only submissions that have been loaded are saved, so
+        scoring a single submission doesn't require loading or saving every
+        submission.
+
+        Outcomes marks, the journal, CSV files and final feedback text files
+        use the filenames in the `[model_file]` section of the configuration.
+        CSV files and final feedback text files are only generated when
+        finalising (or when scores are marks).
+        """
+        # score of each submission in the manifest, as it is saved, whether
+        # each submission has any feedback, and a digest of the
+        # configuration the scores were calculated with
+        self._manifest           = {}
+        self._manifest_feedbacks = {}
+        self._manifest_config    = None
+
+        # digest of the configuration, and the version it was calculated for
+        self._config_digest         = None
+        self._config_digest_version = None
+
+        super().__init__()
+
+    def _load_raw_data(self):
+        """Load the manifest of submissions and the outcomes marks. The
+        outcomes and feedbacks of each submission are loaded on first
+        access."""
+        file_manifest = config.ini['model_sharded']['file_manifest']
+        try:
+            with open(file_manifest, 'r') as json_file:
+                manifest = json.load(json_file)
+        except json.decoder.JSONDecodeError:
+            manifest = {}
+        except FileNotFoundError:
+            manifest = {}
+
+        # manifests that only list the submissions don't have their scores,
+        # and the scores of manifests without a digest of the configuration
+        # can't be trusted
+        if isinstance(manifest, list):
+            self._manifest = dict.fromkeys(manifest)
+        elif isinstance(manifest.get('scores'), dict):
+            self._manifest           = manifest['scores']
+            self._manifest_feedbacks = manifest.get('feedbacks', {})
+            self._manifest_config    = manifest.get('config')
+        else:
+            self._manifest        = manifest
+        self._manifest_config = self._get_config_digest()
+
+        file_schema = config.ini['model_sharded']['file_schema']
+        self._outcomes_schema = self._load_json(file_schema)
+
+        self.outcomes.set_loader(self._manifest, self._load_shard_outcomes)
+        self.feedbacks.set_loader(self._manifest, self._load_shard_feedbacks)
+
+        file_outcomes_marks = config.ini['model_file']['file_outcomes_marks']
+        for stage_id, marks in self._load_json(file_outcomes_marks).items():
+            self._load_stage_marks(stage_id, marks)
+
+    def _get_shard_path(self, submission, name):
+        """Retrieve the path of one of the files for a submission.
+
+        Arguments:
+        submission -- The submission identifier.
+        name -- Name of the model stored in the file (e.g., 'outcomes').
+        """
+        dir_shards = config.ini['model_sharded']['dir_shards']
+        return os.path.join(dir_shards, submission, name + '.json')
+
+    def _load_shard_outcomes(self, submission):
+        """Load the outcomes of a submission from its directory.
+
+        Arguments:
+        submission -- The submission identifier.
+        """
+        path = self._get_shard_path(submission, 'outcomes')
+        self._load_submission_outcomes(submission, self._load_json(path))
+
+    def _load_shard_feedbacks(self, submission):
+        """Load the feedbacks of a submission from its directory.
+
+        Arguments:
+        submission -- The submission identifier.
+        """
+        path = self._get_shard_path(submission, 'feedbacks')
+        self._load_submission_feedbacks(submission, self._load_json(path))
+
+    def _save_scores(self, force_finalise=False, save_marks=False):
+        """Save scores, and optionally marks, to CSV files. As this requires
+        loading every submission, scores are only saved when finalising (or
+        when scores are marks).
+
+        Keyword arguments:
+        force_finalise -- Forces the saving of marks to a separate CSV file
+            if True.
+        save_marks -- Only save marks to a CSV file, not scores, if True.
+        """
+        if config.ini.compiled.scores_are_marks or force_finalise \
+                or save_marks:
+            super()._save_scores(force_finalise = force_finalise,
+                                 save_marks     = save_marks)
+
+    def _save_feedbacks(self, force_finalise=False):
+        """Save the feedbacks of each submission that has changed, and
+        optionally generate individual text files per submission.
+
+        Keyword arguments:
+        force_finalise -- Forces the saving of feedbacks to individual text
+            files if True.
+        """
+        self._save_shards('feedbacks')
+
+        if config.ini.compiled.scores_are_marks or force_finalise:
+            self._save_final_feedbacks()
+
+    def _save_outcomes(self):
+        """Save the outcomes of each submission that has changed, the outcome
+        schema and the manifest (if they have changed), and remove the
+        directories of submissions that have been deleted."""
+        self._save_shards('outcomes')
+
+        manifest  = self._get_manifest()
+        feedbacks = self._get_manifest_feedbacks()
+        file_name, data = self._get_manifest_file()
+        if manifest != self._manifest or not os.path.exists(file_name) or \
+                feedbacks != self._manifest_feedbacks or \
+                self._manifest_config != self._get_config_digest():
+            self._write_json(file_name, data)
+
+        dir_shards = config.ini['model_sharded']['dir_shards']
+        for submission in self._manifest:
+            if submission not in manifest:
+                shutil.rmtree(os.path.join(dir_shards, submission),
+                              ignore_errors = True)
+
+        self._manifest           = manifest
+        self._manifest_feedbacks = feedbacks
+        self._manifest_config    = self._get_config_digest()
+
+    def _save_shards(self, name):
+        """Save the file of each submission that has changed in a model, and
+        remove the file of each submission that has been deleted from it.
+
+        Arguments:
+        name -- Name of the model (i.e., 'outcomes' or 'feedbacks').
+        """
+        container = getattr(self, name)
+        dirty     = self._get_dirty(name)
+
+        files = self._get_shard_files(name)
+
+        # outcomes refer to the outcome schema, so it must be saved first
+        if self._outcomes_schema_changed:
+            files.insert(0, self._get_schema_file())
+
+        for file_name, data in files:
+            self._write_json(file_name, data)
+
+        for submission in dirty:
+            if submission is not None and submission not in container:
+                try:
+                    os.remove(self._get_shard_path(submission, name))
+                except FileNotFoundError:
+                    pass
+
+        self._clear_dirty(name)
+
+    def _get_shard_files(self, name):
+        """Retrieve the file for each loaded submission that has changed in a
+        model, and a copy of its data, as a list of (file_name, data).
+
+        Arguments:
+        name -- Name of the model (i.e., 'outcomes' or 'feedbacks').
+        """
+        container = getattr(self, name)
+        dirty     = self._get_dirty(name)
+
+        files = []
+        for submission in container.keys():
+            if not container.is_loaded(submission):
+                continue
+
+            if None not in dirty and submission not in dirty:
+                continue
+
+            if name == 'outcomes':
+                data = self._compact_submission_outcomes(container[submission])
+            else:
+                data = container[submission].dict
+
+            files.append((self._get_shard_path(submission, name), data))
+
+        return files
+
+    def get_scores(self):
+        """Retrieve the score of every submission, as a dictionary of
+        submission identifier to score. Scores are taken from the manifest,
+        so submissions that haven't been loaded aren't loaded, unless the
+        manifest doesn't have their score or the configuration has changed
+        since it was saved."""
+        manifest = self._get_manifest_scores()
+
+        scores = {}
+        for submission in self.outcomes.keys():
+            score = manifest.get(submission)
+            if score is None or self.outcomes.is_loaded(submission):
+                score = self.outcomes[submission].score
+
+            scores[submission] = score
+
+        return scores
+
+    def is_marked(self, submission):
+        """Determine if a submission has been scored, i.e., it has a score or
+        any feedback. Whether it has is taken from the manifest, so the
+        submission isn't loaded, unless the manifest doesn't know or the
+        configuration has changed since it was saved.
+
+        Arguments:
+        submission -- Identifier of the submission.
+        """
+        submission = str(submission)
+
+        if self.feedbacks.is_loaded(submission) or \
+                self._manifest_feedbacks.get(submission) is None:
+            feedbacks = self.feedbacks.get(submission)
+            if feedbacks is not None and len(feedbacks.str) > 0:
+                return True
+        elif self._manifest_feedbacks[submission]:
+            return True
+
+        score = self._get_manifest_scores().get(submission)
+        if score is None or self.outcomes.is_loaded(submission):
+            outcomes = self.outcomes.get(submission)
+            score    = 0.0 if outcomes is None else outcomes.score
+
+        return score != 0.0
+
+    def _get_manifest(self):
+        """Retrieve the score of every submission in the model (or None if
+        it isn't known), as a dictionary of submission identifier to score.
+        """
+        scores = self._get_manifest_scores()
+
+        manifest = {}
+        for submission in self.outcomes.keys():
+            if self.outcomes.is_loaded(submission):
+                manifest[submission] = self.outcomes[submission].score
+            else:
+                manifest[submission] = scores.get(submission)
+
+        for submission in self.feedbacks.keys():
+            if submission not in manifest:
+                manifest[submission] = None
+
+        return manifest
+
+    def _get_manifest_feedbacks(self):
+        """Retrieve whether each submission in the model has any feedback (or
+        None if it isn't known), as a dictionary of submission identifier to
+        bool."""
+        manifest = dict.fromkeys(self.outcomes.keys(), False)
+        for submission in self.feedbacks.keys():
+            if self.feedbacks.is_loaded(submission):
+                manifest[submission] = len(self.feedbacks[submission].str) > 0
+            else:
+                manifest[submission] = self._manifest_feedbacks.get(
+                    submission)
+
+        return manifest
+
+    def _get_manifest_scores(self):
+        """Retrieve the scores in the manifest, or no scores if they were
+        calculated with a different configuration."""
+        if self._manifest_config != self._get_config_digest():
+            return {}
+
+        return self._manifest
+
+    def _get_config_digest(self):
+        """Retrieve a digest of the configuration, which is only calculated
+        again after the configuration changes. Unlike the version of the
+        configuration, the digest is the same in every session if the
+        configuration is the same, so it can be saved in the manifest."""
+        if self._config_digest_version != config.ini.version:
+            sections = {section: dict(config.ini.items(section, raw = True))
+                        for section in config.ini.sections()}
+
+            self._config_digest = hashlib.sha256(
+                json.dumps(sections, sort_keys = True).encode()).hexdigest()
+            self._config_digest_version = config.ini.version
+
+        return self._config_digest
+
+    def _get_schema_file(self):
+        """Retrieve the outcome schema file and a copy of its data, as
+        (file_name, data). The schema is then no longer marked as changed, so
+        the file must be written."""
+        self._outcomes_schema_changed = False
+
+        # outcomes are added to the schema of a stage as they are saved, but
+        # their elements never change
+        return (config.ini['model_sharded']['file_schema'],
+                {stage_id: dict(schema)
+                 for stage_id, schema in self._outcomes_schema.items()})
+
+    def _get_manifest_file(self):
+        """Retrieve the manifest file and its data, as (file_name, data)."""
+        return (config.ini['model_sharded']['file_manifest'],
+                {'config'    : self._get_config_digest(),
+                 'scores'    : self._get_manifest(),
+                 'feedbacks' : self._get_manifest_feedbacks()})
+
+    def _snapshot_dirty_files(self):
+        """Retrieve the files (and a copy of their data) that store the
+        submissions that have changed since they were last saved, as a list
+        of (file_name, data)."""
+        files = self._get_shard_files('feedbacks') + \
+                self._get_shard_files('outcomes')
+
+        if self._outcomes_schema_changed:
+            files.insert(0, self._get_schema_file())
+
+        if self._get_manifest() != self._manifest or \
+                self._get_manifest_feedbacks() != self._manifest_feedbacks or \
+                self._manifest_config != self._get_config_digest():
+            files.append(self._get_manifest_file())
+
+        if self._is_dirty('marks'):
+            files.append((config.ini['model_file']['file_outcomes_marks'],
+                          self._get_outcomes_marks_data()))
+
+        return files
+
+    def _write_file(self, file_name, data):
+        """Atomically replace the contents of a file, creating its directory
+        if it doesn't exist.
+
+        Arguments:
+        file_name -- Path to the file.
+        data -- String to write to the file.
+        """
+        os.makedirs(os.path.dirname(file_name), exist_ok = True)
+        super()._write_file(file_name, data)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+from pyfeedbacker.app import config
+from pyfeedbacker.app.model import fs
+
+import json
+import sqlite3
+
+
+
+class SQLiteModel(fs.FileSystemModel):
+    TABLES = [('outcomes',  'submission'),
+              ('feedbacks', 'submission'),
+              ('marks',     'stage_id')]
+
+    def __init__(self):
+        """Store all marking information in a SQLite database. Outcomes and
+        feedbacks are stored as one row per submission, and outcomes marks as
+        one row per stage, so saving only upserts the rows that have changed
+        since they were loaded or last saved. The outcome schema is stored as
+        one row per stage in the `schema` table.
+
+        CSV files and final feedback text files are generated in the same way
+        as the file system model, but only when finalising (or when scores
+        are marks).
+        """
+        file_database = config.ini['model_sqlite']['file_database']
+
+        self._db = sqlite3.connect(file_database)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        with self._db:
+            for table, column in SQLiteModel.TABLES:
+                self._db.execute(f'CREATE TABLE IF NOT EXISTS {table} ('
+                                 f'{column} TEXT PRIMARY KEY, '
+                                 f'data TEXT NOT NULL)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS schema ('
+                             'stage_id TEXT PRIMARY KEY, '
+                             'data TEXT NOT NULL)')
+
+        super().__init__()
+
+    def _get_journal_path(self):
+        """The database is updated on every save, so there is no journal."""
+        return None
+
+    def _load_raw_data(self):
+        """Load the data from the database."""
+        for stage_id, data in self._db.execute(
+                'SELECT stage_id, data FROM schema'):
+            try:
+                self._outcomes_schema[stage_id] = json.loads(data)
+            except json.decoder.JSONDecodeError:
+                continue
+
+        loaders = {'outcomes':  self._load_submission_outcomes,
+                   'feedbacks': self._load_submission_feedbacks,
+                   'marks':     self._load_stage_marks}
+
+        for table, column in SQLiteModel.TABLES:
+            for data_id, data in self._db.execute(
+                    f'SELECT {column}, data FROM {table} ORDER BY rowid'):
+                try:
+                    loaders[table](data_id, json.loads(data))
+                except json.decoder.JSONDecodeError:
+                    continue
+
+    def save(self, force_finalise=False):
+        """Save the changed feedbacks, outcomes, and outcomes marks to the
+        database. The scores and marks per submission are saved to CSV and
+        the feedbacks to text files, one per submission, only when finalising.
+
+        Keyword arguments:
+        force_finalise -- Forces the saving of marks per submission to CSV files
+            and feedbacks to individual text files if True.
+        """
+        with self._db:
+            self._save_rows('outcomes',  'submission', self.outcomes,
+                            self._compact_submission_outcomes)
+            self._save_rows('feedbacks', 'submission', self.feedbacks)
+            self._save_rows('marks',     'stage_id',   self.marks)
+
+            if self._outcomes_schema_changed:
+                self._save_schema()
+
+        if config.ini.compiled.scores_are_marks or force_finalise:
+            self._save_scores(force_finalise=force_finalise)
+            self._save_final_feedbacks()
+
+        self._clear_dirty()
+
+    def _save_rows(self, table, column, container, dump = None):
+        """Upsert every row of a table whose data has changed, and delete any
+        rows that have been deleted from the model. Must be called inside a
+        transaction.
+
+        Arguments:
+        table -- Name of the table to save to.
+        column -- Name of the primary key column of the table.
+        container -- The model container, each item of which is one row.
+
+        Keyword arguments:
+        dump -- Function that retrieves an item of the container as a 
+            dictionary, or None to use the item's `dict`.
+        """
+        if dump is None:
+            dump = lambda value: value.dict
+
+        dirty = self._get_dirty(table)
+
+        # the whole model was replaced, so rewrite the whole table
+        if None in dirty:
+            self._db.execute(f'DELETE FROM {table}')
+            dirty = set(container.keys())
+
+        # upsert in the order of the model, so new rows keep that order
+        for data_id in container.keys():
+            if data_id in dirty:
+                self._db.execute(f'INSERT INTO {table} ({column}, data) '
+                                 f'VALUES (?, ?) ON CONFLICT ({column}) '
+                                 f'DO UPDATE SET data = excluded.data',
+                                 (data_id,
+                                  json.dumps(dump(container[data_id]))))
+
+        for data_id in dirty:
+            if data_id not in container:
+                self._db.execute(f'DELETE FROM {table} WHERE {column} = ?',
+                                 (data_id,))
+
+    def _save_schema(self):
+        """Upsert the outcome schema of every stage. Must be called inside a
+        transaction."""
+        for stage_id, schema in self._outcomes_schema.items():
+            self._db.execute('INSERT INTO schema (stage_id, data) '
+                             'VALUES (?, ?) ON CONFLICT (stage_id) '
+                             'DO UPDATE SET data = excluded.data',
+                             (stage_id, json.dumps(schema)))
+
+        self._outcomes_schema_changed = False
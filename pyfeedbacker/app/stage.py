@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 
-from pyfeedbacker.app import config
+from pyfeedbacker.app import cache, capture, config, workspace
 from pyfeedbacker.app.model import outcomes
 
 import abc
+import asyncio
+import concurrent.futures
 import importlib
+import inspect
 import json
 import os
+import signal
 import subprocess
+import threading
+import time
 
 
 class StageInfo:
@@ -48,7 +54,7 @@ class StageInfo:
         self.model      = controller.model
         self.view       = controller.view
 
-        self.debug = config.ini['app'].getboolean('debug', False)
+        self.debug = config.ini.compiled.debug
 
         self.stage_id   = stage_id
         self.label      = label
@@ -59,8 +65,7 @@ class StageInfo:
 
         # import the stage class
         try:
-            module = importlib.import_module('pyfeedbacker.stages.' + stage_id)
-            self.handler = getattr(module, class_name)
+            self.handler = StageInfo.import_handler(stage_id)
 
             if handler == 'HandlerNone':
                 self.state  = StageInfo.STATE_COMPLETE
@@ -92,6 +97,22 @@ class StageInfo:
     def set_state(self, state):
         self.state = state
 
+    @staticmethod
+    def import_handler(stage_id):
+        """Import the handler class for a stage, which is the class called
+        `Stage` followed by the capitalised stage identifier in the module of
+        the same name as the stage identifier in the stages package.
+
+        Arguments:
+        stage_id -- Textual simple id for the stage
+
+        Raises:
+        ModuleNotFoundError -- if there is no module for the stage.
+        AttributeError -- if the module has no handler class for the stage.
+        """
+        module = importlib.import_module('pyfeedbacker.stages.' + stage_id)
+        return getattr(module, 'Stage' + stage_id.capitalize())
+
 
 
 class StageResult:
@@ -152,14 +173,13 @@ class HandlerBase:
         self.output      = OutputNone()
         self.interactive = False
         self.stage_id    = stage_id
+        self.cancelled   = False
 
     def set_framework(self, controller):
         """Set the controller (and by proxy the model and the view). Called by
         the marker controller.
         """
-        self.controller       = controller
-        self.model            = controller.model
-        self.view             = controller.view
+        self.set_controller(controller)
 
         try:
             self.submission   = self.controller.submission
@@ -170,9 +190,28 @@ class HandlerBase:
 
         self.calculate_outcomes()
 
-        self._dir_temp        = config.ini['app']['dir_temp']
+        # each submission is scored in its own workspace, which the
+        # controller has acquired
+        self.workspace        = getattr(controller, 'workspace', None)
+        if self.workspace is None:
+            if hasattr(self, 'submission'):
+                self.workspace = workspace.workspaces.get_path(
+                    self.submission)
+            else:
+                self.workspace = config.ini['app']['dir_temp']
+
+        self._dir_temp        = self.workspace
         self._dir_submissions = config.ini['app']['dir_submissions']
 
+    def set_controller(self, controller):
+        """Set the controller (and by proxy the model and the view) of a stage
+        that has already been set up, without setting it up again (e.g., when
+        a stage executed by a prefetch is taken by the scorer).
+        """
+        self.controller       = controller
+        self.model            = controller.model
+        self.view             = controller.view
+
     def add_outcome(self,
                     outcome_id,
                     key = None,
@@ -218,6 +257,14 @@ class HandlerBase:
         """
         pass
 
+    def cancel(self):
+        """Ask the stage to stop executing because its result is no longer
+        needed (e.g., the user has quit or the stage has timed out). This is
+        called from another thread. Long running stages should check
+        `cancelled` and return early.
+        """
+        self.cancelled = True
+
 
 
 class HandlerNone(HandlerBase):
@@ -263,51 +310,32 @@ class HandlerForm(HandlerBase):
         self.interactive = True
 
     def calculate_outcomes(self):
-        try:
-            cfg = config.ini['stage_' + self.stage_id]
-        except KeyError:
+        stage_cfg = config.ini.compiled.get_stage(self.stage_id)
+        if not stage_cfg.exists:
             raise StageError('No stage config for id: ' + self.stage_id)
         
         self.questions = []
 
-        score_min = 0
-        score_max = 0
-
-        for k, v in cfg.items():
-            if not k.startswith('question'):
-                continue
-
-            num = k[8:]
-            text = cfg.get('question' + num)
-
-            type_str = cfg['type' + num]
-            if type_str == 'scale':
-                try:
-                    scale = OutputForm.get_scale(self.stage_id, num)
-                    scores = cfg['score' + num].split(',')
-
-                    all_values = [(scale[x], float(scores[x]))
-                                  for x in range(0, len(scale))]
-
-                    self.add_outcome(
-                        outcome_id  = num,
-                        explanation = text,
-                        all_values  = all_values)
-                except KeyError:
-                    pass
-
-            elif type_str == 'input_score':
-                score_min = ''
-                try:
-                    score_min = str(cfg.getfloat('min' + num, None))
-                except KeyError:
-                    pass
-
-                score_max = ''
-                try:
-                    score_max = str(cfg.getfloat('max' + num, None))
-                except KeyError:
-                    pass
+        for question in stage_cfg.questions:
+            num  = question.num
+            text = question.text
+
+            if question.type == 'scale':
+                # invalid questions are reported by the form itself
+                if question.error is not None or question.scores is None:
+                    continue
+
+                all_values = [(question.scale[x], question.scores[x])
+                              for x in range(0, len(question.scale))]
+
+                self.add_outcome(
+                    outcome_id  = num,
+                    explanation = text,
+                    all_values  = all_values)
+
+            elif question.type == 'input_score':
+                score_min = str(question.score_min)
+                score_max = str(question.score_max)
                     
                 self.add_outcome(
                     outcome_id  = num,
@@ -331,6 +359,9 @@ class HandlerProcess(HandlerBase):
         """
         super().__init__(stage_id)
 
+        # files the whole output of the command was written to
+        self._spilled = []
+
     def set_framework(self, controller):
         result = super().set_framework(controller)
         self.setup()
@@ -362,7 +393,7 @@ class HandlerProcess(HandlerBase):
         """
         self.command  = command
         self.run_once = run_once
-        self.cwd      = cwd
+        self.cwd      = cwd if cwd is not None else self.workspace
         self.shell    = shell
 
     @abc.abstractmethod
@@ -370,6 +401,12 @@ class HandlerProcess(HandlerBase):
         """Handle the response. By default this always marks the outcome of the 
         stage as a pass.
         
+        Output is limited to `max_output_bytes` of the stage configuration, 
+        and is given as a `CapturedOutput`, which is bytes that also give the
+        number of bytes the command wrote (`total`), and the path to a file of
+        all the output if `spill_output` is set (`path`). The file is in the
+        workspace, and is deleted when the command is run again.
+
         Arguments:
         returncode -- Exit status from the execution of the command.
         stdout -- Standard output of the command.
@@ -379,21 +416,171 @@ class HandlerProcess(HandlerBase):
         result.set_output(self.output)
         return result
 
+    def _new_capture(self, name):
+        """Create a capture for an output stream of the command, limited as
+        set in the stage configuration.
+
+        Arguments:
+        name -- Name of the stream (e.g., 'stdout').
+        """
+        stage_cfg = config.ini.compiled.get_stage(self.stage_id)
+        output    = capture.OutputCapture(
+            stage_cfg.max_output_bytes,
+            spill        = stage_cfg.spill_output,
+            spill_prefix = f'.pyfeedbacker-{self.stage_id}-{name}-',
+            spill_dir    = self.workspace)
+
+        if output.path is not None:
+            self._spilled.append(output.path)
+
+        return output
+
+    def _remove_spilled_output(self):
+        """Delete the files the output of the last execution of the command
+        was written to, as the command is about to be run again."""
+        for path in self._spilled:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        self._spilled = []
+
+    def _get_cache_key(self):
+        """Generate the key the result of the command is cached under, which
+        is a hash of the submission, the framework, the command, the stage
+        configuration and the code of the stage, or None if the stage isn't
+        for a submission."""
+        submission = getattr(self, 'submission', None)
+        if submission is None:
+            return None
+
+        # the temporary directory differs between the scorer and batch mode
+        command = str(self.command).replace(self._dir_temp, '<dir_temp>')
+        cwd     = str(self.cwd).replace(self._dir_temp, '<dir_temp>')
+
+        section = 'stage_' + self.stage_id
+        options = []
+        if config.ini.has_section(section):
+            options = sorted(config.ini.items(section, raw = True))
+
+        try:
+            source = inspect.getsource(type(self))
+        except (OSError, TypeError):
+            source = type(self).__qualname__
+
+        trees = [os.path.join(self._dir_submissions, submission)]
+
+        framework = config.ini.get('stage_init', 'framework_directory',
+                                   fallback = None)
+        if framework is not None:
+            trees.append(framework)
+
+        return cache.results.get_key(
+            [self.stage_id, command, cwd, self.shell, options, source],
+            trees)
+
+    def _get_cached_response(self, key):
+        """Handle the cached result of the command, if there is one.
+
+        Arguments:
+        key -- Key generated by `_get_cache_key`, or None.
+
+        Returns:
+        The `StageResult` from `response`, or None if there is no cached
+        result.
+        """
+        if key is None:
+            return None
+
+        cached = cache.results.get(key)
+        if cached is None:
+            return None
+
+        return self.response(*cached)
+
+    def _cache_result(self, key, returncode, stdout, stderr):
+        """Cache the result of the command, unless it was stopped before it
+        finished.
+
+        Arguments:
+        key -- Key generated by `_get_cache_key`, or None.
+        returncode -- Exit status of the command.
+        stdout -- Standard output of the command.
+        stderr -- Error output of the command.
+        """
+        if key is None or self.cancelled or returncode < 0:
+            return
+
+        try:
+            cache.results.set(key, returncode, stdout, stderr)
+        except OSError:
+            pass
+
     def _exec(self):
         if hasattr(self, 'command') and self.command is not None:
-            result = subprocess.run(self.command,
-                                    cwd            = self.cwd,
-                                    capture_output = True,
-                                    shell          = self.shell)
-            return self.response(result.returncode,
-                                 result.stdout,
-                                 result.stderr)
+            self._remove_spilled_output()
+
+            key    = self._get_cache_key()
+            result = self._get_cached_response(key)
+            if result is not None:
+                return result
+
+            # the command is in a process group of its own, so that any
+            # processes it starts can be killed with it
+            self._process  = subprocess.Popen(
+                self.command,
+                cwd               = self.cwd,
+                stdout            = subprocess.PIPE,
+                stderr            = subprocess.PIPE,
+                shell             = self.shell,
+                start_new_session = os.name == 'posix')
+
+            # read both streams at once, so the command never blocks on a
+            # full pipe
+            stdout  = self._new_capture('stdout')
+            stderr  = self._new_capture('stderr')
+            readers = [threading.Thread(target = _read_stream,
+                                        args   = [self._process.stdout,
+                                                  stdout]),
+                       threading.Thread(target = _read_stream,
+                                        args   = [self._process.stderr,
+                                                  stderr])]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+
+            self._process.wait()
+
+            stdout = stdout.getvalue()
+            stderr = stderr.getvalue()
+            self._cache_result(key, self._process.returncode, stdout, stderr)
+
+            return self.response(self._process.returncode, stdout, stderr)
         else:
             result = StageResult(StageResult.RESULT_CRITICAL)
             result.set_error(f'No command provided to setup function for '
                              f'{self.stage_id} stage.')
             return result
 
+    def cancel(self):
+        """Stop the command, and any processes it started, if it is running.
+        """
+        super().cancel()
+
+        process = getattr(self, '_process', None)
+        if process is None or process.poll() is not None:
+            return
+
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
     def refresh(self):  
         if not self.run_once:
             return self._exec()
@@ -403,6 +590,242 @@ class HandlerProcess(HandlerBase):
 
 
 
+class HandlerAsyncProcess(HandlerProcess):
+    # minimum number of seconds between updates of the output
+    UPDATE_INTERVAL = 0.2
+
+    def __init__(self, stage_id):
+        """Run a command as a subprocess, showing its output in the stage as
+        it is written. The commands of all stages of this type are run in a
+        single event loop in the background, so several can run at once
+        without each needing a thread to wait for it.
+
+        Override setup() to setup the command, as with `HandlerProcess`.
+        """
+        super().__init__(stage_id)
+
+        self.output   = OutputText('')
+        self._process = None
+
+    @abc.abstractmethod
+    def setup(self,
+              command  = ['pwd'],
+              run_once = False,
+              cwd      = None,
+              shell    = False,
+              timeout  = None):
+        """Override this function to setup the command, and either set the 
+        member variables or call this class's function (i.e. super().setup(…))
+        to do the setup.
+
+        Arguments:
+        command -- Array of the command to run.
+        run_once -- If True, will only run on the first execution of the stage
+            otherwise runs everytime stage is loaded (default: False).
+        cwd -- Directory to run command from, if None uses the temporary    
+            working directory (the default behaviour).
+        shell -- Run the command using the default system shell.
+        timeout -- Number of seconds after which the command (and any 
+            processes it started) is killed, or None for no limit.
+        """
+        super().setup(command, run_once, cwd, shell)
+        self.timeout = timeout
+
+    def _exec(self):
+        return self._exec_future().result()
+
+    def _exec_future(self):
+        """Start the command in the event loop, without waiting for it.
+
+        Returns:
+        A `concurrent.futures.Future` of the `StageResult`. Cancelling it
+        kills the command.
+        """
+        if not hasattr(self, 'command') or self.command is None:
+            return _get_completed_future(super()._exec())
+
+        self._remove_spilled_output()
+
+        key    = self._get_cache_key()
+        result = self._get_cached_response(key)
+        if result is not None:
+            return _get_completed_future(result)
+
+        return asyncio.run_coroutine_threadsafe(self._exec_async(key),
+                                                _get_process_loop())
+
+    def run_async(self):
+        """Execute the stage as `run` does, but without waiting for the
+        command, so that no thread is held while it runs.
+
+        Returns:
+        A `concurrent.futures.Future` of the `StageResult`.
+        """
+        return self._exec_future()
+
+    def refresh_async(self):
+        """Refresh the stage as `refresh` does, but without waiting for the
+        command.
+
+        Returns:
+        A `concurrent.futures.Future` of the `StageResult`, or of None if the
+        command only runs once.
+        """
+        if self.run_once:
+            return _get_completed_future(None)
+
+        return self._exec_future()
+
+    def _get_cached_response(self, key):
+        """Show the cached output of the command, and handle the cached
+        result, if there is one.
+
+        Arguments:
+        key -- Key generated by `_get_cache_key`, or None.
+        """
+        cached = None
+        if key is not None:
+            cached = cache.results.get(key)
+        if cached is None:
+            return None
+
+        returncode, stdout, stderr = cached
+        self.output.text = (stdout + stderr).decode(errors = 'replace')
+        self.update_ui()
+
+        return self.response(returncode, stdout, stderr)
+
+    async def _exec_async(self, key = None):
+        """Run the command in the event loop, reading its output as it is
+        written.
+
+        Keyword arguments:
+        key -- Key to cache the result under, or None to not cache it.
+        """
+        # the stage may have been cancelled before the loop got to it
+        if self.cancelled:
+            return None
+
+        try:
+            return await self._run_process(key)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            self._kill()
+            raise
+
+    async def _run_process(self, key):
+        """Start the command and wait for it to finish.
+
+        Arguments:
+        key -- Key to cache the result under, or None to not cache it.
+        """
+        self.output.text = ''
+        self._updated    = 0
+
+        # both streams are shown together, in the order they are written
+        self._shown      = self._new_capture('output')
+
+        kwargs = {'cwd'               : self.cwd,
+                  'stdout'            : asyncio.subprocess.PIPE,
+                  'stderr'            : asyncio.subprocess.PIPE,
+                  'start_new_session' : os.name == 'posix'}
+
+        if self.shell:
+            command = self.command
+            if not isinstance(command, str):
+                command = subprocess.list2cmdline(command)
+            self._process = await asyncio.create_subprocess_shell(command,
+                                                                  **kwargs)
+        else:
+            self._process = await asyncio.create_subprocess_exec(
+                *self.command, **kwargs)
+
+        # cancelling while the command was starting only kills it now
+        if self.cancelled:
+            self._kill()
+
+        stdout = self._new_capture('stdout')
+        stderr = self._new_capture('stderr')
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(self._read(self._process.stdout, stdout),
+                               self._read(self._process.stderr, stderr),
+                               self._process.wait()),
+                timeout = getattr(self, 'timeout', None))
+        except asyncio.TimeoutError:
+            self._kill()
+            await self._process.wait()
+
+            stdout.close()
+            stderr.close()
+            self._shown.close()
+            self._show_output()
+
+            result = StageResult(StageResult.RESULT_ERROR)
+            result.set_output(self.output)
+            result.set_error(f'The command did not finish within '
+                             f'{self.timeout:g} seconds.')
+            return result
+
+        stdout.close()
+        stderr.close()
+        self._shown.close()
+        self._show_output()
+
+        stdout = stdout.getvalue()
+        stderr = stderr.getvalue()
+        self._cache_result(key, self._process.returncode, stdout, stderr)
+
+        return self.response(self._process.returncode, stdout, stderr)
+
+    async def _read(self, stream, output):
+        """Read a stream of the command's output until it is closed, adding
+        it to the output of the stage.
+
+        Arguments:
+        stream -- An `asyncio.StreamReader`.
+        output -- `OutputCapture` to write what is read to.
+        """
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                return
+
+            output.write(chunk)
+            self._shown.write(chunk)
+
+            now = time.monotonic()
+            if now - self._updated >= HandlerAsyncProcess.UPDATE_INTERVAL:
+                self._updated = now
+                self._show_output()
+
+    def _show_output(self):
+        """Show the output of the command kept so far in the stage."""
+        self.output.text = self._shown.getvalue().decode(errors = 'replace')
+        self.update_ui()
+
+    def _kill(self):
+        """Kill the command and any processes it started, if it is still
+        running."""
+        process = self._process
+        if process is None or process.returncode is not None:
+            return
+
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    def cancel(self):
+        """Stop the command if it is running."""
+        self.cancelled = True
+        _get_process_loop().call_soon_threadsafe(self._kill)
+
+
+
 class StageError(Exception):
     def __init__(self, mesg):
         """An error that occurs during stage execution that means the stage
@@ -485,80 +908,41 @@ class OutputForm(OutputBase):
         """An output for a stage consisting of a form to complete, based on 
         values set in the application configuration.
         """
-        try:
-            cfg = config.ini['stage_' + stage_id]
-        except KeyError:
+        stage_cfg = config.ini.compiled.get_stage(stage_id)
+        if not stage_cfg.exists:
             raise StageError('No stage config for id: ' + stage_id)
 
         self.questions = []
 
-        for k, v in cfg.items():
-            if not k.startswith('question'):
-                continue
+        for question in stage_cfg.questions:
+            num = question.num
 
-            num = k[8:]
-            required = cfg.getboolean('required' + num, fallback=False)
+            q = OutputForm.Question(num, question.text, question.required)
 
-            q = OutputForm.Question(k[8:], v, required)
+            if question.type == 'scale':
+                if question.error is not None:
+                    raise StageError(question.error)
 
-            type_str = cfg['type' + num]
-            if type_str == 'scale':
-                scale = OutputForm.get_scale(stage_id, num)
+                scale  = list(question.scale)
                 scores = [0.0] * len(scale)
-                try:
-                    scores = cfg['score' + num].split(',')
-                    for i in range(0, len(scores)):
-                        this_score = float(scores[i])
-                        scores[i] = this_score
-
-                    if len(scores) != len(scale):
-                        raise StageError('Mismatch with number ' +
-                                         'of score values (' +
-                                          str(len(scores)) +
-                                          ') vs. number of answers (' +
-                                          str(len(scale)) +
-                                          ') for question ' + num +
-                                          '.')
-                except KeyError:
-                    pass
+                if question.scores is not None:
+                    scores = list(question.scores)
 
                 feedback = None
-                try:
-                    feedback = cfg['feedback' + num].strip().split('\n')
-                    if len(feedback) != len(scale):
-                        raise StageError('Mismatch with number ' +
-                                         'of feedback responses (' +
-                                         str(len(feedback)) +
-                                         ') vs. number of answers (' +
-                                         str(len(scale)) +
-                                         ') in question ' + num + '.')
-                    for f_id, fb_str in enumerate(feedback):
-                        if fb_str == '-':
-                            feedback[f_id] = ''
-                except KeyError:
-                    pass
+                if question.feedback is not None:
+                    feedback = list(question.feedback)
 
                 q.set_scale(scale, scores, feedback)
 
-            elif type_str == 'input_score':
-                try:
-                    score_min = cfg.getfloat('min' + num, None)
-                except KeyError:
-                    score_min = False
-
-                try:
-                    score_max = cfg.getfloat('max' + num, None)
-                except KeyError:
-                    score_max = False
+            elif question.type == 'input_score':
+                q.set_input_score(question.score_min, question.score_max)
 
-                q.set_input_score(score_min, score_max)
-
-            elif type_str == 'input_feedback':
+            elif question.type == 'input_feedback':
                 q.set_input_feedback()
             else:
                 raise StageError('Unrecognised question type: ' + \
-                                       type_str + ' for question ' + num + \
-                                       '.')
+                                       str(question.type) + \
+                                       ' for question ' + num + '.')
             self.questions.append(q)
 
     def get_scale(stage_id, num):
@@ -679,7 +1063,7 @@ class OutputMarker(OutputBase):
 
         # pass thorugh all outcomes
         for _, stages in self.model.outcomes.items():
-            for outcome_id, outcome in stages[self.stage_id].items():
+            for outcome_id, outcome in stages.get(self.stage_id, {}).items():
 
                 if outcome['all_values'] is not None:
                     key = int(outcome['key'])
@@ -696,4 +1080,53 @@ class OutputMarker(OutputBase):
                     except KeyError:
                         performance[outcome_id] = 1
 
-        return performance
\ No newline at end of file
+        return performance
+
+
+
+def _read_stream(stream, output):
+    """Read a stream of a command's output until it is closed.
+
+    Arguments:
+    stream -- A binary file object (e.g., the `stdout` of a `Popen`).
+    output -- `OutputCapture` to write what is read to.
+    """
+    try:
+        for chunk in iter(lambda: stream.read1(65536), b''):
+            output.write(chunk)
+    finally:
+        stream.close()
+        output.close()
+
+
+
+_process_loop      = None
+_process_loop_lock = threading.Lock()
+
+def _get_process_loop():
+    """Retrieve the event loop that the commands of `HandlerAsyncProcess`
+    stages are run in, starting it in a background thread on first use."""
+    global _process_loop
+
+    with _process_loop_lock:
+        if _process_loop is None:
+            _process_loop = asyncio.new_event_loop()
+
+            thread = threading.Thread(target = _process_loop.run_forever,
+                                      name   = 'process-loop',
+                                      daemon = True)
+            thread.start()
+
+    return _process_loop
+
+
+
+def _get_completed_future(result):
+    """Retrieve a `concurrent.futures.Future` that is already done.
+
+    Arguments:
+    result -- Result of the future.
+    """
+    future = concurrent.futures.Future()
+    future.set_result(result)
+    return future
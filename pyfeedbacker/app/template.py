@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import re
+
+
+
+class Template:
+    # placeholders are a name surrounded by two hashes, e.g., ##score##
+    PLACEHOLDER = re.compile(r'##([^#\s]+)##')
+
+    def __init__(self, tokens):
+        """Text with `##name##` placeholders, split into the text between
+        placeholders and the names of the placeholders, so that it can be
+        rendered repeatedly without searching it for placeholders again.
+
+        Use `compile` (or `compile_pieces`) to create a template from text.
+
+        Arguments:
+        tokens -- List that alternates between text and placeholder names,
+            starting and ending with text.
+        """
+        self.tokens = tokens
+
+    names = property(lambda self:set(self.tokens[1::2]), doc="""
+            Retrieve the names of the placeholders in the template.
+            """)
+
+    def render(self, data):
+        """Replace every placeholder with its value, in a single pass.
+        Placeholders without a value are left as they are.
+
+        Arguments:
+        data -- Dictionary of the value of each placeholder, by name. Values
+            are converted to strings.
+
+        Returns:
+        (text, unknown), where `unknown` is the set of the names of
+        placeholders without a value.
+        """
+        tokens  = self.tokens
+        output  = [tokens[0]]
+        unknown = set()
+
+        for pos in range(1, len(tokens), 2):
+            name = tokens[pos]
+            try:
+                output.append(str(data[name]))
+            except KeyError:
+                output.append(f'##{name}##')
+                unknown.add(name)
+
+            output.append(tokens[pos+1])
+
+        return (''.join(output), unknown)
+
+
+
+@functools.lru_cache(maxsize = 1024)
+def compile(text):
+    """Create a template from text. Templates are cached, so text that is
+    used repeatedly (e.g., the `feedback_pre` and `feedback_post` text of a
+    stage, or the same feedback given to many submissions) is only searched
+    for placeholders once.
+
+    Arguments:
+    text -- Text that may contain placeholders.
+    """
+    return Template(Template.PLACEHOLDER.split(text))
+
+
+
+def compile_pieces(pieces):
+    """Create a template from the pieces of a text, compiling each piece
+    separately so that pieces that are used repeatedly are cached.
+    Placeholders can't be split across pieces.
+
+    Arguments:
+    pieces -- Iterable of the strings that make up the text, in order.
+    """
+    tokens = ['']
+    for piece in pieces:
+        piece_tokens = compile(piece).tokens
+        tokens[-1]  += piece_tokens[0]
+        tokens      += piece_tokens[1:]
+
+    return Template(tokens)
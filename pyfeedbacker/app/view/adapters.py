@@ -40,8 +40,7 @@ class AdapterNone:
             self.marks     = model.marks
 
             # initial score
-            score_init = config.ini[f'stage_{stage_id}'].getfloat(
-                'score_init', None)
+            score_init = config.ini.compiled.get_stage(stage_id).score_init
             if score_init:
                 self.set_outcome('__init',
                                  explanation = 'Initial score',
@@ -360,8 +359,7 @@ class AdapterForm(AdapterBase):
                 pass
 
             button = None
-            if config.ini['assessment'].getboolean('scores_are_marks',
-                                                   False):
+            if config.ini.compiled.scores_are_marks:
                 label = str(score)
                 button = urwid.RadioButton(radio_group,
                                            label,
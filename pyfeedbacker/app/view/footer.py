@@ -169,12 +169,13 @@ class FooterWidget(urwid.WidgetWrap):
                 return '-'
 
         def graph_data(self, showing):
+            cfg = config.ini.compiled
             if showing == FooterWidget.Statistics.GRAPH_SCORES:
-                min_value = config.ini['assessment'].getfloat('score_min', None)
-                max_value = config.ini['assessment'].getfloat('score_max', None)
+                min_value = cfg.score_min
+                max_value = cfg.score_max
             elif showing == FooterWidget.Statistics.GRAPH_MARKS:
-                min_value = config.ini['assessment'].getfloat('score_min', None)
-                max_value = config.ini['assessment'].getfloat('score_max', None)
+                min_value = cfg.mark_min
+                max_value = cfg.mark_max
             else:
                 raise AttributeError('The attribute `showing` must be '
                                      'GRAPH_SCORES or GRAPH_MARKS')
@@ -184,7 +185,7 @@ class FooterWidget(urwid.WidgetWrap):
             if max_value is None:
                 max_value = self.high
 
-            num_cols = config.ini['app'].getint('graph_columns', 10)
+            num_cols = cfg.graph_columns
             if num_cols < 1:
                 num_cols = 10
             step = (max_value - min_value) / num_cols
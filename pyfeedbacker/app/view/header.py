@@ -19,18 +19,15 @@ class HeaderWidget(urwid.WidgetWrap):
         self.model      = model
         self.window     = window
 
-        header_text = config.ini['app']['name']
+        header_text = self.get_header_str()
 
         self._show_marks = False
         if isinstance(controller, scorer.Controller):
-            self._show_marks = \
-                config.ini['assessment'].getboolean('scores_are_marks', False)
-            header_text += f' — Scoring {controller.submission}'
-        elif isinstance(controller, marker.Controller):
-            header_text += f' — Applying marks to outcomes'
+            self._show_marks = config.ini.compiled.scores_are_marks
         
         header_text_widget = urwid.Text((header_text), align='left')
         header_text_len = len(header_text)
+        self.w_header = header_text_widget
 
         # add header content
         header_content = [urwid.Divider()]
@@ -63,6 +60,30 @@ class HeaderWidget(urwid.WidgetWrap):
 
         super(HeaderWidget, self).__init__(self._widget)
 
+    def get_header_str(self):
+        """
+        Get the name of the application and what it is currently doing.
+        """
+        header_text = config.ini['app']['name']
+
+        if isinstance(self.controller, scorer.Controller):
+            header_text += f' — Scoring {self.controller.submission}'
+        elif isinstance(self.controller, marker.Controller):
+            header_text += f' — Applying marks to outcomes'
+
+        return header_text
+
+    def reset(self):
+        """
+        Update the header for a different submission being scored, which has
+        no score yet.
+        """
+        self.w_header.set_text(self.get_header_str())
+
+        self.marks_str = '-'
+        if self._show_marks:
+            self.update()
+
     def set_score(self, score):
         """
         Update the score displayed in the header widget.
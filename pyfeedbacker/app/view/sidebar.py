@@ -60,6 +60,15 @@ class SidebarStagesWidget(urwid.WidgetWrap):
         w = urwid.AttrMap(w, 'stage', 'stage focus')
         self._listwalker.append(w)
 
+    def clear(self):
+        """Remove every stage from the sidebar."""
+        self._stages_buttons  = {}
+        self._stages          = []
+        self._stage_id_to_pos = {}
+        self._active_pos      = None
+
+        del self._listwalker[1:]
+
     def _on_select_stage(self, widget, stage):
         """Callback for when the user selects a stage in the sidebar"""
         self.controller.select_stage(stage.stage_id)
@@ -34,6 +34,9 @@ class UrwidView:
     def run(self):
         self.window.run()
 
+    def call_soon(self, callback):
+        self.window.call_soon(callback)
+
     def append_stage(self, stage):
         self.window.append_stage(stage)
 
@@ -41,6 +44,12 @@ class UrwidView:
         for stage_id, stage in stages.items():
             self.append_stage(stage)
 
+    def show_progress(self, title, done, total):
+        self.window.show_progress(title, done, total)
+
+    def reset_stages(self, stages):
+        self.window.reset_stages(stages)
+
     def show_alert(self, title, text,
             alert_type=ALERT_OK, callback=None, buttons=None):
         if alert_type == UrwidView.ALERT_HALT:
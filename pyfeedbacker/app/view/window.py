@@ -5,8 +5,11 @@ from pyfeedbacker.app.view import adapters as ua, header as uh, footer as uf
 from pyfeedbacker.app.view import sidebar as us, popup as up, urwid as uu
 from pyfeedbacker.app.view import widgets as uw
 
-import urwid
+import collections
+import os
 import signal
+import threading
+import urwid
 
 
 
@@ -77,6 +80,15 @@ class Window:
         self._cache_fresh = []
         self._last_stage_id = None
 
+        # functions from other threads to call on the UI thread, which is
+        # woken up by writing to a pipe the main loop watches
+        self._calls      = collections.deque()
+        self._calls_pipe = None
+        self._ui_thread  = None
+
+        # whether marks have changed since their statistics were calculated
+        self._marks_stale = False
+
     def _on_focus_sidebar(self):
         self.frame.set_focus_path(['body', 0])
 
@@ -121,6 +133,12 @@ class Window:
         self.loop.screen.set_terminal_properties(colors=256)
         self.loop.set_alarm_in(1, self._first_stage)
 
+        self._ui_thread  = threading.get_ident()
+        self._calls_pipe = self.loop.watch_pipe(self._on_calls)
+
+        if self._marks_stale:
+            self.loop.set_alarm_in(0, self._update_marks)
+
         # from https://www.programcreek.com/python/?code=zulip%2Fzulip-terminal%2Fzulip-terminal-master%2Fzulipterminal%2Fcore.py
         disabled_keys = {
             'susp': 'undefined',  # Disable ^Z - no suspending
@@ -140,6 +158,32 @@ class Window:
         finally:
             self.loop.screen.tty_signal_keys(*old_signal_list)
 
+    def call_soon(self, callback):
+        """Call a function on the UI thread. If this is called on the UI
+        thread, or the UI isn't running, the function is called straight away.
+
+        Arguments:
+        callback -- Function with no arguments.
+        """
+        if self._calls_pipe is None or \
+                threading.get_ident() == self._ui_thread:
+            return callback()
+
+        self._calls.append(callback)
+        os.write(self._calls_pipe, b'.')
+
+    def _on_calls(self, data):
+        """Call the functions waiting for the UI thread. Called by the main
+        loop when a function is added.
+
+        Arguments:
+        data -- Data written to the pipe.
+        """
+        while len(self._calls) > 0:
+            self._calls.popleft()()
+
+        return True
+
     def _first_stage(self, loop, user_data):
         """
         Callback for the first stage to begin execution. Called when the UI
@@ -152,27 +196,39 @@ class Window:
         self.update_scores()
 
     def update_scores(self):
+        # statistics need every submission, so only calculate when shown
+        if self.footer is None:
+            return
+
         try:
             stats = uf.FooterWidget.Statistics()
-            for submission in self.model.outcomes.values():
-                stats.add_value(submission.score)
+            for score in self.model.get_scores().values():
+                stats.add_value(score)
 
-            try:
-                self.footer.set_statistics(stats)
-            except AttributeError:
-                pass
+            self.footer.set_statistics(stats)
         except TypeError:
             pass
 
     def update_marks(self):
+        # marks need every submission, so however many marks change at once,
+        # they are only calculated once, when the UI is next idle
+        if self.footer is None or self._marks_stale:
+            return
+
+        self._marks_stale = True
+        if self._ui_thread is not None:
+            self.loop.set_alarm_in(0, self._update_marks)
+
+    def _update_marks(self, loop = None, user_data = None):
+        """Calculate the statistics of every submission's mark. Called by the
+        main loop when the UI is idle."""
+        self._marks_stale = False
+
         stats = uf.FooterWidget.Statistics()
-        for submission in self.model.outcomes.values():
-            stats.add_value(submission.mark)
+        for mark in self.controller.marks_engine.calculate().values():
+            stats.add_value(mark)
 
-        try:
-            self.footer.set_statistics(stats)
-        except AttributeError:
-            pass
+        self.footer.set_statistics(stats)
 
     def _on_interrupt(self, sig, frame):
         if self.loop.widget != self.frame:
@@ -202,6 +258,40 @@ class Window:
                 stage_info.stage_id,
                 'This stage has errors that will prevent successful execution.')
 
+    def show_progress(self, title, done, total):
+        """
+        Show how much of a long task (e.g., saving) has been done. The
+        screen is redrawn straight away, as the task blocks the main loop
+        """
+        w = urwid.Text([('title', title), f'\n\n{done} of {total}'])
+        self._main[1:] = [urwid.Padding(w, left=2, right=2, min_width=20)]
+
+        self.loop.draw_screen()
+
+    def reset_stages(self, stages):
+        """
+        Remove every stage, and its output, and show a new set of stages
+        (e.g., for the next submission in a queue) without recreating the UI
+        """
+        self.header.reset()
+        self.sidebar.clear()
+
+        self._progression_possible = {}
+        self._show_continue_button = []
+        self._output_adapters = {}
+        self._cache_fresh = []
+        self._last_stage_id = None
+        self.visible_stage_id = None
+
+        w = urwid.Text([('title', u"Loading...")])
+        self._main[1:] = [urwid.Padding(w, left=2, right=2, min_width=20)]
+        self.frame.set_focus_path(['body', 0])
+
+        for stage_info in stages.values():
+            self.append_stage(stage_info)
+
+        self.refresh()
+
     def show_stage(self, stage_id, label):
         """
         Switch the content shown to that of a different stage. If the stage
@@ -237,7 +327,10 @@ class Window:
         if self.visible_stage_id in self._show_continue_button:
             continue_text = 'Continue'
             if self.visible_stage_id == self._last_stage_id:
-                continue_text = 'Save and close'
+                if len(getattr(self.controller, 'queue', ())) > 0:
+                    continue_text = 'Save and next submission'
+                else:
+                    continue_text = 'Save and close'
             continue_text_len = len(continue_text) + 6
 
             b = uw.SimpleButton(continue_text,
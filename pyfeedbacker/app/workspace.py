@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+from pyfeedbacker.app import config
+
+import fnmatch
+import os
+import queue
+import shutil
+import threading
+import uuid
+
+
+
+class WorkspaceManager:
+    def __init__(self):
+        """Manage the workspaces that submissions are copied into while they
+        are scored. Each submission has its own directory in the `dir_temp`
+        directory of the `[app]` section of the configuration, so several
+        submissions can be scored at once (including by other processes).
+
+        A workspace is removed as soon as it is released, so nothing is left
+        in it the next time the submission is scored, and a workspace is
+        never reused for a different submission.
+        """
+        self._lock          = threading.Lock()
+
+        # directories waiting to be deleted in the background
+        self._trash         = queue.Queue()
+        self._trash_thread  = None
+
+    def get_path(self, submission):
+        """Retrieve the path of the workspace of a submission.
+
+        Arguments:
+        submission -- Identifier of the submission.
+        """
+        return os.path.abspath(os.path.join(config.ini.compiled.dir_temp,
+                                            str(submission)))
+
+    def acquire(self, submission):
+        """Create the workspace of a submission, if it doesn't exist.
+
+        Arguments:
+        submission -- Identifier of the submission.
+
+        Returns:
+        The path of the workspace.
+        """
+        path = self.get_path(submission)
+        os.makedirs(path, exist_ok = True)
+
+        return path
+
+    def release(self, submission):
+        """Remove the workspace of a submission, as it is no longer in use.
+        Only the workspace of the submission is removed, so workspaces in use
+        by other processes are never removed.
+
+        Arguments:
+        submission -- Identifier of the submission.
+        """
+        self.remove(self.get_path(submission))
+
+    def remove(self, path):
+        """Remove a directory (e.g., a workspace). The directory is moved
+        into a `.trash` directory next to it straight away, so the path can be
+        reused, and is then deleted in a background thread.
+
+        Arguments:
+        path -- Path of the directory.
+        """
+        path  = os.path.abspath(path)
+        trash = os.path.join(os.path.dirname(path), '.trash')
+
+        try:
+            os.makedirs(trash, exist_ok = True)
+            trash_path = os.path.join(
+                trash, f'{os.path.basename(path)}-{uuid.uuid4().hex}')
+            os.rename(path, trash_path)
+        except FileNotFoundError:
+            return
+        except OSError:
+            # it can't be moved, so it has to be deleted now
+            shutil.rmtree(path, ignore_errors = True)
+            return
+
+        self._delete_later(trash_path)
+
+    def sweep(self):
+        """Delete, in the background, anything left in the trash by earlier
+        runs that ended before it was deleted."""
+        trash = os.path.join(os.path.abspath(config.ini.compiled.dir_temp),
+                             '.trash')
+        try:
+            for entry in os.scandir(trash):
+                self._delete_later(os.path.join(trash, entry.name))
+        except FileNotFoundError:
+            pass
+
+    def _delete_later(self, path):
+        """Delete a file or directory in the background thread, starting the
+        thread if it isn't running. The thread doesn't stop the application
+        from quitting, and anything not deleted is deleted by `sweep`.
+
+        Arguments:
+        path -- Path to delete.
+        """
+        self._trash.put(path)
+
+        with self._lock:
+            if self._trash_thread is None:
+                self._trash_thread = threading.Thread(target = self._empty_trash,
+                                                      name   = 'trash',
+                                                      daemon = True)
+                self._trash_thread.start()
+
+    def _empty_trash(self):
+        """Delete everything put in the trash, forever."""
+        while True:
+            path = self._trash.get()
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors = True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+
+def stage_tree(src_dir, dst_dir, link = False, writable = ()):
+    """Copy the files in a directory into a workspace, creating directories
+    as needed and replacing files that already exist.
+
+    If `link` is True, files are hard linked rather than copied, so staging
+    takes no time or disk space however large the directory is. As a linked
+    file is the same file as the original, any file a stage may modify must
+    match one of the `writable` patterns, so that it is copied instead.
+    Files that can't be linked (e.g., as they are on a different file
+    system) are copied.
+
+    Arguments:
+    src_dir -- Path of the directory to copy.
+    dst_dir -- Path of the directory to copy it into.
+
+    Keyword arguments:
+    link -- Hard link files rather than copying them.
+    writable -- Glob patterns of the paths (relative to `src_dir`) of files
+        that must be copied even if `link` is True.
+    """
+    for root, dirs, files in os.walk(src_dir):
+        rel_dir = os.path.relpath(root, src_dir)
+        dst     = os.path.normpath(os.path.join(dst_dir, rel_dir))
+        os.makedirs(dst, exist_ok = True)
+
+        for file in files:
+            src_file = os.path.join(root, file)
+            dst_file = os.path.join(dst, file)
+            rel_file = os.path.normpath(os.path.join(rel_dir, file))
+
+            if os.path.lexists(dst_file):
+                os.remove(dst_file)
+
+            if link and not any(fnmatch.fnmatch(rel_file, pattern)
+                                for pattern in writable):
+                try:
+                    os.link(src_file, dst_file)
+                    continue
+                except OSError:
+                    pass
+
+            _copy_file(src_file, dst_file)
+
+
+
+def _copy_file(src_file, dst_file):
+    """Copy a file and its permissions. Where the operating system
+    supports it, the copy is made within the kernel (which some file systems
+    turn into a copy-on-write clone), otherwise the file is read and written.
+
+    Arguments:
+    src_file -- Path of the file to copy.
+    dst_file -- Path to copy it to.
+    """
+    copied = False
+
+    if hasattr(os, 'copy_file_range') and not os.path.islink(src_file):
+        try:
+            with open(src_file, 'rb') as src, open(dst_file, 'wb') as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    count = os.copy_file_range(src.fileno(),
+                                               dst.fileno(),
+                                               remaining)
+                    if count == 0:
+                        break
+                    remaining -= count
+            copied = remaining == 0
+        except OSError:
+            pass
+
+    if not copied:
+        shutil.copyfile(src_file, dst_file, follow_symlinks = False)
+
+    shutil.copymode(src_file, dst_file, follow_symlinks = False)
+
+
+
+workspaces = WorkspaceManager()
@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
 
-from pyfeedbacker.app import config, stage
+from pyfeedbacker.app import config, stage, workspace
 
 import os
-import shutil
 
 
 
@@ -74,17 +73,14 @@ class StageInit(stage.HandlerPython):
         return result
 
     def _rmdir(self, directory):
-        """Recursively empty a directory.
+        """Recursively delete a directory. The directory is moved out of the
+        way straight away, but is deleted in the background.
         
         Arguments:
-        directory -- Path to directory to empty.
+        directory -- Path to directory to delete.
         """
         if os.path.isdir(directory):
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    os.remove(os.path.join(root, file))
-
-            shutil.rmtree(directory)
+            workspace.workspaces.remove(directory)
 
     def _create_empty_temp_directory(self):
         """Create an empty temporary directory to store the submission while 
@@ -95,7 +91,7 @@ class StageInit(stage.HandlerPython):
             self.output.set_label('Create temporary directory',
                                   StageInit.STEP_EMPTY)
 
-            os.mkdir(dir_temp)
+            os.makedirs(dir_temp)
             if not os.path.isdir(dir_temp):
                 raise stage.StageError('Error copying submission: could ' + \
                                        'not create: ' + dir_temp)
@@ -119,40 +115,46 @@ class StageInit(stage.HandlerPython):
         dir_submission = self._dir_submissions + os.sep + self.submission
         dir_submission = os.path.abspath(dir_submission)
 
+        if not os.path.isdir(dir_submission):
+            raise stage.StageError('Error copying submission: '  + \
+                                   dir_submission + ' does not exist')
+
         try:
-            shutil.copytree(dir_submission, dir_temp)
+            self._stage_tree(dir_submission, dir_temp)
 
             self.output.set_state(True, StageInit.STEP_COPYSUB)
             self.update_ui()
-        except FileNotFoundError:
-            raise stage.StageError('Error copying submission: '  + \
-                                   dir_submission + ' does not exist')
-        except shutil.Error as e:
+        except OSError as e:
             raise stage.StageError('Error copying submission: ' + str(e))
 
     def _copy_framework_to_temp(self):
         """If there is a framework specified in the configuration, copy this 
         into the temporary directory."""
-        dir_submission = self._dir_submissions + os.sep + self.submission
-        dir_submission = os.path.abspath(dir_submission)
+        dir_temp = os.path.abspath(self._dir_temp)
 
         if config.ini['stage_init'].get('framework_directory') != None:
             src_dir = config.ini['stage_init'].get('framework_directory')
             try:
-                for dir_, dirs, files in os.walk(src_dir):
-                    dst_dir = dir_.replace(src_dir, dir_submission, 1)
-
-                    if not os.path.exists(dst_dir):
-                        os.makedirs(dst_dir)
-
-                    for file in files:
-                        src_file = os.path.join(dir_, file)
-                        dst_file = os.path.join(dst_dir, file)
-                        shutil.copy(src_file, dst_file)
-            except shutil.Error as e:
+                self._stage_tree(src_dir, dir_temp)
+            except OSError as e:
                 raise stage.StageError('Error copying framework: '  + \
                                         str(e))
             self.output.set_state(True, StageInit.STEP_COPYFWK)
         else:
             self.output.set_state(None, StageInit.STEP_COPYFWK)
 
+    def _stage_tree(self, src_dir, dst_dir):
+        """Copy (or link, depending on the `staging` option of the stage
+        configuration) a directory into the temporary directory.
+
+        Arguments:
+        src_dir -- Path of the directory to copy.
+        dst_dir -- Path of the directory to copy it into.
+        """
+        stage_cfg = config.ini.compiled.get_stage(self.stage_id)
+
+        workspace.stage_tree(src_dir,
+                             dst_dir,
+                             link     = stage_cfg.staging_link,
+                             writable = stage_cfg.writable)
+
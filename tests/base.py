@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+
+class ModelTestCase(unittest.TestCase):
+    # class of the models created by `_create_model`
+    MODEL_TYPE = None
+
+    def setUp(self):
+        """Create a temporary directory for the files of the models, which is
+        removed (along with the models) after each test."""
+        self.directory = tempfile.mkdtemp()
+        self.models    = []
+
+    def tearDown(self):
+        for model in self.models:
+            self._close_model(model)
+
+        shutil.rmtree(self.directory, ignore_errors = True)
+
+    def _get_path(self, file_name):
+        return os.path.join(self.directory, file_name)
+
+    def _create_model(self):
+        model = self.MODEL_TYPE()
+        self.models.append(model)
+        return model
+
+    def _close_model(self, model):
+        """Wait for a model to finish writing its files, and close them."""
+        if model._compaction is not None:
+            model._compaction.join()
+        if model._journal is not None:
+            model._journal.close()
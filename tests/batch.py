@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import unittest
+import unittest.mock
+
+from pyfeedbacker.app import config, stage
+from pyfeedbacker.app.controller import batch
+from pyfeedbacker.app.model import fs, outcomes
+from tests import base
+
+
+
+class TestBatch(base.ModelTestCase):
+    MODEL_TYPE   = fs.FileSystemModel
+
+    STAGE_ID     = 'init'
+    SUBMISSIONS  = ['submission_1', 'submission_2', 'submission_3']
+
+    def setUp(self):
+        super().setUp()
+
+        for submission in TestBatch.SUBMISSIONS:
+            os.makedirs(self._get_path(os.path.join('submissions',
+                                                    submission)))
+            with open(self._get_path(os.path.join('submissions', submission,
+                                                  'main.py')), 'w') as f:
+                f.write('print("' + submission + '")\n')
+
+        config.ini.clear()
+        config.ini.read_dict({
+            'app': {
+                'name'                    : 'Test',
+                'dir_submissions'         : self._get_path('submissions'),
+                'dir_temp'                : self._get_path('temp')},
+            'assessment': {
+                'stages'                  : TestBatch.STAGE_ID},
+            'stage_init': {
+                'score_min'               : '0',
+                'score_max'               : '1',
+                'feedback_pre'            : 'Submitted'},
+            'model_file': {
+                'file_feedbacks'          : self._get_path('feedbacks.json'),
+                'file_outcomes'           : self._get_path('outcomes.json'),
+                'file_outcomes_marks'     : self._get_path('weights.json'),
+                'file_journal'            : self._get_path('journal.jsonl'),
+                'file_scores'             : self._get_path('scores.csv'),
+                'file_marks'              : self._get_path('marks.csv'),
+                'journal_compact_records' : '2'}})
+
+    def _create_controller(self, model):
+        controller = batch.Controller(workers = 2)
+        controller.set_model(model)
+        return controller
+
+    def test_start(self):
+        """Test that every submission is scored in the pool of processes, and the results are saved once they are all stored, without journalling or compacting each change."""
+        model      = self._create_model()
+        controller = self._create_controller(model)
+
+        with unittest.mock.patch.object(model, '_compact_in_background') \
+                as compact, \
+                unittest.mock.patch('sys.stdout'):
+            controller.start()
+
+        compact.assert_not_called()
+        self.assertTrue(model.journaling)
+        self.assertEqual(os.path.getsize(self._get_path('journal.jsonl')), 0)
+        self.assertFalse(model._is_dirty('outcomes'))
+
+        with open(self._get_path('outcomes.json')) as f:
+            data = json.load(f)
+        self.assertEqual(list(data['outcomes']), TestBatch.SUBMISSIONS)
+
+        model = self._create_model()
+        for submission in TestBatch.SUBMISSIONS:
+            self.assertEqual(model.outcomes[submission].score, 1.0)
+            self.assertEqual(str(model.feedbacks[submission][
+                                 TestBatch.STAGE_ID]['__pre']),
+                             'Submitted')
+
+    def test_report_submission(self):
+        """Test that the outcome and feedback of a stage replace those previously stored for it, and the outcome is stored as an `Outcome`."""
+        model = self._create_model()
+        model.outcomes[TestBatch.SUBMISSIONS[0]][TestBatch.STAGE_ID][
+            'nosubmission'] = outcomes.Outcome(outcome_id = 'nosubmission',
+                                               value      = 0.0)
+        model.feedbacks[TestBatch.SUBMISSIONS[0]][TestBatch.STAGE_ID][
+            'old'] = 'Old feedback'
+
+        outcome = outcomes.Outcome(outcome_id  = 'submitted',
+                                   explanation = 'Submitted',
+                                   value       = 1.0)
+        reports = [(TestBatch.STAGE_ID,
+                    stage.StageResult.RESULT_PASS,
+                    outcome.dict,
+                    {'new' : 'New feedback'},
+                    None)]
+
+        controller = self._create_controller(model)
+        with unittest.mock.patch('sys.stdout'):
+            self.assertTrue(controller.report_submission(
+                TestBatch.SUBMISSIONS[0], reports))
+
+        stage_outcomes = model.outcomes[TestBatch.SUBMISSIONS[0]][
+            TestBatch.STAGE_ID]
+        self.assertEqual(list(stage_outcomes), ['submitted'])
+        self.assertIsInstance(stage_outcomes['submitted'], outcomes.Outcome)
+        self.assertEqual(stage_outcomes['submitted']['explanation'],
+                         'Submitted')
+        self.assertEqual(stage_outcomes.score, 1.0)
+
+        self.assertEqual(list(model.feedbacks[TestBatch.SUBMISSIONS[0]][
+                                  TestBatch.STAGE_ID]),
+                         ['new'])
+
+    def test_report_submission_failed(self):
+        """Test that a submission with a stage that failed is reported as failed, with its error."""
+        model   = self._create_model()
+        reports = [(None,
+                    stage.StageResult.RESULT_CRITICAL,
+                    None,
+                    {},
+                    'Failed to score submission: boom')]
+
+        controller = self._create_controller(model)
+        with unittest.mock.patch('sys.stdout'), \
+                unittest.mock.patch('sys.stderr') as stderr:
+            self.assertFalse(controller.report_submission(
+                TestBatch.SUBMISSIONS[0], reports))
+
+        stderr.write.assert_called_once_with(
+            TestBatch.SUBMISSIONS[0] + ': Failed to score submission: boom\n')
+
+    def test_final_feedbacks_pool(self):
+        """Test that final feedback files are generated by a pool of processes when there are more than fit in one chunk."""
+        config.ini.read_dict({
+            'model_file': {
+                'file_final_feedback' : self._get_path('##submission##.txt'),
+                'finalise_workers'    : '2'}})
+
+        model = self._create_model()
+        for submission in TestBatch.SUBMISSIONS:
+            model.feedbacks[submission][TestBatch.STAGE_ID]['feedback'] = \
+                'Feedback for ' + submission
+
+        with unittest.mock.patch.object(fs.FileSystemModel,
+                                        'FINAL_FEEDBACKS_CHUNK', 1):
+            model.save(force_finalise = True)
+
+        self.assertEqual(model.finalise_report,
+                         {'rendered': 3, 'skipped': 0, 'deleted': 0})
+        for submission in TestBatch.SUBMISSIONS:
+            with open(self._get_path(submission + '.txt')) as f:
+                self.assertIn('Feedback for ' + submission, f.read())
+
+
+
+if __name__ == '__main__':
+    unittest.main()
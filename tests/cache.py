@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyfeedbacker.app import cache, config
+
+
+
+class TestResultCache(unittest.TestCase):
+    KEY_PARTS = ['stage_id_1', 'make test']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.tree      = os.path.join(self.directory, 'submission')
+
+        os.makedirs(self.tree)
+        with open(os.path.join(self.tree, 'main.py'), 'w') as f:
+            f.write('print("Hello")\n')
+
+        config.ini.clear()
+        config.ini.read_dict({'cache': {'directory' : self.cache_dir}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors = True)
+
+    def _get_files(self):
+        files = []
+        for root, dirs, filenames in os.walk(self.cache_dir):
+            files += filenames
+        return files
+
+    def test_key(self):
+        """Test that the key of a result is the same for the same inputs, and changes when any of them change."""
+        results = cache.ResultCache()
+        key     = results.get_key(TestResultCache.KEY_PARTS, [self.tree])
+
+        self.assertEqual(key,
+                         results.get_key(TestResultCache.KEY_PARTS,
+                                         [self.tree]))
+        self.assertNotEqual(key,
+                            results.get_key(TestResultCache.KEY_PARTS[:1],
+                                            [self.tree]))
+        self.assertNotEqual(key,
+                            results.get_key(TestResultCache.KEY_PARTS))
+
+        # Changing a file in the tree changes the key
+        with open(os.path.join(self.tree, 'main.py'), 'w') as f:
+            f.write('print("Goodbye")\n')
+
+        self.assertNotEqual(key,
+                            results.get_key(TestResultCache.KEY_PARTS,
+                                            [self.tree]))
+
+    def test_set_get(self):
+        """Test that a stored result is retrieved with the output it was stored with."""
+        results = cache.ResultCache()
+        key     = results.get_key(TestResultCache.KEY_PARTS)
+
+        self.assertIsNone(results.get(key))
+
+        results.set(key, 1, b'out', b'err')
+        returncode, stdout, stderr = results.get(key)
+
+        self.assertEqual(returncode, 1)
+        self.assertEqual(stdout, b'out')
+        self.assertEqual(stderr, b'err')
+        self.assertEqual(stdout.total, 3)
+
+    def test_disabled(self):
+        """Test that nothing is stored or retrieved when the cache is disabled."""
+        config.ini.set('cache', 'enabled', 'False')
+
+        results = cache.ResultCache()
+        key     = results.get_key(TestResultCache.KEY_PARTS)
+        results.set(key, 0, b'out', b'err')
+
+        self.assertIsNone(results.get(key))
+        self.assertEqual(self._get_files(), [])
+
+    def test_evict(self):
+        """Test that the least recently used results are removed once the cache is larger than max_bytes, and the size of the cache is kept up to date."""
+        results = cache.ResultCache()
+        keys    = [results.get_key([num]) for num in range(3)]
+
+        results.set(keys[0], 0, b'x' * 100, b'')
+        size = results._sizes[self.cache_dir]
+
+        # Room for two results
+        config.ini.set('cache', 'max_bytes', str(size * 2))
+
+        results.set(keys[1], 0, b'x' * 100, b'')
+        self.assertEqual(results._sizes[self.cache_dir], size * 2)
+
+        for mtime, key in enumerate(keys[:2]):
+            os.utime(results._get_path(key), (mtime, mtime))
+
+        results.set(keys[2], 0, b'x' * 100, b'')
+
+        self.assertIsNone(results.get(keys[0]))
+        self.assertIsNotNone(results.get(keys[1]))
+        self.assertIsNotNone(results.get(keys[2]))
+        self.assertEqual(results._sizes[self.cache_dir], size * 2)
+
+    def test_replace(self):
+        """Test that storing a result again doesn't count its size twice."""
+        results = cache.ResultCache()
+        key     = results.get_key(TestResultCache.KEY_PARTS)
+
+        results.set(key, 0, b'x' * 100, b'')
+        size = results._sizes[self.cache_dir]
+
+        results.set(key, 0, b'x' * 100, b'')
+        self.assertEqual(results._sizes[self.cache_dir], size)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
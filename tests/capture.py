@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyfeedbacker.app import capture
+
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_partial(self):
+        """Test that a buffer that isn't full keeps everything written to it, in order."""
+        buffer = capture.RingBuffer(8)
+        buffer.write(b'abc')
+        buffer.write(b'de')
+
+        self.assertEqual(buffer.getvalue(), b'abcde')
+
+    def test_wraparound(self):
+        """Test that writing past the end of the buffer overwrites the oldest bytes, and they are retrieved oldest first."""
+        buffer = capture.RingBuffer(5)
+        buffer.write(b'abc')
+        buffer.write(b'defg')
+
+        self.assertEqual(buffer.getvalue(), b'cdefg')
+
+        buffer.write(b'h')
+        self.assertEqual(buffer.getvalue(), b'defgh')
+
+        # filling the buffer exactly ends at its start
+        buffer.write(b'ijk')
+        self.assertEqual(buffer.getvalue(), b'ghijk')
+
+    def test_exactly_full(self):
+        """Test that a buffer filled exactly keeps every byte."""
+        buffer = capture.RingBuffer(4)
+        buffer.write(b'ab')
+        buffer.write(b'cd')
+
+        self.assertEqual(buffer.getvalue(), b'abcd')
+
+    def test_large_write(self):
+        """Test that a write larger than the buffer keeps only its end."""
+        buffer = capture.RingBuffer(4)
+        buffer.write(b'ab')
+        buffer.write(b'0123456789')
+
+        self.assertEqual(buffer.getvalue(), b'6789')
+
+        buffer.write(b'x')
+        self.assertEqual(buffer.getvalue(), b'789x')
+
+    def test_empty(self):
+        """Test that a buffer without any capacity keeps nothing."""
+        buffer = capture.RingBuffer(0)
+        buffer.write(b'abc')
+
+        self.assertEqual(buffer.getvalue(), b'')
+
+
+
+class TestOutputCapture(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors = True)
+
+    def test_small(self):
+        """Test that output that fits is kept whole, and isn't truncated."""
+        output = capture.OutputCapture(16)
+        output.write(b'hello ')
+        output.write(b'world')
+
+        value = output.getvalue()
+        self.assertEqual(value, b'hello world')
+        self.assertEqual(value.total, 11)
+        self.assertEqual(value.omitted, 0)
+        self.assertFalse(value.truncated)
+
+    def test_exactly_full(self):
+        """Test that output exactly the size of the capture isn't truncated."""
+        output = capture.OutputCapture(8)
+        output.write(b'abcdefgh')
+
+        value = output.getvalue()
+        self.assertEqual(value, b'abcdefgh')
+        self.assertFalse(value.truncated)
+
+    def test_truncation(self):
+        """Test that the start and end of long output are kept, with a note of how many bytes were dropped in between."""
+        output = capture.OutputCapture(8)
+        for chunk in [b'abc', b'defghij', b'klmnopq', b'rst']:
+            output.write(chunk)
+
+        value = output.getvalue()
+        self.assertEqual(value, b'abcd\n[\xe2\x80\xa6 12 bytes omitted '
+                                b'\xe2\x80\xa6]\nqrst')
+        self.assertEqual(value.total, 20)
+        self.assertEqual(value.omitted, 12)
+        self.assertTrue(value.truncated)
+
+    def test_multibyte_split(self):
+        """Test that a character written in several parts is kept whole, and output truncated within a character can still be decoded."""
+        text   = 'é' * 10
+        data   = text.encode()
+        output = capture.OutputCapture(64)
+        for pos in range(len(data)):
+            output.write(data[pos:pos + 1])
+
+        self.assertEqual(output.getvalue().decode(), text)
+
+        # the part kept from the start ends within a character
+        output = capture.OutputCapture(7)
+        output.write(data)
+
+        value   = output.getvalue()
+        decoded = value.decode(errors = 'replace')
+        self.assertTrue(value.truncated)
+        self.assertTrue(decoded.startswith('é\ufffd\n'))
+        self.assertTrue(decoded.endswith(']\néé'))
+
+    def test_spill(self):
+        """Test that the whole output is written to the spill file, even when it is truncated."""
+        output = capture.OutputCapture(4,
+                                       spill     = True,
+                                       spill_dir = self.directory)
+        output.write(b'0123456789')
+        output.close()
+
+        value = output.getvalue()
+        self.assertTrue(value.truncated)
+        self.assertEqual(value.path, output.path)
+        self.assertEqual(os.path.dirname(value.path), self.directory)
+
+        with open(value.path, 'rb') as f:
+            self.assertEqual(f.read(), b'0123456789')
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from pyfeedbacker.app import config
+from pyfeedbacker.app.model import model, outcomes
+
+
+
+class TestConfigVersion(unittest.TestCase):
+    STAGE_ID   = 'stage_id_1'
+    OUTCOME_ID = 'outcome_id_1'
+    SUBMISSION = 'submission_1234'
+
+    def setUp(self):
+        config.ini.clear()
+        config.ini.read_dict({
+            'assessment': {
+                'stages'    : TestConfigVersion.STAGE_ID},
+            'stage_' + TestConfigVersion.STAGE_ID: {
+                'score_max' : '10'}})
+
+    def _assert_changes(self, change):
+        version = config.ini.version
+        change()
+        self.assertNotEqual(config.ini.version, version)
+
+    def test_version(self):
+        """Test that the version of the configuration changes however the configuration is changed."""
+        section = 'stage_' + TestConfigVersion.STAGE_ID
+
+        self._assert_changes(lambda: config.ini.set(section, 'a', '1'))
+        self._assert_changes(lambda: config.ini[section].__setitem__('b', '2'))
+        self._assert_changes(lambda: config.ini.read_dict(
+            {section: {'c': '3'}}))
+        self._assert_changes(lambda: config.ini.read_string('[other]\nd = 4'))
+        self._assert_changes(lambda: config.ini.add_section('another'))
+        self._assert_changes(lambda: config.ini.remove_option(section, 'a'))
+        self._assert_changes(lambda: config.ini[section].__delitem__('b'))
+        self._assert_changes(lambda: config.ini.remove_section('another'))
+        self._assert_changes(config.ini.clear)
+
+    def test_version_unique(self):
+        """Test that clearing the configuration never reuses a version from before it was cleared."""
+        versions = set()
+        for num in range(3):
+            config.ini.clear()
+            versions.add(config.ini.version)
+            config.ini.read_dict({'app': {'name': str(num)}})
+            versions.add(config.ini.version)
+
+        self.assertEqual(len(versions), 6)
+
+    def test_compiled(self):
+        """Test that the compiled configuration is reused until the configuration changes, and is rebuilt however it is changed."""
+        compiled = config.ini.compiled
+        self.assertIs(config.ini.compiled, compiled)
+        self.assertEqual(compiled.get_stage(TestConfigVersion.STAGE_ID)
+                                 .score_max,
+                         10.0)
+
+        config.ini['stage_' + TestConfigVersion.STAGE_ID]['score_max'] = '5'
+        self.assertEqual(config.ini.compiled
+                                   .get_stage(TestConfigVersion.STAGE_ID)
+                                   .score_max,
+                         5.0)
+
+        config.ini.read_dict({'assessment': {'score_max': '2'}})
+        self.assertEqual(config.ini.compiled.score_max, 2.0)
+
+        config.ini.add_section('stage_stage_id_2')
+        self.assertTrue(config.ini.compiled.get_stage('stage_id_2').exists)
+
+    def test_cached_totals(self):
+        """Test that scores calculated from the configuration are recalculated once the configuration changes."""
+        root_model = model.Model()
+        root_model.outcomes[TestConfigVersion.SUBMISSION][
+            TestConfigVersion.STAGE_ID][TestConfigVersion.OUTCOME_ID] = \
+                outcomes.Outcome(outcome_id = TestConfigVersion.OUTCOME_ID,
+                                 value      = 20.0)
+
+        submission_outcomes = root_model.outcomes[TestConfigVersion.SUBMISSION]
+        self.assertEqual(submission_outcomes.score, 10.0)
+
+        config.ini['stage_' + TestConfigVersion.STAGE_ID]['score_max'] = '15'
+        self.assertEqual(submission_outcomes.score, 15.0)
+
+        config.ini.read_dict({'assessment': {'score_max': '12'}})
+        self.assertEqual(submission_outcomes.score, 12.0)
+
+        config.ini.remove_option('assessment', 'score_max')
+        self.assertEqual(submission_outcomes.score, 15.0)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
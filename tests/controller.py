@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from pyfeedbacker.app import config, stage
+from pyfeedbacker.app.controller import base
+
+
+
+class _StageInfo(object):
+    def __init__(self):
+        """Stand-in for the information of a stage, with only its state."""
+        self.state = stage.StageInfo.STATE_INACTIVE
+
+    def set_state(self, state):
+        self.state = state
+
+
+
+class TestStageDependencies(unittest.TestCase):
+    def _create_controller(self, stages):
+        """Create a controller for stages, given as a list of (stage_id,
+        depends), where depends is None to use the default."""
+        config.ini.clear()
+        config.ini.add_section('assessment')
+        config.ini.set('assessment',
+                       'stages',
+                       ','.join(stage_id for stage_id, depends in stages))
+
+        for stage_id, depends in stages:
+            config.ini.add_section('stage_' + stage_id)
+            if depends is not None:
+                config.ini.set('stage_' + stage_id, 'depends', depends)
+
+        controller = base.BaseController()
+        controller._load_dependencies()
+        controller.stages = {stage_id: _StageInfo()
+                             for stage_id, depends in stages}
+
+        return controller
+
+    def test_default_depends(self):
+        """Test that stages without dependencies depend on the stage before them."""
+        controller = self._create_controller([('a', None),
+                                              ('b', None),
+                                              ('c', None)])
+
+        self.assertEqual(controller.stages_depends,
+                         {'a': (), 'b': ('a',), 'c': ('b',)})
+        self.assertEqual(controller.get_stage_order(), ['a', 'b', 'c'])
+        self.assertEqual(controller.get_ready_stage_ids(), ['a'])
+
+    def test_order(self):
+        """Test that stages are ordered after the stages they depend on, and otherwise in the order they are configured."""
+        controller = self._create_controller([('d', 'c'),
+                                              ('c', 'a, b'),
+                                              ('a', ''),
+                                              ('b', ''),
+                                              ('e', '')])
+
+        self.assertEqual(controller.get_stage_order(),
+                         ['a', 'b', 'e', 'c', 'd'])
+        self.assertEqual(controller.stages_dependants['a'], ['c'])
+        self.assertEqual(controller.get_dependant_stage_ids('a'),
+                         ['d', 'c'])
+
+    def test_cycle(self):
+        """Test that stages whose dependencies form a cycle are an error."""
+        with self.assertRaises(stage.StageError):
+            self._create_controller([('a', ''),
+                                     ('b', 'a, c'),
+                                     ('c', 'b')])
+
+    def test_unknown(self):
+        """Test that depending on a stage that doesn't exist is an error."""
+        with self.assertRaises(stage.StageError):
+            self._create_controller([('a', ''),
+                                     ('b', 'z')])
+
+    def test_ready(self):
+        """Test that a stage is ready once every stage it depends on is complete, and only if it hasn't been executed."""
+        controller = self._create_controller([('a', ''),
+                                              ('b', ''),
+                                              ('c', 'a, b')])
+
+        self.assertEqual(controller.get_ready_stage_ids(), ['a', 'b'])
+
+        controller.stages['a'].set_state(stage.StageInfo.STATE_COMPLETE)
+        self.assertFalse(controller.is_stage_ready('c'))
+
+        controller.stages['b'].set_state(stage.StageInfo.STATE_COMPLETE)
+        self.assertTrue(controller.is_stage_ready('c'))
+        self.assertEqual(controller.get_ready_stage_ids(), ['c'])
+
+        controller.stages['c'].set_state(stage.StageInfo.STATE_ACTIVE)
+        self.assertFalse(controller.is_stage_ready('c'))
+
+    def test_fail_dependants(self):
+        """Test that failing a stage fails every stage that depends on it, directly or not, and no others."""
+        controller = self._create_controller([('a', ''),
+                                              ('b', 'a'),
+                                              ('c', 'b'),
+                                              ('d', '')])
+
+        controller.fail_dependant_stages('a')
+
+        self.assertEqual({stage_id: stage_info.state
+                          for stage_id, stage_info
+                          in controller.stages.items()},
+                         {'a': stage.StageInfo.STATE_INACTIVE,
+                          'b': stage.StageInfo.STATE_FAILED,
+                          'c': stage.StageInfo.STATE_FAILED,
+                          'd': stage.StageInfo.STATE_INACTIVE})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import unittest.mock
+
+from pyfeedbacker.app import config
+from pyfeedbacker.app.model import engine, model, outcomes
+
+
+
+@unittest.skipIf(engine.numpy is None, 'NumPy is not installed')
+class TestMarksEngine(unittest.TestCase):
+    STAGE_1      = 'stage_id_1'
+    STAGE_2      = 'stage_id_2'
+
+    SUBMISSIONS  = ['submission_1', 'submission_2', 'submission_3',
+                    'submission_4']
+
+    def setUp(self):
+        config.ini.clear()
+        config.ini.read_dict({
+            'assessment': {
+                'stages' : f'{TestMarksEngine.STAGE_1},'
+                           f'{TestMarksEngine.STAGE_2}'}})
+
+        self.root_model = model.Model()
+        self.engine     = engine.MarksEngine(self.root_model)
+
+    def _add_outcome(self, submission, stage_id, outcome_id, **kwargs):
+        self.root_model.outcomes[submission][stage_id][outcome_id] = \
+            outcomes.Outcome(outcome_id = outcome_id, **kwargs)
+
+    def _assert_equivalent(self):
+        """Assert that the engine calculates the same mark for every
+        submission as the outcomes model does."""
+        marks = self.engine.calculate()
+
+        self.assertEqual(list(marks), list(self.root_model.outcomes.keys()))
+        for submission, mark in marks.items():
+            self.assertAlmostEqual(
+                mark, self.root_model.outcomes[submission].mark)
+
+    def _assert_outcome_marks(self, stage_id, outcome_id):
+        """Assert that the engine calculates the mark of every submission as
+        the mark of a single outcome."""
+        marks = self.engine.calculate()
+
+        for submission in TestMarksEngine.SUBMISSIONS:
+            stage_outcomes = self.root_model.outcomes[submission][stage_id]
+            self.assertAlmostEqual(marks[submission],
+                                   stage_outcomes.get_mark(outcome_id) or 0.0)
+
+        self._assert_equivalent()
+
+    def test_single(self):
+        """Test that the mark of an outcome with a single value is its value, as with `Outcomes.get_mark`."""
+        for num, submission in enumerate(TestMarksEngine.SUBMISSIONS):
+            self._add_outcome(submission, TestMarksEngine.STAGE_1, 'single',
+                              value = float(num) * 1.5)
+
+        # a value that isn't a number has no mark
+        self._add_outcome(TestMarksEngine.SUBMISSIONS[-1],
+                          TestMarksEngine.STAGE_1, 'single',
+                          value = 'pass')
+
+        self._assert_outcome_marks(TestMarksEngine.STAGE_1, 'single')
+
+    def test_scale(self):
+        """Test that the mark of an outcome with a scale of values is the mark for its key, or its value if there isn't one, as with `Outcomes.get_mark`."""
+        for num, submission in enumerate(TestMarksEngine.SUBMISSIONS):
+            self._add_outcome(submission, TestMarksEngine.STAGE_1, 'scale',
+                              key        = num,
+                              value      = float(num),
+                              all_values = ['A', 'B', 'C', 'D'])
+
+        self.root_model.marks[TestMarksEngine.STAGE_1]['scale'] = {
+            '0' : 10.0,
+            '1' : 7.5,
+            '3' : 'not a mark'}
+
+        self._assert_outcome_marks(TestMarksEngine.STAGE_1, 'scale')
+
+        # the engine uses the marks as they are when it calculates
+        self.root_model.marks[TestMarksEngine.STAGE_1]['scale'] = {'2' : 4.0}
+        self._assert_outcome_marks(TestMarksEngine.STAGE_1, 'scale')
+
+    def test_user_input(self):
+        """Test that the mark of an outcome entered by the user is its value scaled by its mark, or its value if there isn't one, as with `Outcomes.get_mark`."""
+        for num, submission in enumerate(TestMarksEngine.SUBMISSIONS):
+            self._add_outcome(submission, TestMarksEngine.STAGE_1, 'input',
+                              value      = float(num) + 0.5,
+                              user_input = True)
+
+        self._assert_outcome_marks(TestMarksEngine.STAGE_1, 'input')
+
+        self.root_model.marks[TestMarksEngine.STAGE_1]['input'] = 2.0
+        self._assert_outcome_marks(TestMarksEngine.STAGE_1, 'input')
+
+    def test_bounds(self):
+        """Test that the marks of stages and of submissions are clamped to the configured bounds, as with the Python totals."""
+        config.ini.read_dict({
+            'assessment': {
+                'mark_max' : '25'},
+            'stage_' + TestMarksEngine.STAGE_1: {
+                'mark_min' : '0',
+                'mark_max' : '20'}})
+
+        values = [(5.0, 3.0), (30.0, 1.0), (-10.0, 2.0), (15.0, 12.0)]
+        for submission, (value_1, value_2) in zip(
+                TestMarksEngine.SUBMISSIONS, values):
+            self._add_outcome(submission, TestMarksEngine.STAGE_1, 'single',
+                              value = value_1)
+            self._add_outcome(submission, TestMarksEngine.STAGE_1, 'input',
+                              value      = 1.0,
+                              user_input = True)
+            self._add_outcome(submission, TestMarksEngine.STAGE_2, 'single',
+                              value = value_2)
+
+        # a stage that not every submission has
+        self._add_outcome(TestMarksEngine.SUBMISSIONS[0], 'stage_id_3',
+                          'single', value = 4.0)
+
+        self._assert_equivalent()
+        self.assertEqual(self.engine.calculate(),
+                         {TestMarksEngine.SUBMISSIONS[0] : 13.0,
+                          TestMarksEngine.SUBMISSIONS[1] : 21.0,
+                          TestMarksEngine.SUBMISSIONS[2] : 2.0,
+                          TestMarksEngine.SUBMISSIONS[3] : 25.0})
+
+        # bounds are read from the configuration as it is
+        config.ini['stage_' + TestMarksEngine.STAGE_1]['mark_max'] = '10'
+        self._assert_equivalent()
+
+    def test_without_numpy(self):
+        """Test that the marks are the same when NumPy isn't installed."""
+        for num, submission in enumerate(TestMarksEngine.SUBMISSIONS):
+            self._add_outcome(submission, TestMarksEngine.STAGE_1, 'scale',
+                              key   = num % 2,
+                              value = float(num))
+            self._add_outcome(submission, TestMarksEngine.STAGE_2, 'input',
+                              value      = float(num),
+                              user_input = True)
+
+        self.root_model.marks[TestMarksEngine.STAGE_1]['scale'] = {'1' : 3.0}
+        self.root_model.marks[TestMarksEngine.STAGE_2]['input'] = 0.5
+
+        marks = self.engine.calculate()
+        with unittest.mock.patch.object(engine, 'numpy', None):
+            self.assertEqual(self.engine.calculate(), marks)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
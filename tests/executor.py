@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import concurrent.futures
+import threading
+import time
+import unittest
+
+from pyfeedbacker.app import config, stage
+from pyfeedbacker.app.controller import executor
+
+
+
+class _WaitingHandler(stage.HandlerBase):
+    def __init__(self, stage_id, result = None):
+        """A stage that waits until it is released or cancelled."""
+        super().__init__(stage_id)
+
+        self.result  = result
+        self.started = threading.Event()
+        self.stop    = threading.Event()
+
+    def run(self):
+        self.started.set()
+        self.stop.wait(10)
+        return self.result
+
+    def cancel(self):
+        super().cancel()
+        self.stop.set()
+
+
+
+class _SleepingHandler(stage.HandlerProcess):
+    def setup(self):
+        """A command that starts a process of its own and waits for it."""
+        super().setup(command = 'sleep 30 & echo started; wait',
+                      shell   = True)
+
+
+
+class _TouchingHandler(stage.HandlerAsyncProcess):
+    def setup(self):
+        """A command that creates a file in the workspace."""
+        super().setup(command = ['touch', 'marker'])
+
+
+
+class _Controller(object):
+    def __init__(self, workspace):
+        """Stand-in for the controller of a stage."""
+        self.model     = None
+        self.view      = None
+        self.workspace = workspace
+
+    def set_stage_output(self, stage_id, output):
+        pass
+
+
+
+class TestStageExecutor(unittest.TestCase):
+    KEY_1 = ('stage_id_1', 'run')
+    KEY_2 = ('stage_id_2', 'run')
+
+    def setUp(self):
+        config.ini.clear()
+
+        self.executor = executor.StageExecutor(workers = 2)
+        self.results  = []
+        self.done     = threading.Event()
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def _callback(self, result):
+        self.results.append(result)
+        self.done.set()
+
+    def test_submit(self):
+        """Test that the result of a stage is passed to the callback."""
+        result   = stage.StageResult(stage.StageResult.RESULT_PASS)
+        instance = _WaitingHandler(TestStageExecutor.KEY_1[0], result)
+        instance.stop.set()
+
+        self.executor.submit(TestStageExecutor.KEY_1,
+                             instance,
+                             instance.run,
+                             self._callback)
+
+        self.assertTrue(self.done.wait(10))
+        self.assertEqual(self.results, [result])
+        self.assertFalse(self.executor.is_pending(TestStageExecutor.KEY_1))
+
+    def test_cancel(self):
+        """Test that cancelling a stage asks it to stop, and its callback is never called."""
+        result   = stage.StageResult(stage.StageResult.RESULT_PASS)
+        instance = _WaitingHandler(TestStageExecutor.KEY_1[0], result)
+
+        future = self.executor.submit(TestStageExecutor.KEY_1,
+                                      instance,
+                                      instance.run,
+                                      self._callback)
+        self.assertTrue(instance.started.wait(10))
+        self.assertTrue(self.executor.is_pending(TestStageExecutor.KEY_1))
+
+        self.assertTrue(self.executor.cancel(TestStageExecutor.KEY_1))
+        self.assertFalse(self.executor.cancel(TestStageExecutor.KEY_1))
+
+        future.result(timeout = 10)
+        self.assertTrue(instance.cancelled)
+        self.assertFalse(self.executor.is_pending(TestStageExecutor.KEY_1))
+        self.assertEqual(self.results, [])
+
+    def test_submit_replaces(self):
+        """Test that submitting a stage with the same key as a pending stage cancels the pending stage."""
+        result_1   = stage.StageResult(stage.StageResult.RESULT_PASS)
+        instance_1 = _WaitingHandler(TestStageExecutor.KEY_1[0], result_1)
+        result_2   = stage.StageResult(stage.StageResult.RESULT_PARTIAL)
+        instance_2 = _WaitingHandler(TestStageExecutor.KEY_1[0], result_2)
+        instance_2.stop.set()
+
+        self.executor.submit(TestStageExecutor.KEY_1,
+                             instance_1,
+                             instance_1.run,
+                             self._callback)
+        self.assertTrue(instance_1.started.wait(10))
+
+        self.executor.submit(TestStageExecutor.KEY_1,
+                             instance_2,
+                             instance_2.run,
+                             self._callback)
+
+        self.assertTrue(self.done.wait(10))
+        self.assertTrue(instance_1.cancelled)
+        self.assertEqual(self.results, [result_2])
+
+    def test_timeout(self):
+        """Test that a stage that takes too long is asked to stop, and an error result is passed to the callback."""
+        result   = stage.StageResult(stage.StageResult.RESULT_PASS)
+        instance = _WaitingHandler(TestStageExecutor.KEY_1[0], result)
+
+        future = self.executor.submit(TestStageExecutor.KEY_1,
+                                      instance,
+                                      instance.run,
+                                      self._callback,
+                                      timeout = 0.1)
+
+        self.assertTrue(self.done.wait(10))
+        future.result(timeout = 10)
+
+        # The result of the stage once it stopped is ignored
+        self.assertEqual(len(self.results), 1)
+        self.assertEqual(self.results[0].result,
+                         stage.StageResult.RESULT_ERROR)
+        self.assertTrue(instance.cancelled)
+
+    def test_submit_future(self):
+        """Test that a stage that returns a future doesn't hold a thread while the future is pending, and the result of the future is passed to the callback."""
+        stage_executor = executor.StageExecutor(workers = 1)
+        self.addCleanup(stage_executor.shutdown)
+
+        pending  = concurrent.futures.Future()
+        instance = _WaitingHandler(TestStageExecutor.KEY_1[0])
+        stage_executor.submit(TestStageExecutor.KEY_1,
+                              instance,
+                              lambda: pending,
+                              self._callback)
+
+        result   = stage.StageResult(stage.StageResult.RESULT_PARTIAL)
+        instance = _WaitingHandler(TestStageExecutor.KEY_2[0], result)
+        instance.stop.set()
+        stage_executor.submit(TestStageExecutor.KEY_2,
+                              instance,
+                              instance.run,
+                              self._callback)
+
+        self.assertTrue(self.done.wait(10))
+        self.assertEqual(self.results, [result])
+        self.assertTrue(stage_executor.is_pending(TestStageExecutor.KEY_1))
+
+        self.done.clear()
+        result = stage.StageResult(stage.StageResult.RESULT_PASS)
+        pending.set_result(result)
+
+        self.assertTrue(self.done.wait(10))
+        self.assertEqual(self.results[1:], [result])
+        self.assertFalse(stage_executor.is_pending(TestStageExecutor.KEY_1))
+
+    def test_cancel_future(self):
+        """Test that cancelling a stage that returned a future cancels the future."""
+        pending  = concurrent.futures.Future()
+        returned = threading.Event()
+        instance = _WaitingHandler(TestStageExecutor.KEY_1[0])
+
+        def function():
+            returned.set()
+            return pending
+
+        self.executor.submit(TestStageExecutor.KEY_1,
+                             instance,
+                             function,
+                             self._callback)
+        self.assertTrue(returned.wait(10))
+
+        # the future is waited on once the function has returned
+        while self.executor._tasks[TestStageExecutor.KEY_1].future \
+                is not pending:
+            time.sleep(0.01)
+
+        self.assertTrue(self.executor.cancel(TestStageExecutor.KEY_1))
+        self.assertTrue(pending.cancelled())
+        self.assertFalse(self.executor.is_pending(TestStageExecutor.KEY_1))
+        self.assertEqual(self.results, [])
+
+    def test_chain(self):
+        """Test that a chained future is passed the result of the other future, and cancelling it cancels the other future."""
+        future  = concurrent.futures.Future()
+        chained = executor.chain(future, lambda result: result + 1)
+        future.set_result(1)
+        self.assertEqual(chained.result(timeout = 10), 2)
+
+        future  = concurrent.futures.Future()
+        chained = executor.chain(future, lambda result: result + 1)
+        chained.cancel()
+        self.assertTrue(future.cancelled())
+
+    def test_cancel_all(self):
+        """Test that cancelling every stage cancels stages with different keys."""
+        instances = [_WaitingHandler(TestStageExecutor.KEY_1[0]),
+                     _WaitingHandler(TestStageExecutor.KEY_2[0])]
+
+        for key, instance in zip([TestStageExecutor.KEY_1,
+                                  TestStageExecutor.KEY_2], instances):
+            self.executor.submit(key, instance, instance.run, self._callback)
+
+        for instance in instances:
+            self.assertTrue(instance.started.wait(10))
+
+        self.executor.cancel_all()
+
+        for instance in instances:
+            self.assertTrue(instance.cancelled)
+        self.assertFalse(self.executor.is_pending(TestStageExecutor.KEY_1))
+        self.assertFalse(self.executor.is_pending(TestStageExecutor.KEY_2))
+
+
+
+@unittest.skipUnless(os.name == 'posix', 'process groups are POSIX only')
+class TestHandlerProcess(unittest.TestCase):
+    STAGE_ID = 'stage_id_1'
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+
+        config.ini.clear()
+        config.ini.add_section('app')
+        config.ini.set('app', 'dir_submissions', self.workspace)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace, ignore_errors = True)
+
+    def test_cancel(self):
+        """Test that cancelling a command also kills the processes it started, so the stage stops without waiting for them."""
+        instance = _SleepingHandler(TestHandlerProcess.STAGE_ID)
+        instance.set_framework(_Controller(self.workspace))
+
+        thread = threading.Thread(target = instance.run, daemon = True)
+        thread.start()
+
+        while getattr(instance, '_process', None) is None:
+            time.sleep(0.01)
+        time.sleep(0.2)
+
+        instance.cancel()
+        thread.join(timeout = 10)
+
+        self.assertFalse(thread.is_alive())
+
+    def test_async_run(self):
+        """Test that a command run in the event loop is run by the future returned by the stage."""
+        instance = _TouchingHandler(TestHandlerProcess.STAGE_ID)
+        instance.set_framework(_Controller(self.workspace))
+
+        result = instance.run_async().result(timeout = 10)
+
+        self.assertEqual(result.result, stage.StageResult.RESULT_PASS)
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.workspace, 'marker')))
+
+    def test_async_cancel_before_run(self):
+        """Test that a command run in the event loop isn't started if the stage was cancelled before the loop started it."""
+        instance = _TouchingHandler(TestHandlerProcess.STAGE_ID)
+        instance.set_framework(_Controller(self.workspace))
+        instance.cancel()
+
+        self.assertIsNone(instance.run_async().result(timeout = 10))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.workspace, 'marker')))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
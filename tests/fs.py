@@ -0,0 +1,744 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import gzip
+import json
+import os
+import threading
+import unittest
+
+from pyfeedbacker.app import config
+from pyfeedbacker.app.controller import marker
+from pyfeedbacker.app.model import fs, outcomes
+from tests import base
+
+
+
+class _FileSystemModelTestCase(base.ModelTestCase):
+    MODEL_TYPE   = fs.FileSystemModel
+
+    STAGE_ID_1   = 'stage_id_1'
+    STAGE_ID_2   = 'stage_id_2'
+    OUTCOME_ID_1 = 'outcome_id_1'
+    OUTCOME_ID_2 = 'outcome_id_2'
+    FEEDBACK_ID  = 'feedback_id_1'
+    FEEDBACK_VAL = 'Some feedback'
+
+    SUBMISSION_1 = 'submission_1234'
+    SUBMISSION_2 = 'submission_5678'
+
+    def setUp(self):
+        super().setUp()
+
+        config.ini.clear()
+        config.ini.read_dict({
+            'app': {
+                'name'                : 'Test'},
+            'model_file': {
+                'file_feedbacks'      : self._get_path('feedbacks.json'),
+                'file_outcomes'       : self._get_path('outcomes.json'),
+                'file_outcomes_marks' : self._get_path('weights.json'),
+                'file_journal'        : self._get_path('journal.jsonl'),
+                'file_scores'         : self._get_path('scores.csv'),
+                'file_marks'          : self._get_path('marks.csv'),
+                'file_final_feedback' : self._get_path('##submission##.txt'),
+                'file_final_manifest' : self._get_path('finalised.json')}})
+
+    def _read(self, file_name):
+        with open(self._get_path(file_name)) as f:
+            return f.read()
+
+    def _set_outcome(self, model, submission, stage_id, outcome_id, value):
+        model.outcomes[submission][stage_id][outcome_id] = outcomes.Outcome(
+            outcome_id  = outcome_id,
+            explanation = 'A sample explanation',
+            value       = value)
+
+    def _get_value(self, model, submission, stage_id, outcome_id):
+        return model.outcomes[submission][stage_id][outcome_id]['value']
+
+
+
+class TestJournal(_FileSystemModelTestCase):
+    def test_journal_append(self):
+        """Test that every change to the model is appended to the journal."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          1.0)
+        model.feedbacks[TestJournal.SUBMISSION_1][TestJournal.STAGE_ID_1][
+            TestJournal.FEEDBACK_ID] = TestJournal.FEEDBACK_VAL
+
+        records = [json.loads(line)
+                   for line in self._read('journal.jsonl').splitlines()]
+
+        self.assertEqual([record['path'] for record in records],
+                         [['outcomes',
+                           TestJournal.SUBMISSION_1,
+                           TestJournal.STAGE_ID_1,
+                           TestJournal.OUTCOME_ID_1],
+                          ['feedbacks',
+                           TestJournal.SUBMISSION_1,
+                           TestJournal.STAGE_ID_1,
+                           TestJournal.FEEDBACK_ID]])
+        self.assertEqual(records[1]['value'], TestJournal.FEEDBACK_VAL)
+
+    def test_journal_replay(self):
+        """Test that changes that weren't saved are replayed from the journal when the model is loaded, and are still unsaved."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          1.0)
+        model.save()
+
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          2.0)
+        model.feedbacks[TestJournal.SUBMISSION_2][TestJournal.STAGE_ID_2][
+            TestJournal.FEEDBACK_ID] = TestJournal.FEEDBACK_VAL
+        del model.outcomes[TestJournal.SUBMISSION_1][TestJournal.STAGE_ID_1]
+
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_2,
+                          TestJournal.STAGE_ID_2,
+                          TestJournal.OUTCOME_ID_2,
+                          3.0)
+
+        # The model is loaded again without being saved (e.g., a crash)
+        model = self._create_model()
+
+        self.assertNotIn(TestJournal.STAGE_ID_1,
+                         model.outcomes[TestJournal.SUBMISSION_1])
+        self.assertEqual(self._get_value(model,
+                                         TestJournal.SUBMISSION_2,
+                                         TestJournal.STAGE_ID_2,
+                                         TestJournal.OUTCOME_ID_2),
+                         3.0)
+        self.assertEqual(str(model.feedbacks[TestJournal.SUBMISSION_2][
+                             TestJournal.STAGE_ID_2][
+                             TestJournal.FEEDBACK_ID]),
+                         TestJournal.FEEDBACK_VAL)
+        self.assertTrue(model._is_dirty('outcomes'))
+        self.assertTrue(model._is_dirty('feedbacks'))
+
+    def test_journal_partial_record(self):
+        """Test that a partially written record at the end of the journal is ignored."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          1.0)
+
+        with open(self._get_path('journal.jsonl'), 'a') as f:
+            f.write('{"path": ["outcomes", "sub')
+
+        model = self._create_model()
+
+        self.assertEqual(self._get_value(model,
+                                         TestJournal.SUBMISSION_1,
+                                         TestJournal.STAGE_ID_1,
+                                         TestJournal.OUTCOME_ID_1),
+                         1.0)
+
+    def test_save_empties_journal(self):
+        """Test that saving the model folds the journal into the JSON files."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          1.0)
+        model.save()
+
+        self.assertEqual(self._read('journal.jsonl'), '')
+        self.assertFalse(os.path.exists(
+            self._get_path('journal.jsonl.compacting')))
+        self.assertIn(TestJournal.SUBMISSION_1,
+                      json.loads(self._read('outcomes.json'))['outcomes'])
+
+    def test_compaction(self):
+        """Test that once the journal is long enough, it is folded into the JSON files in the background, and nothing is lost."""
+        config.ini.set('model_file', 'journal_compact_records', '2')
+
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          1.0)
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_2,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          2.0)
+
+        self.assertIsNotNone(model._compaction)
+        model._compaction.join()
+
+        self.assertEqual(self._read('journal.jsonl'), '')
+        self.assertFalse(os.path.exists(
+            self._get_path('journal.jsonl.compacting')))
+        self.assertEqual(
+            list(json.loads(self._read('outcomes.json'))['outcomes']),
+            [TestJournal.SUBMISSION_1, TestJournal.SUBMISSION_2])
+
+        # Changes after the compaction are in the new journal
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          3.0)
+
+        model = self._create_model()
+
+        self.assertEqual(self._get_value(model,
+                                         TestJournal.SUBMISSION_1,
+                                         TestJournal.STAGE_ID_1,
+                                         TestJournal.OUTCOME_ID_1),
+                         3.0)
+        self.assertEqual(self._get_value(model,
+                                         TestJournal.SUBMISSION_2,
+                                         TestJournal.STAGE_ID_1,
+                                         TestJournal.OUTCOME_ID_1),
+                         2.0)
+
+    def test_compaction_snapshot(self):
+        """Test that the snapshot taken for a compaction is a copy of the data, so it isn't affected by changes made while it is written."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          1.0)
+
+        files = dict(model._snapshot_dirty_files())
+
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          2.0)
+        del model.outcomes[TestJournal.SUBMISSION_1]
+
+        data = json.loads(json.dumps(files[self._get_path('outcomes.json')]))
+        self.assertEqual(data['outcomes'][TestJournal.SUBMISSION_1][
+                         TestJournal.STAGE_ID_1][
+                         TestJournal.OUTCOME_ID_1]['value'],
+                         1.0)
+
+    def test_compaction_running(self):
+        """Test that a compaction isn't started while another is running, and the journal must then grow as long again before one is."""
+        config.ini.set('model_file', 'journal_compact_records', '2')
+
+        model   = self._create_model()
+        running = threading.Event()
+        model._compaction = threading.Thread(target = running.wait)
+        model._compaction.start()
+
+        for value in (1.0, 2.0, 3.0):
+            self._set_outcome(model,
+                              TestJournal.SUBMISSION_1,
+                              TestJournal.STAGE_ID_1,
+                              TestJournal.OUTCOME_ID_1,
+                              value)
+
+        running.set()
+        model._compaction.join()
+
+        self.assertEqual(model._journal_records, 1)
+        self.assertFalse(os.path.exists(self._get_path('outcomes.json')))
+
+    def test_incomplete_compaction(self):
+        """Test that changes left over from a compaction that didn't finish are replayed before the journal."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          1.0)
+        model._journal.close()
+        model._journal = None
+
+        os.replace(self._get_path('journal.jsonl'),
+                   self._get_path('journal.jsonl.compacting'))
+
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestJournal.SUBMISSION_1,
+                          TestJournal.STAGE_ID_1,
+                          TestJournal.OUTCOME_ID_1,
+                          2.0)
+
+        model = self._create_model()
+
+        self.assertEqual(self._get_value(model,
+                                         TestJournal.SUBMISSION_1,
+                                         TestJournal.STAGE_ID_1,
+                                         TestJournal.OUTCOME_ID_1),
+                         2.0)
+
+
+
+class TestDirtyTracking(_FileSystemModelTestCase):
+    def test_read_not_dirty(self):
+        """Test that reading data that doesn't exist (which creates it empty) doesn't mark the model as changed."""
+        model = self._create_model()
+
+        model.outcomes[TestDirtyTracking.SUBMISSION_1][
+            TestDirtyTracking.STAGE_ID_1]
+        model.feedbacks[TestDirtyTracking.SUBMISSION_1][
+            TestDirtyTracking.STAGE_ID_1]
+
+        self.assertEqual(model._get_dirty('outcomes'), set())
+        self.assertEqual(model._get_dirty('feedbacks'), set())
+        self.assertEqual(self._read('journal.jsonl'), '')
+
+    def test_change_dirty(self):
+        """Test that changing a submission marks only that submission, in only that model, as changed."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestDirtyTracking.SUBMISSION_1,
+                          TestDirtyTracking.STAGE_ID_1,
+                          TestDirtyTracking.OUTCOME_ID_1,
+                          1.0)
+
+        self.assertEqual(model._get_dirty('outcomes'),
+                         {TestDirtyTracking.SUBMISSION_1})
+        self.assertEqual(model._get_dirty('feedbacks'), set())
+        self.assertEqual(model._get_dirty('marks'), set())
+
+        model.marks[TestDirtyTracking.STAGE_ID_1][
+            TestDirtyTracking.OUTCOME_ID_1] = 1.0
+
+        self.assertEqual(model._get_dirty('marks'),
+                         {TestDirtyTracking.STAGE_ID_1})
+
+    def test_delete_dirty(self):
+        """Test that deleting a submission marks it as changed, and clearing a model marks the whole model as changed."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestDirtyTracking.SUBMISSION_1,
+                          TestDirtyTracking.STAGE_ID_1,
+                          TestDirtyTracking.OUTCOME_ID_1,
+                          1.0)
+        model.save()
+
+        del model.outcomes[TestDirtyTracking.SUBMISSION_1]
+        self.assertEqual(model._get_dirty('outcomes'),
+                         {TestDirtyTracking.SUBMISSION_1})
+
+        model.feedbacks.clear()
+        self.assertEqual(model._get_dirty('feedbacks'), {None})
+
+    def test_save_clears_dirty(self):
+        """Test that saving the model marks it as unchanged, and only the files of models that have changed are written."""
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestDirtyTracking.SUBMISSION_1,
+                          TestDirtyTracking.STAGE_ID_1,
+                          TestDirtyTracking.OUTCOME_ID_1,
+                          1.0)
+        model.feedbacks[TestDirtyTracking.SUBMISSION_1][
+            TestDirtyTracking.STAGE_ID_1][TestDirtyTracking.FEEDBACK_ID] = \
+                TestDirtyTracking.FEEDBACK_VAL
+        model.save()
+
+        for name in ('outcomes', 'feedbacks', 'marks'):
+            self.assertFalse(model._is_dirty(name))
+
+        # A file is only written again if its model has changed
+        with open(self._get_path('feedbacks.json'), 'w') as f:
+            f.write('{}')
+
+        self._set_outcome(model,
+                          TestDirtyTracking.SUBMISSION_1,
+                          TestDirtyTracking.STAGE_ID_1,
+                          TestDirtyTracking.OUTCOME_ID_1,
+                          2.0)
+        model.save()
+
+        self.assertEqual(self._read('feedbacks.json'), '{}')
+        self.assertEqual(json.loads(self._read('outcomes.json'))['outcomes'][
+                         TestDirtyTracking.SUBMISSION_1][
+                         TestDirtyTracking.STAGE_ID_1][
+                         TestDirtyTracking.OUTCOME_ID_1]['value'],
+                         2.0)
+
+    def test_config_change(self):
+        """Test that saving after only the configuration has changed writes the scores and marks calculated from the new configuration."""
+        section = 'stage_' + TestDirtyTracking.STAGE_ID_1
+        config.ini.add_section(section)
+
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestDirtyTracking.SUBMISSION_1,
+                          TestDirtyTracking.STAGE_ID_1,
+                          TestDirtyTracking.OUTCOME_ID_1,
+                          7.0)
+        model.save(True)
+
+        config.ini[section]['score_max'] = '6'
+        model.save()
+
+        self.assertIn('6.0', self._read('scores.csv'))
+
+        config.ini[section]['mark_max'] = '5'
+        model.save(True)
+
+        self.assertEqual(self._read('marks.csv').splitlines()[-1],
+                         f'{TestDirtyTracking.SUBMISSION_1},5.0,5.0')
+
+
+
+class TestCSV(_FileSystemModelTestCase):
+    def _create_scored_model(self):
+        model = self._create_model()
+        self._set_outcome(model,
+                          TestCSV.SUBMISSION_1,
+                          TestCSV.STAGE_ID_1,
+                          TestCSV.OUTCOME_ID_1,
+                          1.0)
+        self._set_outcome(model,
+                          TestCSV.SUBMISSION_1,
+                          TestCSV.STAGE_ID_1,
+                          TestCSV.OUTCOME_ID_2,
+                          2.0)
+        self._set_outcome(model,
+                          TestCSV.SUBMISSION_2,
+                          TestCSV.STAGE_ID_2,
+                          TestCSV.OUTCOME_ID_1,
+                          4.0)
+        return model
+
+    def _read_csv(self, file_name, opener = open):
+        with opener(self._get_path(file_name), 'rt', newline = '') as f:
+            return list(csv.reader(f))
+
+    def test_stage_layout(self):
+        """Test that the scores CSV has a column per stage, and a row per submission."""
+        model = self._create_scored_model()
+        model.save()
+
+        self.assertEqual(self._read_csv('scores.csv'),
+                         [['Test scores'],
+                          ['submission',
+                           TestCSV.STAGE_ID_1,
+                           TestCSV.STAGE_ID_2,
+                           'sum'],
+                          [TestCSV.SUBMISSION_1, '3.0', '', '3.0'],
+                          [TestCSV.SUBMISSION_2, '', '4.0', '4.0']])
+
+    def test_outcome_layout(self):
+        """Test that the scores CSV with the outcome layout has a column per outcome of each stage."""
+        config.ini.set('model_file', 'csv_layout', 'outcome')
+
+        model = self._create_scored_model()
+        model.save()
+
+        self.assertEqual(self._read_csv('scores.csv'),
+                         [['Test scores'],
+                          ['submission',
+                           TestCSV.STAGE_ID_1,
+                           '',
+                           TestCSV.STAGE_ID_2,
+                           'sum'],
+                          ['submission',
+                           TestCSV.OUTCOME_ID_1,
+                           TestCSV.OUTCOME_ID_2,
+                           TestCSV.OUTCOME_ID_1,
+                           'sum'],
+                          [TestCSV.SUBMISSION_1, '1.0', '2.0', '', '3.0'],
+                          [TestCSV.SUBMISSION_2, '', '', '4.0', '4.0']])
+
+    def test_unknown_layout(self):
+        """Test that an unknown layout is an error."""
+        model = self._create_scored_model()
+
+        with self.assertRaises(ValueError):
+            list(model._get_csv_rows(False, 'unknown'))
+
+    def test_gzip(self):
+        """Test that a CSV file whose name ends with .gz is compressed."""
+        config.ini.set('model_file',
+                       'file_scores',
+                       self._get_path('scores.csv.gz'))
+
+        model = self._create_scored_model()
+        model.save()
+
+        self.assertEqual(self._read_csv('scores.csv.gz', gzip.open)[2],
+                         [TestCSV.SUBMISSION_1, '3.0', '', '3.0'])
+
+    def test_unchanged(self):
+        """Test that a CSV file is only replaced if its contents change."""
+        model = self._create_scored_model()
+        model.save()
+
+        path = self._get_path('scores.csv')
+        os.utime(path, (0, 0))
+
+        # Storing the same outcome again doesn't change the scores
+        self._set_outcome(model,
+                          TestCSV.SUBMISSION_1,
+                          TestCSV.STAGE_ID_1,
+                          TestCSV.OUTCOME_ID_1,
+                          1.0)
+        model.save()
+
+        self.assertEqual(os.stat(path).st_mtime, 0)
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+        self._set_outcome(model,
+                          TestCSV.SUBMISSION_1,
+                          TestCSV.STAGE_ID_1,
+                          TestCSV.OUTCOME_ID_1,
+                          5.0)
+        model.save()
+
+        self.assertNotEqual(os.stat(path).st_mtime, 0)
+        self.assertEqual(self._read_csv('scores.csv')[2],
+                         [TestCSV.SUBMISSION_1, '7.0', '', '7.0'])
+
+
+
+
+class TestOutcomeSchema(_FileSystemModelTestCase):
+    SCALE = [['Poor', 0.0], ['Good', 1.0], ['Excellent', 2.0]]
+
+    def _set_scale(self, model, submission, key, explanation):
+        model.outcomes[submission][TestOutcomeSchema.STAGE_ID_1][
+            TestOutcomeSchema.OUTCOME_ID_1] = outcomes.Outcome(
+                outcome_id  = TestOutcomeSchema.OUTCOME_ID_1,
+                key         = key,
+                explanation = explanation,
+                value       = TestOutcomeSchema.SCALE[key][1],
+                all_values  = TestOutcomeSchema.SCALE)
+
+    def test_round_trip(self):
+        """Test that the elements shared by every submission are saved once in the outcome schema, and outcomes are loaded again with all their elements."""
+        model = self._create_model()
+        self._set_scale(model, TestOutcomeSchema.SUBMISSION_1, 1, 'Shared')
+        self._set_scale(model, TestOutcomeSchema.SUBMISSION_2, 2, 'Own')
+        model.save()
+
+        data = json.loads(self._read('outcomes.json'))
+        self.assertEqual(data['version'], fs.FileSystemModel.OUTCOMES_VERSION)
+        self.assertEqual(data['schema'],
+                         {TestOutcomeSchema.STAGE_ID_1: {
+                             TestOutcomeSchema.OUTCOME_ID_1: {
+                                 'explanation' : 'Shared',
+                                 'all_values'  : TestOutcomeSchema.SCALE}}})
+
+        # only elements that differ from the schema are saved with an outcome
+        records = [data['outcomes'][submission][TestOutcomeSchema.STAGE_ID_1][
+                       TestOutcomeSchema.OUTCOME_ID_1]
+                   for submission in [TestOutcomeSchema.SUBMISSION_1,
+                                      TestOutcomeSchema.SUBMISSION_2]]
+        self.assertEqual(records[0],
+                         {'key': 1, 'value': 1.0, 'user_input': False})
+        self.assertEqual(records[1],
+                         {'key': 2, 'value': 2.0, 'user_input': False,
+                          'explanation': 'Own'})
+
+        model = self._create_model()
+
+        loaded = [model.outcomes[submission][TestOutcomeSchema.STAGE_ID_1][
+                      TestOutcomeSchema.OUTCOME_ID_1]
+                  for submission in [TestOutcomeSchema.SUBMISSION_1,
+                                     TestOutcomeSchema.SUBMISSION_2]]
+        for outcome, key, explanation in zip(loaded, [1, 2],
+                                             ['Shared', 'Own']):
+            self.assertEqual(outcome['key'], key)
+            self.assertEqual(outcome['value'], float(key))
+            self.assertEqual(outcome['explanation'], explanation)
+            self.assertEqual(outcome['all_values'], TestOutcomeSchema.SCALE)
+
+        # submissions share the schema's copy of the scale
+        self.assertIs(loaded[0]['all_values'], loaded[1]['all_values'])
+
+        # saving the loaded outcomes again doesn't change them
+        model.save()
+        self.assertEqual(json.loads(self._read('outcomes.json')), data)
+
+    def test_load_legacy(self):
+        """Test that an outcomes file without a version, in which every outcome has all its elements, is loaded, and is saved with an outcome schema."""
+        legacy = {
+            TestOutcomeSchema.SUBMISSION_1: {
+                TestOutcomeSchema.STAGE_ID_1: {
+                    TestOutcomeSchema.OUTCOME_ID_1: {
+                        'outcome_id'  : TestOutcomeSchema.OUTCOME_ID_1,
+                        'key'         : 0,
+                        'explanation' : 'An explanation',
+                        'value'       : 0.0,
+                        'all_values'  : TestOutcomeSchema.SCALE,
+                        'user_input'  : False},
+                    TestOutcomeSchema.OUTCOME_ID_2: {
+                        'outcome_id'  : TestOutcomeSchema.OUTCOME_ID_2,
+                        'explanation' : 'Entered by the user',
+                        'value'       : 3.5,
+                        'user_input'  : True}}}}
+
+        with open(self._get_path('outcomes.json'), 'w') as f:
+            json.dump(legacy, f)
+
+        model = self._create_model()
+
+        stage_outcomes = model.outcomes[TestOutcomeSchema.SUBMISSION_1][
+            TestOutcomeSchema.STAGE_ID_1]
+        outcome = stage_outcomes[TestOutcomeSchema.OUTCOME_ID_1]
+        self.assertEqual(outcome['key'], 0)
+        self.assertEqual(outcome['explanation'], 'An explanation')
+        self.assertEqual(outcome['all_values'], TestOutcomeSchema.SCALE)
+
+        outcome = stage_outcomes[TestOutcomeSchema.OUTCOME_ID_2]
+        self.assertEqual(outcome['value'], 3.5)
+        self.assertTrue(outcome['user_input'])
+        self.assertEqual(stage_outcomes.score, 3.5)
+
+        # A file in the old format is replaced once the outcomes change
+        self._set_outcome(model,
+                          TestOutcomeSchema.SUBMISSION_2,
+                          TestOutcomeSchema.STAGE_ID_2,
+                          TestOutcomeSchema.OUTCOME_ID_1,
+                          1.0)
+        model.save()
+
+        data = json.loads(self._read('outcomes.json'))
+        self.assertEqual(data['version'], fs.FileSystemModel.OUTCOMES_VERSION)
+        self.assertEqual(
+            data['schema'][TestOutcomeSchema.STAGE_ID_1][
+                TestOutcomeSchema.OUTCOME_ID_1]['explanation'],
+            'An explanation')
+
+        model = self._create_model()
+        self.assertEqual(model.outcomes[TestOutcomeSchema.SUBMISSION_1][
+                             TestOutcomeSchema.STAGE_ID_1].score,
+                         3.5)
+
+
+
+
+class _View(object):
+    ALERT_HALT = 'halt'
+
+    def __init__(self):
+        """Stand-in for a view, which keeps the alerts that are shown."""
+        self.alerts = []
+
+    def show_progress(self, title, done, total):
+        pass
+
+    def show_alert(self, title, text, alert_type = None):
+        self.alerts.append((title, text))
+
+    def quit(self):
+        pass
+
+
+
+class TestFinalFeedbacks(_FileSystemModelTestCase):
+    def _create_feedback_model(self):
+        model = self._create_model()
+        for submission in [TestFinalFeedbacks.SUBMISSION_1,
+                           TestFinalFeedbacks.SUBMISSION_2]:
+            model.feedbacks[submission][TestFinalFeedbacks.STAGE_ID_1][
+                TestFinalFeedbacks.FEEDBACK_ID] = \
+                    TestFinalFeedbacks.FEEDBACK_VAL + ' for ' + submission
+        return model
+
+    def _get_final_path(self, submission):
+        return self._get_path(submission + '.txt')
+
+    def test_render(self):
+        """Test that finalising generates the final feedback of each submission, and lists it in the manifest."""
+        model = self._create_feedback_model()
+        model.save(force_finalise = True)
+
+        self.assertEqual(model.finalise_report,
+                         {'rendered': 2, 'skipped': 0, 'deleted': 0})
+        self.assertIn(TestFinalFeedbacks.FEEDBACK_VAL + ' for ' +
+                      TestFinalFeedbacks.SUBMISSION_1,
+                      self._read(TestFinalFeedbacks.SUBMISSION_1 + '.txt'))
+
+        manifest = json.loads(self._read('finalised.json'))
+        self.assertEqual(manifest['version'],
+                         fs.FileSystemModel.MANIFEST_VERSION)
+        self.assertEqual(sorted(manifest['feedbacks']),
+                         [TestFinalFeedbacks.SUBMISSION_1,
+                          TestFinalFeedbacks.SUBMISSION_2])
+
+    def test_unchanged_skipped(self):
+        """Test that the final feedback of a submission that hasn't changed isn't generated again, even by another session."""
+        self._create_feedback_model().save(force_finalise = True)
+
+        for submission in [TestFinalFeedbacks.SUBMISSION_1,
+                           TestFinalFeedbacks.SUBMISSION_2]:
+            os.utime(self._get_final_path(submission), (0, 0))
+
+        model = self._create_model()
+        model.feedbacks[TestFinalFeedbacks.SUBMISSION_1][
+            TestFinalFeedbacks.STAGE_ID_1][TestFinalFeedbacks.FEEDBACK_ID] = \
+                'Changed feedback'
+        model.save(force_finalise = True)
+
+        self.assertEqual(model.finalise_report,
+                         {'rendered': 1, 'skipped': 1, 'deleted': 0})
+        self.assertIn('Changed feedback',
+                      self._read(TestFinalFeedbacks.SUBMISSION_1 + '.txt'))
+        self.assertEqual(os.stat(self._get_final_path(
+                             TestFinalFeedbacks.SUBMISSION_2)).st_mtime,
+                         0)
+
+        # a file that has gone missing is generated again
+        os.remove(self._get_final_path(TestFinalFeedbacks.SUBMISSION_2))
+        model.save(force_finalise = True)
+
+        self.assertEqual(model.finalise_report,
+                         {'rendered': 1, 'skipped': 1, 'deleted': 0})
+        self.assertTrue(os.path.exists(
+            self._get_final_path(TestFinalFeedbacks.SUBMISSION_2)))
+
+    def test_removed_deleted(self):
+        """Test that the final feedback of a submission that is no longer in the model is deleted, and removed from the manifest."""
+        model = self._create_feedback_model()
+        model.save(force_finalise = True)
+
+        del model.feedbacks[TestFinalFeedbacks.SUBMISSION_2]
+        model.save(force_finalise = True)
+
+        self.assertEqual(model.finalise_report,
+                         {'rendered': 0, 'skipped': 1, 'deleted': 1})
+        self.assertFalse(os.path.exists(
+            self._get_final_path(TestFinalFeedbacks.SUBMISSION_2)))
+
+        manifest = json.loads(self._read('finalised.json'))
+        self.assertEqual(list(manifest['feedbacks']),
+                         [TestFinalFeedbacks.SUBMISSION_1])
+
+    def test_report(self):
+        """Test that the number of files generated, unchanged and deleted when finalising is shown once marks are saved."""
+        model = self._create_feedback_model()
+        model.save(force_finalise = True)
+        del model.feedbacks[TestFinalFeedbacks.SUBMISSION_2]
+
+        controller = marker.Controller()
+        controller.model = model
+        controller.view  = _View()
+        controller.save_and_close()
+
+        self.assertEqual(controller.view.alerts,
+                         [('Marks saved',
+                           '0 feedback files were generated, 1 were '
+                           'unchanged and 1 were deleted.')])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -556,6 +556,39 @@ class TestFeedbacksModel(unittest.TestCase):
         expected_value += TestFeedbacksModel.FEEDBACK_VAL_4 + ' \n\n'
         self.assertEquals(str(fbs), expected_value)
 
+    def test_feedbacks_move(self):
+        """Test that storing a Feedbacks object under a new stage identifier moves it, but equal feedback strings are stored under both identifiers."""
+        fb_1 = feedbacks.Feedbacks(root_model     = None,
+                                   parent_data_id = TestFeedbacksModel.STAGE_ID_1)
+
+        config.ini.clear()
+
+        # Equal strings are separate pieces of feedback
+        fb_1[TestFeedbacksModel.FEEDBACK_ID_1] = \
+             TestFeedbacksModel.FEEDBACK_VAL_1
+        fb_1[TestFeedbacksModel.FEEDBACK_ID_2] = \
+             TestFeedbacksModel.FEEDBACK_VAL_1
+
+        self.assertEqual(len(fb_1), 2)
+
+        fbs = feedbacks.FeedbackByStage(
+                            root_model     = None,
+                            parent_data_id = TestFeedbacksModel.SUBMISSION_1)
+
+        fbs[TestFeedbacksModel.STAGE_ID_1] = fb_1
+        fbs[TestFeedbacksModel.STAGE_ID_2] = fb_1
+
+        self.assertEqual(list(fbs.keys()), [TestFeedbacksModel.STAGE_ID_2])
+        self.assertEqual(fb_1.stage_id, TestFeedbacksModel.STAGE_ID_2)
+
+        # Storing a new object under the old identifier doesn't move fb_1
+        fb_2 = feedbacks.Feedbacks(root_model     = None,
+                                   parent_data_id = TestFeedbacksModel.STAGE_ID_1)
+        fbs[TestFeedbacksModel.STAGE_ID_1] = fb_2
+
+        self.assertEqual(len(fbs), 2)
+        self.assertIs(fbs[TestFeedbacksModel.STAGE_ID_2], fb_1)
+
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from pyfeedbacker.app import config, stage, workspace
+from pyfeedbacker.app.controller import prefetch
+
+
+
+class _ResultHandler(stage.HandlerBase):
+    def run(self):
+        """A stage that returns its result."""
+        self.ran = True
+        return stage.StageResult(stage.StageResult.RESULT_PASS)
+
+
+
+class _NoResultHandler(stage.HandlerBase):
+    def run(self):
+        """A stage that reports its result to the controller itself."""
+        return None
+
+
+
+class TestSubmissionPrefetch(unittest.TestCase):
+    SUBMISSION = 'submission_1234'
+    HANDLERS   = {'a': _ResultHandler,
+                  'b': _NoResultHandler,
+                  'c': _ResultHandler}
+
+    def setUp(self):
+        self.dir_temp = tempfile.mkdtemp()
+
+        config.ini.clear()
+        config.ini.read_dict({
+            'app': {
+                'dir_temp'        : self.dir_temp,
+                'dir_submissions' : self.dir_temp},
+            'assessment': {
+                'stages'          : 'a,b,c'}})
+
+    def tearDown(self):
+        workspace.workspaces.release(TestSubmissionPrefetch.SUBMISSION)
+        shutil.rmtree(self.dir_temp, ignore_errors = True)
+
+    def _prefetch(self):
+        with unittest.mock.patch.object(
+                stage.StageInfo,
+                'import_handler',
+                TestSubmissionPrefetch.HANDLERS.__getitem__):
+            submission_prefetch = prefetch.SubmissionPrefetch(
+                TestSubmissionPrefetch.SUBMISSION,
+                list(TestSubmissionPrefetch.HANDLERS))
+            submission_prefetch.start()
+            submission_prefetch.join()
+
+        return submission_prefetch
+
+    def test_pop(self):
+        """Test that the result of a stage is taken with the handler that executed it, and only once."""
+        submission_prefetch = self._prefetch()
+
+        instance, result = submission_prefetch.pop('a')
+        self.assertTrue(instance.ran)
+        self.assertEqual(result.result, stage.StageResult.RESULT_PASS)
+
+        self.assertIsNone(submission_prefetch.pop('a'))
+
+    def test_no_result(self):
+        """Test that a stage that doesn't return a result isn't prefetched, and neither are the stages that depend on it."""
+        submission_prefetch = self._prefetch()
+
+        self.assertIsNone(submission_prefetch.pop('b'))
+        self.assertIsNone(submission_prefetch.pop('c'))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
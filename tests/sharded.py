@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import unittest
+
+from pyfeedbacker.app import config
+from pyfeedbacker.app.model import outcomes, sharded
+from tests import base
+
+
+
+class TestShardedModel(base.ModelTestCase):
+    MODEL_TYPE   = sharded.ShardedFileSystemModel
+
+    STAGE_ID     = 'stage_id_1'
+    OUTCOME_ID   = 'outcome_id_1'
+    FEEDBACK_ID  = 'feedback_id_1'
+    FEEDBACK_VAL = 'Some feedback'
+
+    SUBMISSION_1 = 'submission_1234'
+    SUBMISSION_2 = 'submission_5678'
+
+    def setUp(self):
+        super().setUp()
+
+        config.ini.clear()
+        config.ini.read_dict({
+            'model_file': {
+                'file_feedbacks'      : self._get_path('feedbacks.json'),
+                'file_outcomes'       : self._get_path('outcomes.json'),
+                'file_outcomes_marks' : self._get_path('weights.json'),
+                'file_journal'        : self._get_path('journal.jsonl')},
+            'model_sharded': {
+                'dir_shards'          : self._get_path('submissions'),
+                'file_manifest'       : self._get_path('manifest.json'),
+                'file_schema'         : self._get_path('schema.json')}})
+
+    def _set_score(self, model, submission, value):
+        model.outcomes[submission][TestShardedModel.STAGE_ID][
+            TestShardedModel.OUTCOME_ID] = outcomes.Outcome(
+                outcome_id  = TestShardedModel.OUTCOME_ID,
+                explanation = 'A sample explanation',
+                value       = value)
+
+    def _save_two_submissions(self):
+        model = self._create_model()
+        self._set_score(model, TestShardedModel.SUBMISSION_1, 1.0)
+        self._set_score(model, TestShardedModel.SUBMISSION_2, 2.0)
+        model.feedbacks[TestShardedModel.SUBMISSION_1][
+            TestShardedModel.STAGE_ID][TestShardedModel.FEEDBACK_ID] = \
+                TestShardedModel.FEEDBACK_VAL
+        model.save()
+
+    def test_save_shards(self):
+        """Test that each submission is saved in a directory of its own, and listed in the manifest with its score."""
+        self._save_two_submissions()
+
+        for submission in [TestShardedModel.SUBMISSION_1,
+                           TestShardedModel.SUBMISSION_2]:
+            self.assertTrue(os.path.isfile(self._get_path(
+                os.path.join('submissions', submission, 'outcomes.json'))))
+
+        with open(self._get_path('manifest.json')) as f:
+            manifest = json.load(f)
+
+        self.assertEqual(manifest['scores'],
+                         {TestShardedModel.SUBMISSION_1: 1.0,
+                          TestShardedModel.SUBMISSION_2: 2.0})
+
+    def test_lazy_load(self):
+        """Test that submissions are listed without being loaded, and are loaded when first accessed."""
+        self._save_two_submissions()
+
+        model = self._create_model()
+
+        self.assertEqual(list(model.outcomes.keys()),
+                         [TestShardedModel.SUBMISSION_1,
+                          TestShardedModel.SUBMISSION_2])
+        self.assertFalse(
+            model.outcomes.is_loaded(TestShardedModel.SUBMISSION_1))
+        self.assertFalse(
+            model.feedbacks.is_loaded(TestShardedModel.SUBMISSION_1))
+
+        self.assertEqual(model.outcomes[TestShardedModel.SUBMISSION_1].score,
+                         1.0)
+        self.assertTrue(
+            model.outcomes.is_loaded(TestShardedModel.SUBMISSION_1))
+        self.assertFalse(
+            model.outcomes.is_loaded(TestShardedModel.SUBMISSION_2))
+
+        self.assertEqual(str(model.feedbacks[TestShardedModel.SUBMISSION_1][
+                             TestShardedModel.STAGE_ID][
+                             TestShardedModel.FEEDBACK_ID]),
+                         TestShardedModel.FEEDBACK_VAL)
+
+        # Loading a submission isn't a change
+        self.assertFalse(model._is_dirty('outcomes'))
+        self.assertFalse(model._is_dirty('feedbacks'))
+
+    def test_save_loaded_only(self):
+        """Test that saving only writes the submissions that have changed."""
+        self._save_two_submissions()
+
+        model = self._create_model()
+        self._set_score(model, TestShardedModel.SUBMISSION_1, 3.0)
+
+        path_2 = self._get_path(os.path.join(
+            'submissions', TestShardedModel.SUBMISSION_2, 'outcomes.json'))
+        os.remove(path_2)
+
+        model.save()
+
+        self.assertFalse(os.path.exists(path_2))
+        self.assertFalse(
+            model.outcomes.is_loaded(TestShardedModel.SUBMISSION_2))
+
+        model = self._create_model()
+        self.assertEqual(model.outcomes[TestShardedModel.SUBMISSION_1].score,
+                         3.0)
+
+    def test_schema(self):
+        """Test that the explanation of an outcome is saved once in the schema file, not in the file of each submission, and is loaded again."""
+        self._save_two_submissions()
+
+        with open(self._get_path('schema.json')) as f:
+            self.assertEqual(json.load(f)[TestShardedModel.STAGE_ID][
+                                 TestShardedModel.OUTCOME_ID]['explanation'],
+                             'A sample explanation')
+
+        with open(self._get_path(os.path.join(
+                'submissions', TestShardedModel.SUBMISSION_1,
+                'outcomes.json'))) as f:
+            self.assertNotIn('explanation',
+                             json.load(f)[TestShardedModel.STAGE_ID][
+                                 TestShardedModel.OUTCOME_ID])
+
+        model = self._create_model()
+        self.assertEqual(model.outcomes[TestShardedModel.SUBMISSION_2][
+                             TestShardedModel.STAGE_ID][
+                             TestShardedModel.OUTCOME_ID]['explanation'],
+                         'A sample explanation')
+
+    def test_load_legacy(self):
+        """Test that the file of a submission saved before there was a schema file, in which every outcome has all its elements, is loaded."""
+        self._save_two_submissions()
+
+        os.remove(self._get_path('schema.json'))
+        with open(self._get_path(os.path.join(
+                'submissions', TestShardedModel.SUBMISSION_1,
+                'outcomes.json')), 'w') as f:
+            json.dump({TestShardedModel.STAGE_ID: {
+                           TestShardedModel.OUTCOME_ID: {
+                               'outcome_id'  : TestShardedModel.OUTCOME_ID,
+                               'key'         : None,
+                               'explanation' : 'An explanation',
+                               'value'       : 4.0,
+                               'all_values'  : None,
+                               'user_input'  : False}}}, f)
+
+        model = self._create_model()
+
+        outcome = model.outcomes[TestShardedModel.SUBMISSION_1][
+            TestShardedModel.STAGE_ID][TestShardedModel.OUTCOME_ID]
+        self.assertEqual(outcome['value'], 4.0)
+        self.assertEqual(outcome['explanation'], 'An explanation')
+
+    def test_get_scores(self):
+        """Test that the scores of submissions that haven't been loaded are taken from the manifest, without loading them."""
+        self._save_two_submissions()
+
+        model = self._create_model()
+        self._set_score(model, TestShardedModel.SUBMISSION_1, 3.0)
+
+        self.assertEqual(model.get_scores(),
+                         {TestShardedModel.SUBMISSION_1: 3.0,
+                          TestShardedModel.SUBMISSION_2: 2.0})
+        self.assertFalse(
+            model.outcomes.is_loaded(TestShardedModel.SUBMISSION_2))
+
+    def test_get_scores_config_change(self):
+        """Test that the scores in the manifest aren't used once the configuration has changed, as they may no longer be correct."""
+        self._save_two_submissions()
+
+        model = self._create_model()
+        config.ini.read_dict({'assessment': {'score_max': '1.5'}})
+
+        self.assertEqual(model.get_scores(),
+                         {TestShardedModel.SUBMISSION_1: 1.0,
+                          TestShardedModel.SUBMISSION_2: 1.5})
+        self.assertTrue(
+            model.outcomes.is_loaded(TestShardedModel.SUBMISSION_2))
+
+    def test_is_marked(self):
+        """Test that whether a submission has a score or feedback is taken from the manifest, without loading it."""
+        self._save_two_submissions()
+
+        model = self._create_model()
+        self._set_score(model, TestShardedModel.SUBMISSION_2, 0.0)
+        model.save()
+
+        model = self._create_model()
+
+        self.assertTrue(model.is_marked(TestShardedModel.SUBMISSION_1))
+        self.assertFalse(model.is_marked(TestShardedModel.SUBMISSION_2))
+        self.assertFalse(model.is_marked('submission_0000'))
+        self.assertFalse(
+            model.outcomes.is_loaded(TestShardedModel.SUBMISSION_1))
+        self.assertFalse(
+            model.feedbacks.is_loaded(TestShardedModel.SUBMISSION_1))
+        self.assertFalse(
+            model.outcomes.is_loaded(TestShardedModel.SUBMISSION_2))
+        self.assertFalse(
+            model.feedbacks.is_loaded(TestShardedModel.SUBMISSION_2))
+
+    def test_is_marked_feedback_only(self):
+        """Test that a submission with feedback but no score is marked, without loading it."""
+        model = self._create_model()
+        model.feedbacks[TestShardedModel.SUBMISSION_1][
+            TestShardedModel.STAGE_ID][TestShardedModel.FEEDBACK_ID] = \
+                TestShardedModel.FEEDBACK_VAL
+        model.save()
+
+        model = self._create_model()
+
+        self.assertTrue(model.is_marked(TestShardedModel.SUBMISSION_1))
+        self.assertFalse(
+            model.feedbacks.is_loaded(TestShardedModel.SUBMISSION_1))
+
+    def test_get_scores_list_manifest(self):
+        """Test that submissions in a manifest without scores are loaded to retrieve their scores."""
+        self._save_two_submissions()
+
+        with open(self._get_path('manifest.json'), 'w') as f:
+            json.dump([TestShardedModel.SUBMISSION_1,
+                       TestShardedModel.SUBMISSION_2], f)
+
+        model = self._create_model()
+
+        self.assertEqual(model.get_scores(),
+                         {TestShardedModel.SUBMISSION_1: 1.0,
+                          TestShardedModel.SUBMISSION_2: 2.0})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
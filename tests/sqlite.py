@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+import unittest
+
+from pyfeedbacker.app import config
+from pyfeedbacker.app.model import outcomes, sqlite
+from tests import base
+
+
+
+class TestSQLiteModel(base.ModelTestCase):
+    MODEL_TYPE   = sqlite.SQLiteModel
+
+    STAGE_ID     = 'stage_id_1'
+    OUTCOME_ID   = 'outcome_id_1'
+    FEEDBACK_ID  = 'feedback_id_1'
+    FEEDBACK_VAL = 'Some feedback'
+    MARK         = 2.5
+
+    SUBMISSION_1 = 'submission_1234'
+    SUBMISSION_2 = 'submission_5678'
+
+    def setUp(self):
+        super().setUp()
+
+        config.ini.clear()
+        config.ini.read_dict({
+            'model_sqlite': {
+                'file_database' : self._get_path('model.db')}})
+
+    def _close_model(self, model):
+        model._db.close()
+
+    def _set_score(self, model, submission, value):
+        model.outcomes[submission][TestSQLiteModel.STAGE_ID][
+            TestSQLiteModel.OUTCOME_ID] = outcomes.Outcome(
+                outcome_id  = TestSQLiteModel.OUTCOME_ID,
+                explanation = 'A sample explanation',
+                value       = value)
+
+    def _get_rows(self, table, column):
+        with sqlite3.connect(self._get_path('model.db')) as db:
+            return {data_id: json.loads(data) for data_id, data in
+                    db.execute(f'SELECT {column}, data FROM {table}')}
+
+    def test_save_load(self):
+        """Test that outcomes, feedbacks and marks saved to the database are loaded again."""
+        model = self._create_model()
+        self._set_score(model, TestSQLiteModel.SUBMISSION_1, 1.0)
+        self._set_score(model, TestSQLiteModel.SUBMISSION_2, 2.0)
+        model.feedbacks[TestSQLiteModel.SUBMISSION_1][
+            TestSQLiteModel.STAGE_ID][TestSQLiteModel.FEEDBACK_ID] = \
+                TestSQLiteModel.FEEDBACK_VAL
+        model.marks[TestSQLiteModel.STAGE_ID][TestSQLiteModel.OUTCOME_ID] = \
+            TestSQLiteModel.MARK
+        model.save()
+
+        model = self._create_model()
+
+        self.assertEqual(list(model.outcomes.keys()),
+                         [TestSQLiteModel.SUBMISSION_1,
+                          TestSQLiteModel.SUBMISSION_2])
+        self.assertEqual(model.outcomes[TestSQLiteModel.SUBMISSION_2].score,
+                         2.0)
+
+        outcome = model.outcomes[TestSQLiteModel.SUBMISSION_1][
+            TestSQLiteModel.STAGE_ID][TestSQLiteModel.OUTCOME_ID]
+        self.assertEqual(outcome['value'], 1.0)
+        self.assertEqual(outcome['explanation'], 'A sample explanation')
+
+        self.assertEqual(str(model.feedbacks[TestSQLiteModel.SUBMISSION_1][
+                             TestSQLiteModel.STAGE_ID][
+                             TestSQLiteModel.FEEDBACK_ID]),
+                         TestSQLiteModel.FEEDBACK_VAL)
+        self.assertEqual(model.marks[TestSQLiteModel.STAGE_ID][
+                         TestSQLiteModel.OUTCOME_ID],
+                         TestSQLiteModel.MARK)
+
+        # Loading the model isn't a change
+        self.assertFalse(model._is_dirty('outcomes'))
+
+    def test_save_changed_rows(self):
+        """Test that saving only writes the rows of submissions that have changed."""
+        model = self._create_model()
+        self._set_score(model, TestSQLiteModel.SUBMISSION_1, 1.0)
+        self._set_score(model, TestSQLiteModel.SUBMISSION_2, 2.0)
+        model.save()
+
+        # A row changed outside the model is only replaced if it changes
+        with sqlite3.connect(self._get_path('model.db')) as db:
+            db.execute('UPDATE outcomes SET data = ? WHERE submission = ?',
+                       ('{}', TestSQLiteModel.SUBMISSION_2))
+
+        self._set_score(model, TestSQLiteModel.SUBMISSION_1, 3.0)
+        model.save()
+
+        rows = self._get_rows('outcomes', 'submission')
+        self.assertEqual(rows[TestSQLiteModel.SUBMISSION_2], {})
+        self.assertNotEqual(rows[TestSQLiteModel.SUBMISSION_1], {})
+
+    def test_delete(self):
+        """Test that deleting a submission deletes its row."""
+        model = self._create_model()
+        self._set_score(model, TestSQLiteModel.SUBMISSION_1, 1.0)
+        self._set_score(model, TestSQLiteModel.SUBMISSION_2, 2.0)
+        model.save()
+
+        del model.outcomes[TestSQLiteModel.SUBMISSION_1]
+        model.save()
+
+        self.assertEqual(list(self._get_rows('outcomes', 'submission')),
+                         [TestSQLiteModel.SUBMISSION_2])
+
+    def test_clear(self):
+        """Test that clearing a model replaces the whole table."""
+        model = self._create_model()
+        self._set_score(model, TestSQLiteModel.SUBMISSION_1, 1.0)
+        model.save()
+
+        model.outcomes.clear()
+        self._set_score(model, TestSQLiteModel.SUBMISSION_2, 2.0)
+        model.save()
+
+        self.assertEqual(list(self._get_rows('outcomes', 'submission')),
+                         [TestSQLiteModel.SUBMISSION_2])
+
+    def test_schema(self):
+        """Test that the explanation of an outcome is saved once in the schema table, not in the row of each submission."""
+        model = self._create_model()
+        self._set_score(model, TestSQLiteModel.SUBMISSION_1, 1.0)
+        self._set_score(model, TestSQLiteModel.SUBMISSION_2, 2.0)
+        model.save()
+
+        self.assertEqual(
+            self._get_rows('schema', 'stage_id'),
+            {TestSQLiteModel.STAGE_ID: {TestSQLiteModel.OUTCOME_ID: {
+                'explanation' : 'A sample explanation',
+                'all_values'  : None}}})
+        self.assertNotIn('explanation',
+                         self._get_rows('outcomes', 'submission')[
+                             TestSQLiteModel.SUBMISSION_1][
+                             TestSQLiteModel.STAGE_ID][
+                             TestSQLiteModel.OUTCOME_ID])
+
+    def test_load_legacy(self):
+        """Test that rows saved before there was a schema table, in which every outcome has all its elements, are loaded."""
+        with sqlite3.connect(self._get_path('model.db')) as db:
+            db.execute('CREATE TABLE outcomes ('
+                       'submission TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            db.execute('INSERT INTO outcomes (submission, data) '
+                       'VALUES (?, ?)',
+                       (TestSQLiteModel.SUBMISSION_1, json.dumps({
+                           TestSQLiteModel.STAGE_ID: {
+                               TestSQLiteModel.OUTCOME_ID: {
+                                   'outcome_id'  : TestSQLiteModel.OUTCOME_ID,
+                                   'key'         : None,
+                                   'explanation' : 'An explanation',
+                                   'value'       : 1.5,
+                                   'all_values'  : None,
+                                   'user_input'  : False}}})))
+        db.close()
+
+        model = self._create_model()
+
+        outcome = model.outcomes[TestSQLiteModel.SUBMISSION_1][
+            TestSQLiteModel.STAGE_ID][TestSQLiteModel.OUTCOME_ID]
+        self.assertEqual(outcome['value'], 1.5)
+        self.assertEqual(outcome['explanation'], 'An explanation')
+
+
+
+if __name__ == '__main__':
+    unittest.main()
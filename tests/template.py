@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from pyfeedbacker.app import template
+
+
+
+class TestTemplate(unittest.TestCase):
+    TEXT = 'Score: ##score## out of ##score_max##.\n'
+
+    def test_render(self):
+        """Test that every placeholder is replaced with its value, and values are converted to strings."""
+        tmpl = template.compile(TestTemplate.TEXT)
+
+        self.assertEqual(tmpl.names, {'score', 'score_max'})
+
+        text, unknown = tmpl.render({'score': 7.5, 'score_max': 10})
+        self.assertEqual(text, 'Score: 7.5 out of 10.\n')
+        self.assertEqual(unknown, set())
+
+    def test_render_unknown(self):
+        """Test that placeholders without a value are left as they are and reported."""
+        tmpl = template.compile(TestTemplate.TEXT)
+
+        text, unknown = tmpl.render({'score': 7.5})
+        self.assertEqual(text, 'Score: 7.5 out of ##score_max##.\n')
+        self.assertEqual(unknown, {'score_max'})
+
+    def test_render_stage_id(self):
+        """Test that placeholder names may contain characters that aren't in words (e.g., stage identifiers with hyphens), but not whitespace."""
+        tmpl = template.compile('##stage_my-stage_mark## ## not one ##')
+
+        self.assertEqual(tmpl.names, {'stage_my-stage_mark'})
+
+        text, unknown = tmpl.render({})
+        self.assertEqual(text, '##stage_my-stage_mark## ## not one ##')
+        self.assertEqual(unknown, {'stage_my-stage_mark'})
+
+        text, unknown = tmpl.render({'stage_my-stage_mark': 3})
+        self.assertEqual(text, '3 ## not one ##')
+        self.assertEqual(unknown, set())
+
+    def test_compile_cached(self):
+        """Test that compiling the same text twice returns the same template."""
+        self.assertIs(template.compile(TestTemplate.TEXT),
+                      template.compile(TestTemplate.TEXT))
+
+    def test_compile_pieces(self):
+        """Test that a template compiled from pieces renders the same as one compiled from the whole text."""
+        pieces = ['Hello ##name##', ', you scored ', '##score##.']
+        data   = {'name': 'Student', 'score': 5}
+
+        self.assertEqual(template.compile_pieces(pieces).render(data),
+                         template.compile(''.join(pieces)).render(data))
+
+        tmpl = template.compile_pieces([])
+        self.assertEqual(tmpl.render(data), ('', set()))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+from pyfeedbacker.app import config, workspace
+from pyfeedbacker.stages import init
+
+
+
+class TestWorkspaceManager(unittest.TestCase):
+    SUBMISSIONS = ['submission_1', 'submission_2', 'submission_3']
+
+    def setUp(self):
+        self.dir_temp = tempfile.mkdtemp()
+
+        config.ini.clear()
+        config.ini.add_section('app')
+        config.ini.set('app', 'dir_temp', self.dir_temp)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_temp, ignore_errors = True)
+
+    def _get_workspaces(self):
+        return sorted(name for name in os.listdir(self.dir_temp)
+                      if not name.startswith('.'))
+
+    def _wait_for_trash(self):
+        trash = os.path.join(self.dir_temp, '.trash')
+        for attempt in range(1000):
+            if not os.path.isdir(trash) or len(os.listdir(trash)) == 0:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_release(self):
+        """Test that releasing a workspace removes it, and only it, so workspaces in use by other processes are never removed."""
+        manager = workspace.WorkspaceManager()
+
+        for submission in TestWorkspaceManager.SUBMISSIONS[:2]:
+            path = manager.acquire(submission)
+            with open(os.path.join(path, 'file'), 'w') as f:
+                f.write(submission)
+
+        # a workspace acquired by another process
+        os.makedirs(os.path.join(self.dir_temp,
+                                 TestWorkspaceManager.SUBMISSIONS[2]))
+
+        manager.release(TestWorkspaceManager.SUBMISSIONS[0])
+
+        self.assertEqual(self._get_workspaces(),
+                         TestWorkspaceManager.SUBMISSIONS[1:])
+        self.assertTrue(self._wait_for_trash())
+
+    def test_acquire_new(self):
+        """Test that acquiring the workspace of a submission after it was released creates a new, empty workspace."""
+        manager = workspace.WorkspaceManager()
+
+        path = manager.acquire(TestWorkspaceManager.SUBMISSIONS[0])
+        with open(os.path.join(path, 'file'), 'w') as f:
+            f.write(TestWorkspaceManager.SUBMISSIONS[0])
+        manager.release(TestWorkspaceManager.SUBMISSIONS[0])
+
+        path = manager.acquire(TestWorkspaceManager.SUBMISSIONS[0])
+
+        self.assertEqual(os.listdir(path), [])
+
+    def test_remove(self):
+        """Test that removing a workspace moves it out of the way straight away, so its path can be reused, and deletes it in the background."""
+        manager = workspace.WorkspaceManager()
+
+        path = manager.acquire(TestWorkspaceManager.SUBMISSIONS[0])
+        with open(os.path.join(path, 'file'), 'w') as f:
+            f.write(TestWorkspaceManager.SUBMISSIONS[0])
+
+        manager.remove(path)
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(manager.acquire(TestWorkspaceManager.SUBMISSIONS[0]),
+                         path)
+        self.assertEqual(os.listdir(path), [])
+        self.assertTrue(self._wait_for_trash())
+
+    def test_sweep(self):
+        """Test that anything left in the trash by an earlier run is deleted."""
+        trash = os.path.join(self.dir_temp, '.trash', 'submission_1-old')
+        os.makedirs(trash)
+
+        manager = workspace.WorkspaceManager()
+        manager.sweep()
+
+        self.assertTrue(self._wait_for_trash())
+
+
+
+
+class TestStageTree(unittest.TestCase):
+    STAGE_ID = 'init'
+    FILES    = {'a.txt'                       : b'a',
+                os.path.join('sub', 'b.txt')  : b'b',
+                'build.log'                   : b'log'}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.src_dir   = os.path.join(self.directory, 'src')
+        self.dst_dir   = os.path.join(self.directory, 'dst')
+
+        for path, data in TestStageTree.FILES.items():
+            path = os.path.join(self.src_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            with open(path, 'wb') as f:
+                f.write(data)
+
+        config.ini.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors = True)
+
+    def _stage_tree(self):
+        instance = init.StageInit(TestStageTree.STAGE_ID)
+        instance._stage_tree(self.src_dir, self.dst_dir)
+
+        linked = set()
+        for path, data in TestStageTree.FILES.items():
+            src_file = os.path.join(self.src_dir, path)
+            dst_file = os.path.join(self.dst_dir, path)
+
+            with open(dst_file, 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+            if os.path.samefile(src_file, dst_file):
+                linked.add(path)
+
+        return linked
+
+    def _set_staging(self, staging, writable = ''):
+        config.ini.read_dict({
+            'stage_' + TestStageTree.STAGE_ID: {
+                'staging'  : staging,
+                'writable' : writable}})
+
+    def test_copy(self):
+        """Test that files are copied if the stage has no configuration."""
+        self.assertEqual(self._stage_tree(), set())
+
+    def test_link(self):
+        """Test that files are hard linked when staging is 'link', except those that match a writable pattern, which are copied."""
+        self._set_staging('link', ' *.log , ')
+
+        self.assertEqual(self._stage_tree(),
+                         {'a.txt', os.path.join('sub', 'b.txt')})
+
+        # the staging option is read as the configuration is now
+        config.ini['stage_' + TestStageTree.STAGE_ID]['staging'] = 'copy'
+        self.assertEqual(self._stage_tree(), set())
+
+    def test_link_fallback(self):
+        """Test that files that can't be hard linked (e.g., as they are on another file system) are copied instead."""
+        self._set_staging('link')
+
+        with unittest.mock.patch.object(workspace.os, 'link',
+                                        side_effect = OSError(18, 'EXDEV')):
+            self.assertEqual(self._stage_tree(), set())
+
+
+
+if __name__ == '__main__':
+    unittest.main()